@@ -7,19 +7,48 @@
 
 """Chrony charm."""
 
+import hashlib
+import json
 import logging
+import os
 import pathlib
+import re
 import shutil
 import textwrap
+import time
 import typing
 
 import ops
-from charms.grafana_agent.v0.cos_agent import COSAgentProvider
 
-from chrony import Chrony, TimeSource
+import metrics
+import timing
+from chrony import (
+    EXPORTER_COLLECTORS,
+    Chrony,
+    ConfigApplyError,
+    SourcesFileError,
+    TimeSource,
+    Tracking,
+)
+
+if typing.TYPE_CHECKING:
+    from charms.grafana_agent.v0.cos_agent import COSAgentProvider
 
 logger = logging.getLogger(__name__)
 
+# hooks in which the cos-agent relation data is refreshed, the COS agent library is only
+# imported in these hooks since it's expensive to import on every hook start-up
+COS_AGENT_REFRESH_HOOKS = frozenset(
+    {"cos-agent-relation-joined", "cos-agent-relation-changed", "upgrade-charm"}
+)
+
+# upper bound of the sync-timeout wait, so the wait never holds the hook for long
+SYNC_TIMEOUT_MAX = 300.0
+RESOLVE_FAMILIES = ("", "ipv4", "ipv6")
+# Prometheus duration, such as 30s or 1m30s
+SCRAPE_DURATION = re.compile(r"(\d+(ms|[smhdwy]))+")
+EXPORTER_SCRAPE_OPTIONS = ("exporter-scrape-interval", "exporter-scrape-timeout")
+
 CHRONY_CHARM_LOCK_FILE = pathlib.Path("/var/lib/chrony-charm/lock")
 CHRONY_CHARM_CONFIG_HEADER = textwrap.dedent(
     """\
@@ -32,6 +61,8 @@ CHRONY_CHARM_CONFIG_HEADER = textwrap.dedent(
 class ChronyClientCharm(ops.CharmBase):
     """Charm the service."""
 
+    _stored = ops.StoredState()
+
     def __init__(self, *args: typing.Any):
         """Construct.
 
@@ -39,68 +70,636 @@ class ChronyClientCharm(ops.CharmBase):
             args: Arguments passed to the CharmBase parent constructor.
         """
         super().__init__(*args)
-        self.chrony = Chrony()
-        self._grafana_agent = COSAgentProvider(
-            self,
-            metrics_endpoints=[
-                {"path": "/metrics", "port": 9123},
-            ],
-            dashboard_dirs=["./src/grafana_dashboards"],
+        timing.reset()
+        self._stored.set_default(
+            reconcile_fingerprint="",
+            reconcile_count=0,
+            reconcile_fast_path_count=0,
+            restart_count=0,
+            sync_pending=False,
+            bootstrap=False,
+            exporter_scrape=["", ""],
+            probe_cache="",
+            time_to_sync="",
         )
+        self.chrony = Chrony()
+        # chrony restart requested by the events of this hook, see _request_restart
+        self._restart_snapshot: tuple[str, str] | None = None
+        # expiry of the pre-resolved addresses used by the reconciliation, 0 if unused
+        self._resolve_expires = 0.0
+        self._grafana_agent = None
+        hook = self._get_dispatched_hook()
+        if hook in {"", *COS_AGENT_REFRESH_HOOKS} or (
+            hook == "config-changed"
+            and list(typing.cast(list[str], self._stored.exporter_scrape))
+            != self._exporter_scrape()
+        ):
+            self._grafana_agent = self._setup_cos_agent()
         self.framework.observe(self.on.install, self._do_install_and_config)
         self.framework.observe(self.on.remove, self._on_remove)
         self.framework.observe(self.on.upgrade_charm, self._do_install_and_config)
         self.framework.observe(self.on.config_changed, self._do_install_and_config)
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
+        self.framework.observe(self.framework.on.commit, self._on_commit)
 
-    def _do_install_and_config(self, _: ops.EventBase) -> None:
-        """Install required packages and open NTP port."""
-        if self._try_acquire_chrony_lock():
-            if not self.chrony.is_installed():
+    @staticmethod
+    def _get_dispatched_hook() -> str:
+        """Get the name of the hook being dispatched.
+
+        Returns:
+            The hook name, empty string if unknown.
+        """
+        hook = os.environ.get("JUJU_DISPATCH_PATH", "").rpartition("/")[2]
+        return hook.replace("_", "-")
+
+    def _setup_cos_agent(self) -> "COSAgentProvider":
+        """Set up the COS agent integration.
+
+        Returns:
+            The COS agent provider.
+        """
+        # config-changed only sets up the integration if the scrape settings changed
+        refresh_events = [self.on.upgrade_charm, self.on.config_changed]
+        cos_agent = self.on["cos-agent"]
+        # the observers of an event run in the order they are registered, so these two
+        # surround the observer of the provider refreshing the relation data
+        for event in (cos_agent.relation_joined, cos_agent.relation_changed, *refresh_events):
+            self.framework.observe(event, self._on_cos_refresh_start)
+        with timing.span("cos-setup"):
+            # pylint: disable=import-outside-toplevel
+            from charms.grafana_agent.v0.cos_agent import COSAgentProvider
+
+            provider = COSAgentProvider(
+                self,
+                metrics_endpoints=[{"path": "/metrics", "port": metrics.METRICS_PORT}],
+                scrape_configs=self._exporter_scrape_configs,
+                dashboard_dirs=["./src/grafana_dashboards"],
+                refresh_events=refresh_events,
+            )
+        for event in (cos_agent.relation_joined, cos_agent.relation_changed, *refresh_events):
+            self.framework.observe(event, self._on_cos_refresh_end)
+        self._stored.exporter_scrape = self._exporter_scrape()
+        return provider
+
+    def _on_cos_refresh_start(self, _: ops.EventBase) -> None:
+        """Start timing the refresh of the COS agent relation data."""
+        timing.start("cos-refresh")
+
+    def _on_cos_refresh_end(self, _: ops.EventBase) -> None:
+        """Stop timing the refresh of the COS agent relation data."""
+        timing.stop("cos-refresh")
+
+    def _exporter_scrape(self) -> list[str]:
+        """Get the valid chrony_exporter scrape settings.
+
+        Returns:
+            The scrape interval and timeout, empty if unset or invalid.
+        """
+        values = [
+            typing.cast(str, self.config.get(option, "")) for option in EXPORTER_SCRAPE_OPTIONS
+        ]
+        return [value if SCRAPE_DURATION.fullmatch(value) else "" for value in values]
+
+    def _exporter_scrape_configs(self) -> list[dict[str, typing.Any]]:
+        """Get the chrony_exporter scrape job for the COS agent.
+
+        Returns:
+            The scrape configs, with the configured scrape interval and timeout.
+        """
+        job: dict[str, typing.Any] = {
+            "metrics_path": "/metrics",
+            "static_configs": [{"targets": ["localhost:9123"]}],
+        }
+        interval, timeout = self._exporter_scrape()
+        if interval:
+            job["scrape_interval"] = interval
+        if timeout:
+            job["scrape_timeout"] = timeout
+        return [job]
+
+    def _request_restart(self, snapshot: tuple[str, str]) -> None:
+        """Mark a chrony restart as pending, it runs once at the end of the hook.
+
+        Args:
+            snapshot: The chrony configuration and sources file contents to restore if chrony
+                is unhealthy after the restart. Only the first snapshot of the hook is kept.
+        """
+        if self._restart_snapshot is None:
+            self._restart_snapshot = snapshot
+
+    def _on_pre_commit(self, _: ops.EventBase) -> None:
+        """Run the pending chrony restart, after all the events of the hook are handled."""
+        self._finish_time_to_sync()
+        if self._restart_snapshot is None:
+            return
+        snapshot, self._restart_snapshot = self._restart_snapshot, None
+        self._stored.restart_count = typing.cast(int, self._stored.restart_count) + 1
+        measurement = metrics.start_time_to_sync(self._get_dispatched_hook() or "unknown")
+        try:
+            with self.chrony.transaction(snapshot):
+                self.chrony.restart()
+                self.chrony.check_health()
+        except ConfigApplyError as exc:
+            self._stored.reconcile_fingerprint = ""
+            self.unit.status = ops.BlockedStatus(str(exc))
+            return
+        self._stored.time_to_sync = json.dumps(measurement)
+        self._stored.sync_pending = self._get_sync_timeout() > 0
+        self._set_active_status(self._get_sync_timeout())
+
+    def _finish_time_to_sync(self) -> None:
+        """Record the time to sync after the last restart, once chrony is synchronized."""
+        pending = typing.cast(str, self._stored.time_to_sync)
+        if pending and metrics.finish_time_to_sync(
+            json.loads(pending), self.chrony.first_source_selection
+        ):
+            self._stored.time_to_sync = ""
+
+    def _get_sync_timeout(self) -> float:
+        """Get the time to wait for chrony to synchronize after a restart.
+
+        Returns:
+            The sync-timeout configuration, capped to SYNC_TIMEOUT_MAX, in seconds.
+        """
+        return min(float(typing.cast(int, self.config.get("sync-timeout"))), SYNC_TIMEOUT_MAX)
+
+    def _set_active_status(self, timeout: float = 0) -> None:
+        """Set the unit to active, once chrony is synchronized if a sync wait is pending.
+
+        While waiting, the unit is set to waiting with the current offset. If chrony isn't
+        synchronized within the timeout, the unit stays waiting and the sync wait stays
+        pending for the next hooks.
+
+        Args:
+            timeout: Maximum time to wait for chrony to synchronize, in seconds.
+        """
+        if not typing.cast(bool, self._stored.sync_pending) or not self._get_sync_timeout():
+            self._stored.sync_pending = False
+            self.unit.status = ops.ActiveStatus()
+            return
+        max_offset = typing.cast(float, self.config.get("sync-max-offset"))
+        reported = ""
+
+        def report(tracking: Tracking | None) -> None:
+            nonlocal reported
+            message = "waiting for time sync"
+            if tracking is not None:
+                message += f", offset {tracking.offset * 1000:+.1f} ms"
+            if message != reported:
+                self.unit.status = ops.WaitingStatus(message)
+                reported = message
+
+        tracking = self.chrony.wait_sync(timeout, max_offset, report)
+        if tracking is not None:
+            self._stored.sync_pending = False
+            self.unit.status = ops.ActiveStatus()
+
+    def _on_update_status(self, event: ops.EventBase) -> None:
+        """Check if chrony synchronized, when the unit is bootstrapping or waiting for it.
+
+        The reconciliation also runs when the pre-resolved addresses of the time sources expire.
+
+        Args:
+            event: The update-status event.
+        """
+        if typing.cast(bool, self._stored.bootstrap):
+            # switches to the steady-state configuration once chrony is synchronized
+            self._do_install_and_config(event)
+        elif self._resolution_expired():
+            self._do_install_and_config(event)
+        elif typing.cast(bool, self._stored.sync_pending):
+            self._set_active_status()
+
+    def _on_commit(self, _: ops.EventBase) -> None:
+        """Write the timing spans of the hook to the trace file."""
+        timing.flush(hook=self._get_dispatched_hook(), app=self.app.name)
+
+    def _do_install_and_config(self, event: ops.EventBase) -> None:
+        """Install required packages and open NTP port.
+
+        Args:
+            event: The event that triggered the reconciliation.
+        """
+        with timing.span("lock"):
+            locked = self._try_acquire_chrony_lock()
+        if locked:
+            reconcile_count = typing.cast(int, self._stored.reconcile_count) + 1
+            self._stored.reconcile_count = reconcile_count
+            self._update_bootstrap(event)
+            with timing.span("reconcile-check"):
+                reconciled = not isinstance(event, ops.UpgradeCharmEvent) and self._is_reconciled()
+            if reconciled:
+                fast_path_count = typing.cast(int, self._stored.reconcile_fast_path_count) + 1
+                self._stored.reconcile_fast_path_count = fast_path_count
+                logger.info(
+                    "chrony is up to date, skip reconciliation (fast path taken %s/%s)",
+                    fast_path_count,
+                    reconcile_count,
+                )
+                self._set_active_status()
+                return
+            with timing.span("install-check"):
+                installed = self.chrony.is_installed()
+            if not installed:
                 self.unit.status = ops.MaintenanceStatus("installing chrony")
                 self.chrony.install()
             self._configure_chrony()
+            # the reconciliation can stop before configuring chrony_exporter
+            self.chrony.restart_pending_exporter()
         else:
             self._set_lock_failure_status()
 
+    def _update_bootstrap(self, event: ops.EventBase) -> None:
+        """Enter the bootstrap mode on new units, leave it once chrony is synchronized.
+
+        Args:
+            event: The event that triggered the reconciliation.
+        """
+        enabled = typing.cast(bool, self.config.get("bootstrap"))
+        if isinstance(event, ops.InstallEvent) and enabled:
+            if not typing.cast(str, self._stored.reconcile_fingerprint):
+                logger.info("new unit, enter bootstrap mode")
+                self._stored.bootstrap = True
+            return
+        if not typing.cast(bool, self._stored.bootstrap):
+            return
+        if not enabled:
+            logger.info("bootstrap disabled, leave bootstrap mode")
+            self._stored.bootstrap = False
+            return
+        self._leave_bootstrap(self.chrony.tracking())
+
+    def _leave_bootstrap(self, tracking: Tracking | None) -> bool:
+        """Leave the bootstrap mode if chrony is synchronized.
+
+        The steady-state configuration is applied by the next reconciliation, since the
+        bootstrap mode is one of its inputs.
+
+        Args:
+            tracking: The current tracking state of chrony.
+
+        Returns:
+            True if the unit left the bootstrap mode.
+        """
+        if tracking is None or not tracking.synchronized:
+            return False
+        logger.info("chrony synchronized, leave bootstrap mode")
+        self._stored.bootstrap = False
+        return True
+
     def _on_remove(self, _: ops.EventBase) -> None:
         """Handle remove event."""
         if self._try_acquire_chrony_lock():
             self.chrony.uninstall()
+            self.chrony.remove_sources_config()
             self.chrony.restore_config()
             self.chrony.restart()
+            self._stored.reconcile_fingerprint = ""
             self._release_chrony_lock()
 
-    def _configure_chrony(self) -> None:
-        """Configure chrony."""
+    def _load_time_sources(self) -> list[TimeSource] | None:
+        """Get the time sources, setting the blocked status if they are invalid or missing.
+
+        Returns:
+            Time source objects, None if the time sources are invalid or missing.
+        """
         try:
-            sources = self._get_time_sources()
+            with timing.span("parse"):
+                sources = self._get_time_sources()
+        except SourcesFileError as exc:
+            for number, error in exc.errors:
+                logger.error("invalid line %s in sources resource: %s", number, error)
+            self.unit.status = ops.BlockedStatus(
+                f"invalid sources resource: {len(exc.errors)} invalid line(s), "
+                f"first at line {exc.errors[0][0]}"
+            )
+            return None
         except ValueError:
             self.unit.status = ops.BlockedStatus("invalid sources configuration")
-            return
+            return None
+        invalid = self._invalid_option()
+        if invalid:
+            self.unit.status = ops.BlockedStatus(f"invalid {invalid} configuration")
+            return None
         if not sources:
             self.unit.status = ops.BlockedStatus("no time source configured")
+            return None
+        with timing.span("normalize"):
+            normalized = self.chrony.normalize_sources(sources)
+        for merged in normalized.merged:
+            logger.info("merged duplicate time source %s", merged)
+        return list(normalized.sources)
+
+    def _invalid_option(self) -> str | None:
+        """Get the first invalid configuration option, other than the time sources.
+
+        Returns:
+            The name of the invalid option, None if all are valid.
+        """
+        if self.config.get("resolve-family") not in RESOLVE_FAMILIES:
+            return "resolve-family"
+        if not set(self._get_exporter_collectors()) <= set(EXPORTER_COLLECTORS):
+            return "exporter-collectors"
+        for option in EXPORTER_SCRAPE_OPTIONS:
+            value = typing.cast(str, self.config.get(option, ""))
+            if value and not SCRAPE_DURATION.fullmatch(value):
+                return option
+        return None
+
+    def _get_exporter_collectors(self) -> list[str]:
+        """Get the chrony_exporter collectors from charm configuration.
+
+        Returns:
+            Collector names.
+        """
+        collectors = typing.cast(str, self.config.get("exporter-collectors"))
+        return [c.strip() for c in collectors.split(",") if c.strip()]
+
+    def _configure_chrony(self) -> None:
+        """Configure chrony."""
+        sources = self._load_time_sources()
+        if sources is None:
+            self._stored.reconcile_fingerprint = ""
             return
-        if CHRONY_CHARM_CONFIG_HEADER not in self.chrony.read_config():
+        if CHRONY_CHARM_CONFIG_HEADER not in self.chrony.config.content:
             self.chrony.backup_config()
-        new_config = self.chrony.new_config(sources=sources, header=CHRONY_CHARM_CONFIG_HEADER)
-        current_config = self.chrony.read_config()
-        if new_config != current_config:
-            logger.info("Chrony config changed, apply and restart chrony")
-            self.chrony.write_config(new_config)
-            self.chrony.restart()
+        sources, refclocks = self.chrony.split_refclocks(sources)
+        sources = self._resolve_sources(self._select_sources(sources))
+        bootstrap = typing.cast(bool, self._stored.bootstrap)
+        if bootstrap:
+            sources = self.chrony.bootstrap_sources(sources)
+        with timing.span("render"):
+            new_config = self.chrony.new_config(
+                header=CHRONY_CHARM_CONFIG_HEADER, bootstrap=bootstrap, refclocks=refclocks
+            )
+            new_sources_config = self.chrony.new_sources_config(
+                sources=sources, header=CHRONY_CHARM_CONFIG_HEADER
+            )
+        with timing.span("diff"):
+            config_diff = self.chrony.diff_config(self.chrony.config.content, new_config)
+            sources_diff = self.chrony.diff_config(
+                self.chrony.sources_config.content, new_sources_config
+            )
+        previous_config = self.chrony.config.content
+        previous_sources_config = self.chrony.sources_config.content
+        try:
+            with self.chrony.transaction():
+                if config_diff or sources_diff:
+                    self.chrony.validate_config(new_config, new_sources_config)
+                # files are rewritten on any change, chrony is only restarted or reloaded if
+                # the directives changed, not on comment, whitespace or order changes
+                if new_sources_config != self.chrony.sources_config.content:
+                    self.chrony.write_sources_config(new_sources_config)
+                if new_config != self.chrony.config.content:
+                    self.chrony.write_config(new_config)
+                if config_diff:
+                    logger.info("Chrony config changed (%s), restart chrony", config_diff)
+                    self._request_restart((previous_config, previous_sources_config))
+                elif sources_diff:
+                    logger.info("Chrony sources changed (%s)", sources_diff)
+                    self._apply_sources(previous_sources_config, sources)
+                    self.chrony.check_health()
+        except ConfigApplyError as exc:
+            self._stored.reconcile_fingerprint = ""
+            self.unit.status = ops.BlockedStatus(str(exc))
+            return
+        self._configure_exporter()
 
-        self.unit.status = ops.ActiveStatus()
+        self._stored.reconcile_fingerprint = json.dumps(
+            {
+                **self._reconcile_inputs(),
+                "exporter_digests": self.chrony.installed_file_digests(),
+                "exporter_stats": self.chrony.stat_exporter_files(),
+                "metrics_service_stats": self.chrony.stat_metrics_service_files(),
+                "chrony_stats": self.chrony.stat_chrony_binaries(),
+                "config_sha256": self.chrony.config.sha256,
+                "sources_sha256": self.chrony.sources_config.sha256,
+                "resolve_expires": self._resolve_expires,
+            },
+            sort_keys=True,
+        )
+        self._set_active_status()
+
+    def _configure_exporter(self) -> None:
+        """Configure the chrony_exporter collectors, restarting it only if they changed."""
+        if self.chrony.configure_exporter(
+            self._get_exporter_collectors(),
+            dns_lookups=typing.cast(bool, self.config.get("exporter-dns-lookups")),
+        ):
+            logger.info("chrony_exporter configuration changed, restart chrony_exporter")
+
+    def _select_sources(self, sources: list[TimeSource]) -> list[TimeSource]:
+        """Select the time sources with the lowest latency, if the latency probe is enabled.
+
+        The probe results are kept in the stored state for probe-cache-ttl seconds, so the
+        selection only changes when the candidate time sources change or the results expire.
+
+        Args:
+            sources: The candidate time sources.
+
+        Returns:
+            The selected time sources.
+        """
+        count = typing.cast(int, self.config.get("probe-sources"))
+        if count <= 0:
+            return sources
+        # pylint: disable=import-outside-toplevel
+        # asyncio and ssl are only needed when the latency probe is enabled
+        import probe
+
+        digest = hashlib.sha256("\n".join(s.render() for s in sources).encode()).hexdigest()
+        cache = json.loads(typing.cast(str, self._stored.probe_cache) or "{}")
+        if cache.get("sources") == digest and cache["expires"] > time.time():
+            results = [
+                probe.ProbeResult(*result) if result else None for result in cache["results"]
+            ]
+            return probe.select_sources(sources, results, count)
+        results = probe.probe_sources(sources, timeout=float(self.config["probe-timeout"]))
+        for source, result in zip(sources, results, strict=True):
+            if result is not None:
+                logger.info(
+                    "time source %s delay %.1f ms jitter %.1f ms",
+                    source.host,
+                    result.delay * 1000,
+                    result.jitter * 1000,
+                )
+        # an empty probe keeps all the sources, it's not worth keeping
+        if any(results):
+            self._stored.probe_cache = json.dumps(
+                {
+                    "sources": digest,
+                    "results": [[r.delay, r.jitter] if r else None for r in results],
+                    "expires": time.time() + float(self.config["probe-cache-ttl"]),
+                }
+            )
+        return probe.select_sources(sources, results, count)
+
+    def _resolve_sources(self, sources: list[TimeSource]) -> list[TimeSource]:
+        """Apply the pre-resolved addresses of the NTP pool hosts, if the resolution is enabled.
+
+        Args:
+            sources: The time sources.
+
+        Returns:
+            The time sources with the resolved addresses applied.
+        """
+        self._resolve_expires = 0.0
+        family = typing.cast(str, self.config.get("resolve-family"))
+        servers = typing.cast(bool, self.config.get("resolve-servers"))
+        if not family and not servers:
+            return sources
+        # pylint: disable=import-outside-toplevel
+        # the resolver threads are only needed when the resolution is enabled
+        import resolve
+
+        hosts = [host for host in self.chrony.pool_hosts(sources) if not resolve.is_address(host)]
+        addresses, self._resolve_expires = resolve.resolve_hosts(
+            hosts,
+            timeout=float(self.config["resolve-timeout"]),
+            ttl=float(self.config["resolve-cache-ttl"]),
+        )
+        return self.chrony.resolved_sources(sources, addresses, family=family, servers=servers)
+
+    def _resolution_expired(self) -> bool:
+        """Check if the pre-resolved addresses of the last reconciliation expired.
+
+        Returns:
+            True if the last reconciliation used pre-resolved addresses which expired.
+        """
+        fingerprint = typing.cast(str, self._stored.reconcile_fingerprint)
+        if not fingerprint:
+            return False
+        expires = json.loads(fingerprint).get("resolve_expires")
+        return bool(expires) and expires <= time.time()
+
+    def _apply_sources(self, previous_sources_config: str, sources: list[TimeSource]) -> None:
+        """Apply the changed time sources to the running chrony service.
+
+        Option changes with a chronyc equivalent are applied in place, keeping the sources and
+        their measurements. Other changes reload the sources files.
+
+        Args:
+            previous_sources_config: The sources file content before the change.
+            sources: The new time sources, already written to the sources file.
+        """
+        previous_sources = self.chrony.parse_sources_config(previous_sources_config)
+        changes = None
+        if previous_sources is not None:
+            changes = self.chrony.diff_source_options(previous_sources, sources)
+        if changes and self.chrony.apply_source_options(changes):
+            logger.info("Chrony source options changed, applied with chronyc")
+            return
+        logger.info("Chrony sources changed, reload chrony sources")
+        self.chrony.reload_sources()
+
+    def _get_source_urls(self) -> list[str]:
+        """Get the normalized list of time source URLs from charm configuration.
+
+        Returns:
+            Time source URLs.
+        """
+        urls = typing.cast(str, self.config.get("sources"))
+        return [url.strip() for url in urls.split(",") if url.strip()]
+
+    def _get_sources_resource(self) -> pathlib.Path | None:
+        """Get the sources charm resource.
+
+        Returns:
+            The path to the sources resource file, None if it's not attached or empty.
+        """
+        try:
+            path = self.model.resources.fetch("sources")
+        except (ops.ModelError, NameError):
+            return None
+        return path if path.stat().st_size else None
 
     def _get_time_sources(self) -> list[TimeSource]:
-        """Get time sources from charm configuration.
+        """Get time sources from the sources resource, or from charm configuration.
+
+        The sources resource is only fetched when the time sources are needed. Attaching a new
+        resource revision triggers the upgrade-charm hook, which always reconciles.
 
         Returns:
             Time source objects.
         """
-        urls = typing.cast(str, self.config.get("sources"))
-        return [
-            self.chrony.parse_source_url(url.strip()) for url in urls.split(",") if url.strip()
-        ]
+        resource = self._get_sources_resource()
+        if resource is not None:
+            return self.chrony.parse_sources_file(resource)
+        return [self.chrony.parse_source_url(url) for url in self._get_source_urls()]
+
+    def _read_charm_revision(self) -> str:
+        """Read the charm revision of the currently deployed charm.
+
+        Returns:
+            Charm URL written by the Juju agent, empty string if not available.
+        """
+        try:
+            return (self.charm_dir / ".juju-charm").read_text(encoding="utf-8").strip()
+        except OSError:
+            return ""
+
+    def _reconcile_inputs(self) -> dict[str, typing.Any]:
+        """Get the inputs that determine the result of the reconciliation.
+
+        Returns:
+            Reconciliation inputs.
+        """
+        return {
+            "revision": self._read_charm_revision(),
+            "sources": ",".join(self._get_source_urls()),
+            "bootstrap": typing.cast(bool, self._stored.bootstrap),
+            "probe": [
+                self.config.get(option)
+                for option in ["probe-sources", "probe-timeout", "probe-cache-ttl"]
+            ],
+            "resolve": [
+                self.config.get(option)
+                for option in [
+                    "resolve-family",
+                    "resolve-servers",
+                    "resolve-timeout",
+                    "resolve-cache-ttl",
+                ]
+            ],
+            "exporter": [
+                self.config.get(option)
+                for option in [
+                    "exporter-collectors",
+                    "exporter-dns-lookups",
+                    *EXPORTER_SCRAPE_OPTIONS,
+                ]
+            ],
+        }
+
+    def _is_reconciled(self) -> bool:
+        """Check if the last reconciliation result is still valid.
+
+        The check compares the persisted fingerprint of the last successful reconciliation
+        with the current inputs and the state of the files on disk, without parsing the
+        time sources or rendering the chrony configuration.
+
+        Returns:
+            True if nothing changed since the last successful reconciliation.
+        """
+        stored_fingerprint = typing.cast(str, self._stored.reconcile_fingerprint)
+        if not stored_fingerprint:
+            return False
+        fingerprint = json.loads(stored_fingerprint)
+        inputs = self._reconcile_inputs()
+        if any(fingerprint.get(key) != value for key, value in inputs.items()):
+            return False
+        if fingerprint["exporter_stats"] != self.chrony.stat_exporter_files():
+            return False
+        if fingerprint.get("metrics_service_stats") != self.chrony.stat_metrics_service_files():
+            return False
+        if fingerprint.get("chrony_stats") != self.chrony.stat_chrony_binaries():
+            return False
+        if fingerprint["config_sha256"] != self.chrony.config.sha256:
+            return False
+        if fingerprint.get("resolve_expires") and fingerprint["resolve_expires"] <= time.time():
+            return False
+        return fingerprint.get("sources_sha256") == self.chrony.sources_config.sha256
 
     @staticmethod
     def _write_chrony_lock_file(content: str) -> None:
@@ -3,21 +3,33 @@
 
 """Chrony controller."""
 
-# check chrony.conf document for _PoolOptions attributes.
+# check chrony.conf document for _POOL_OPTION_TYPES options.
+
+# The apt and systemd charm libraries are imported by the code paths that use them,
+# most hooks never need them and they are expensive to import on every hook start-up.
+# pylint: disable=import-outside-toplevel
 
 import collections
+import contextlib
+import dataclasses
+import functools
+import hashlib
 import itertools
+import json
 import logging
+import math
 import os
 import pathlib
+import re
 import shutil
+import subprocess  # nosec B404
 import textwrap
+import time
 import typing
 import urllib.parse
 
-import pydantic
-from charms.operator_libs_linux.v0 import apt
-from charms.operator_libs_linux.v1 import systemd
+import timing
+from config_store import ConfigStore, atomic_write
 
 logger = logging.getLogger(__name__)
 
@@ -34,75 +46,527 @@ _CHRONY_EXPORTER_FILES = {
     _FILES_DIR / "usr.bin.chrony_exporter": _CHRONY_EXPORTER_APPARMOR_FILE,
 }
 _CHRONY_EXPORTER_SERVICE_NAME = "prometheus-chrony-exporter"
+# chrony_exporter command line of the drop-in, without the collector flags
+_CHRONY_EXPORTER_COMMAND = (
+    "/usr/bin/chrony_exporter --chrony.address=unix:///run/chrony/chronyd.sock "
+    "--web.listen-address=127.0.0.1:9123"
+)
+# collectors enabled by files/chrony-exporter.service, in the order of its flags
+EXPORTER_COLLECTORS = ("tracking", "sources", "serverstats")
+# binaries of the chrony package, which a reinstall or removal of the package replaces
+_CHRONY_BINARIES = (pathlib.Path("/usr/bin/chronyc"), pathlib.Path("/usr/sbin/chronyd"))
+# written by the chrony-exporter part in charmcraft.yaml, in sha256sum format
+_CHRONY_EXPORTER_MANIFEST_FILE = _BIN_DIR.parent / "chrony-exporter.sha256"
+# the socket activated charm metrics service, serving the metrics file of metrics.py
+_METRICS_SERVICE_FILES = {
+    _FILES_DIR / "chrony-charm-metrics.socket": pathlib.Path(
+        "/usr/lib/systemd/system/chrony-charm-metrics.socket"
+    ),
+    _FILES_DIR / "chrony-charm-metrics@.service": pathlib.Path(
+        "/usr/lib/systemd/system/chrony-charm-metrics@.service"
+    ),
+}
+_METRICS_SOCKET_NAME = "chrony-charm-metrics.socket"
 
 
-class _PoolOptions(pydantic.BaseModel):
-    """Chrony pool directive options.
+def _manifest_files() -> dict[pathlib.Path, pathlib.Path]:
+    """Get the bundled files listed in the build manifest, with their installed path.
 
-    For more detail: https://chrony-project.org/doc/4.5/chrony.conf.html
+    Returns:
+        A mapping of bundled file to installed file.
+    """
+    return {**_CHRONY_EXPORTER_FILES, **_METRICS_SERVICE_FILES}
+
+
+# source options that can be changed at runtime, with the chronyc command of the same name
+_RUNTIME_SOURCE_OPTIONS = frozenset(
+    {
+        "minpoll",
+        "maxpoll",
+        "maxdelay",
+        "maxdelayratio",
+        "maxdelaydevratio",
+        "polltarget",
+        "minstratum",
+        "offline",
+    }
+)
+
+
+def _sha256_file(path: pathlib.Path) -> str:
+    """Calculate the SHA-256 digest of a file without loading it into memory.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The hex encoded SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_signature(path: pathlib.Path) -> list[int] | None:
+    """Get the (inode, size, mtime_ns) stat signature of a file.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The stat signature, None if the file doesn't exist.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+# type of each chrony pool directive option, bool options are flags
+_POOL_OPTION_TYPES: dict[str, type] = {
+    "minpoll": int,
+    "maxpoll": int,
+    "iburst": bool,
+    "burst": bool,
+    "key": str,
+    "nts": bool,
+    "certset": str,
+    "maxdelay": float,
+    "maxdelayratio": float,
+    "maxdelaydevratio": float,
+    "maxdelayquant": float,
+    "mindelay": float,
+    "asymmetry": float,
+    "offset": float,
+    "minsamples": int,
+    "maxsamples": int,
+    "filter": int,
+    "offline": bool,
+    "auto_offline": bool,
+    "prefer": bool,
+    "noselect": bool,
+    "trust": bool,
+    "require": bool,
+    "xleave": bool,
+    "polltarget": int,
+    "presend": int,
+    "minstratum": int,
+    "version": int,
+    "extfield": str,
+    "ipv4": bool,
+    "ipv6": bool,
+    "maxsources": int,
+}
+# number of sources chrony uses from a pool without the maxsources option
+_POOL_MAXSOURCES = 4
+# spellings accepted by the fast path validator, pydantic accepts more
+_BOOL_VALUES = {"true": True, "1": True, "false": False, "0": False}
+_INT_PATTERN = re.compile(r"0|-?[1-9][0-9]*")
+_FLOAT_PATTERN = re.compile(r"-?[0-9]+(?:\.[0-9]+)?")
+_SIMPLE_SOURCE_URL_PATTERN = re.compile(
+    r"(?P<scheme>ntp|nts)://(?P<host>[A-Za-z0-9.-]+)(?::(?P<port>[0-9]{1,5}))?"
+    r"(?:\?(?P<query>[A-Za-z_]+=[^&=%+#\s]+(?:&[A-Za-z_]+=[^&=%+#\s]+)*))?"
+)
+
+
+class _RejectedError(Exception):
+    """The input is not accepted by the fast path validator."""
+
+
+def _coerce_bool(value: typing.Any) -> bool:
+    """Convert a flag value, accepting only the common spellings.
+
+    Args:
+        value: The flag value.
+
+    Returns:
+        The flag.
+
+    Raises:
+        _RejectedError: If the value must be validated by pydantic.
+    """
+    if type(value) is bool:
+        return value
+    if isinstance(value, str) and value in _BOOL_VALUES:
+        return _BOOL_VALUES[value]
+    raise _RejectedError
+
+
+def _coerce_int(value: typing.Any) -> int | None:
+    """Convert an integer option value, accepting only the common spellings.
+
+    Args:
+        value: The option value.
+
+    Returns:
+        The integer, None if unset.
+
+    Raises:
+        _RejectedError: If the value must be validated by pydantic.
     """
+    if value is None or type(value) is int:
+        return value
+    if isinstance(value, str) and _INT_PATTERN.fullmatch(value):
+        return int(value)
+    raise _RejectedError
+
+
+def _coerce_float(value: typing.Any) -> float | None:
+    """Convert a float option value, accepting only the common spellings.
+
+    Args:
+        value: The option value.
+
+    Returns:
+        The float, None if unset.
+
+    Raises:
+        _RejectedError: If the value must be validated by pydantic.
+    """
+    if value is None:
+        return None
+    if type(value) in (int, float) or (isinstance(value, str) and _FLOAT_PATTERN.fullmatch(value)):
+        return float(value)
+    raise _RejectedError
+
+
+def _coerce_str(value: typing.Any) -> str | None:
+    """Check a string option value.
+
+    Args:
+        value: The option value.
+
+    Returns:
+        The string, None if unset.
 
-    model_config = pydantic.ConfigDict(extra="forbid")
-
-    minpoll: int | None = None
-    maxpoll: int | None = None
-    iburst: bool = False
-    burst: bool = False
-    key: str | None = None
-    nts: bool = False
-    certset: str | None = None
-    maxdelay: float | None = None
-    maxdelayratio: float | None = None
-    maxdelaydevratio: float | None = None
-    maxdelayquant: float | None = None
-    mindelay: float | None = None
-    asymmetry: float | None = None
-    offset: float | None = None
-    minsamples: int | None = None
-    maxsamples: int | None = None
-    filter: int | None = None
-    offline: bool = False
-    auto_offline: bool = False
-    prefer: bool = False
-    noselect: bool = False
-    trust: bool = False
-    require: bool = False
-    xleave: bool = False
-    polltarget: int | None = None
-    presend: int | None = None
-    minstratum: int | None = None
-    version: int | None = None
-    extfield: str | None = None
-    maxsources: int | None = None
+    Raises:
+        _RejectedError: If the value must be validated by pydantic.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    raise _RejectedError
+
+
+# fast path converters of each option type, the result is equal to the pydantic conversion
+_COERCERS: dict[type, typing.Callable[[typing.Any], typing.Any]] = {
+    bool: _coerce_bool,
+    int: _coerce_int,
+    float: _coerce_float,
+    str: _coerce_str,
+}
+_SOURCE_MODELS: dict[str, typing.Any] = {}
+
+
+def _source_model(cls: type["_SourceOptions"]) -> typing.Any:
+    """Create the pydantic model validating the same fields as a time source class.
+
+    Pydantic is only imported when the fast path validator rejects an input, to convert the
+    less common spellings of the values or describe why the input is invalid.
+
+    Args:
+        cls: The time source class.
+
+    Returns:
+        The pydantic model class.
+    """
+    if cls.__name__ in _SOURCE_MODELS:
+        return _SOURCE_MODELS[cls.__name__]
+    import pydantic
+
+    fields: dict[str, typing.Any] = {}
+    for name, kind in cls.FIELDS.items():
+        if name == "host":
+            fields[name] = (typing.Annotated[str, pydantic.StringConstraints(min_length=1)], ...)
+        elif kind is bool:
+            fields[name] = (bool, False)
+        else:
+            fields[name] = (kind | None, None)
+    model = pydantic.create_model(
+        cls.__name__, __config__=pydantic.ConfigDict(extra="forbid"), **fields
+    )
+    _SOURCE_MODELS[cls.__name__] = model
+    return model
+
+
+def _split_source_url(url: str) -> tuple[str, str | None, int | None, dict[str, str]]:
+    """Split a time source URL into the scheme, the host, the port and the options.
+
+    Simple URLs are split with a regular expression, other URLs, for example with
+    percent-encoded options, with urllib.parse, which gives the same result.
+
+    Args:
+        url: The time source URL.
+
+    Returns:
+        The scheme, the lower-case host, the port and the options of the URL.
+
+    Raises:
+        ValueError: If the port is invalid.
+    """
+    match = _SIMPLE_SOURCE_URL_PATTERN.fullmatch(url)
+    if match is not None and (match["port"] is None or int(match["port"]) <= 65535):
+        query = match["query"]
+        return (
+            match["scheme"],
+            match["host"].lower(),
+            None if match["port"] is None else int(match["port"]),
+            dict(pair.split("=") for pair in query.split("&")) if query else {},
+        )
+    parsed = urllib.parse.urlparse(url)
+    return parsed.scheme, parsed.hostname, parsed.port, dict(urllib.parse.parse_qsl(parsed.query))
+
+
+# URL parts which can't be given as options in the query of a time source URL
+_RESERVED_URL_OPTIONS = frozenset({"host", "port", "ntsport", "driver", "path"})
+
+
+def _check_url_options(url: str, query: dict[str, str]) -> None:
+    """Check that the options of a time source URL don't repeat a part of the URL.
+
+    Args:
+        url: The time source URL.
+        query: The options of the URL.
+
+    Raises:
+        ValueError: If an option is a reserved URL part.
+    """
+    reserved = _RESERVED_URL_OPTIONS.intersection(query)
+    if reserved:
+        raise ValueError(f"Invalid option {sorted(reserved)[0]!r} in time source URL: {url}")
+
+
+def _render_flag(name: str, _: bool) -> str:
+    """Render a flag option, set flags are the only ones rendered.
+
+    Args:
+        name: The option name.
+
+    Returns:
+        The rendered option.
+    """
+    return name
+
+
+def _render_option(name: str, value: typing.Any) -> str:
+    """Render an option with a value.
+
+    Args:
+        name: The option name.
+        value: The option value.
+
+    Returns:
+        The rendered option.
+    """
+    return f"{name} {value}"
+
+
+@functools.lru_cache(maxsize=256)
+def _intern_options(options: tuple[str, ...]) -> tuple[str, ...]:
+    """Share the tuple of the options in use between sources with the same options.
+
+    Args:
+        options: The names of the options in use.
+
+    Returns:
+        The shared tuple, equal to options.
+    """
+    return options
+
+
+def _option_renderers(
+    option_types: dict[str, type],
+) -> dict[str, typing.Callable[[typing.Any], str]]:
+    """Get the renderer of each option, by the type of the option.
+
+    Args:
+        option_types: The type of each option, bool options are flags.
+
+    Returns:
+        A mapping of option name to the function rendering its value.
+    """
+    return {
+        name: functools.partial(_render_flag if kind is bool else _render_option, name)
+        for name, kind in option_types.items()
+    }
+
+
+# the type of the copied model in _SourceOptions.model_copy, typing.Self needs Python 3.11
+_SourceOptionsT = typing.TypeVar("_SourceOptionsT", bound="_SourceOptions")
+
+
+class _SourceOptions:
+    """The fields of a chrony time source directive.
+
+    The fields are validated without pydantic for the common spellings of the values. Other
+    inputs are validated by an equivalent pydantic model (see _source_model), which converts
+    them the same way as the fast path or raises a pydantic.ValidationError.
+    """
+
+    FIELDS: typing.ClassVar[dict[str, type]] = {}
+    DIRECTIVE: typing.ClassVar[str]
+    _DEFAULTS: typing.ClassVar[dict[str, typing.Any]] = {}
+    # options are rendered in name order, with the renderer of their type
+    _OPTION_INDEX: typing.ClassVar[dict[str, int]] = {}
+    _OPTION_RENDERERS: typing.ClassVar[dict[str, typing.Callable[[typing.Any], str]]] = {}
+    __slots__ = ("_options",)
+    _options: tuple[str, ...]
+
+    def __init_subclass__(cls, **kwargs: typing.Any) -> None:
+        """Compute the default value of the fields of a time source class.
+
+        Args:
+            kwargs: Arguments passed to the parent method.
+        """
+        super().__init_subclass__(**kwargs)
+        cls._DEFAULTS = {
+            name: False if kind is bool else None for name, kind in cls.FIELDS.items()
+        }
+
+    def __init__(self, **values: typing.Any) -> None:
+        """Validate and set the fields.
+
+        Args:
+            values: The field values, unset options are unset flags or None.
+
+        Raises:
+            ValueError: If a value is invalid, or a field is unknown or missing.
+        """
+        try:
+            validated = self._validate(values)
+            self._set_fields({**self._DEFAULTS, **validated}, validated)
+        except _RejectedError:
+            validated = _source_model(type(self))(**values).model_dump()
+            self._set_fields(validated, validated)
+
+    def _set_fields(self, values: dict[str, typing.Any], provided: typing.Iterable[str]) -> None:
+        """Set the fields, keeping track of the options in use.
+
+        Args:
+            values: The validated value of every field.
+            provided: The fields which may differ from their default value.
+        """
+        for name, value in values.items():
+            setattr(self, name, value)
+        index = self._OPTION_INDEX
+        options = [
+            name
+            for name in provided
+            if name in index and values[name] is not None and values[name] is not False
+        ]
+        options.sort(key=index.__getitem__)
+        self._options = _intern_options(tuple(options))
+
+    @classmethod
+    def _validate(cls, values: dict[str, typing.Any]) -> dict[str, typing.Any]:
+        """Validate the field values with the fast path validator.
+
+        Args:
+            values: The field values.
+
+        Returns:
+            The converted field values.
+
+        Raises:
+            _RejectedError: If the values must be validated by pydantic.
+        """
+        fields = cls.FIELDS
+        if not values.keys() <= fields.keys() or not values.get("host"):
+            raise _RejectedError
+        return {name: _COERCERS[fields[name]](value) for name, value in values.items()}
+
+    def model_dump(self, exclude_defaults: bool = False) -> dict[str, typing.Any]:
+        """Get the field values, like pydantic.BaseModel.model_dump.
+
+        Args:
+            exclude_defaults: Exclude unset flags and options.
+
+        Returns:
+            A mapping of field name to value.
+        """
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        if exclude_defaults:
+            return {k: v for k, v in values.items() if v is not None and v is not False}
+        return values
+
+    def model_copy(
+        self: _SourceOptionsT, update: dict[str, typing.Any] | None = None
+    ) -> _SourceOptionsT:
+        """Copy the time source without validation, like pydantic.BaseModel.model_copy.
+
+        Args:
+            update: Field values to change in the copy.
+
+        Returns:
+            The copy.
+        """
+        copy = object.__new__(type(self))
+        update = update or {}
+        copy._set_fields({**self.model_dump(), **update}, {*self._options, *update})
+        return copy
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the fields of two time sources of the same type.
+
+        Args:
+            other: The other object.
+
+        Returns:
+            True if the time sources are equal.
+        """
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.model_dump() == typing.cast(_SourceOptions, other).model_dump()
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        """Represent the set fields.
+
+        Returns:
+            The representation.
+        """
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.model_dump(exclude_defaults=True).items())
+        return f"{type(self).__name__}({fields})"
 
     def render_options(self) -> str:
-        """Render pool options as chrony option string.
-
-        Returns:
-            Chrony pool directive option string.
-        """
-        options = []
-        # mypy and pylint have problems handling the model_fields class attribute.
-        # pylint: disable=not-an-iterable
-        for field in sorted(f for f in _PoolOptions.model_fields if f != "copy"):  # type: ignore
-            value = getattr(self, field)
-            # first, check if the value is of boolean type and True
-            # then, check if the value is of boolean type and False or None (unset)
-            # finally, check if the value is of a non-boolean type and set
-            if value is True:
-                options.append(field)
-            elif value is None or value is False:
-                continue
-            else:
-                options.extend([field, str(value)])
-        return " ".join(options)
+        """Render the options as chrony option string.
+
+        Only the options in use are rendered, unset flags and options are skipped.
+
+        Returns:
+            Chrony directive option string.
+        """
+        renderers = self._OPTION_RENDERERS
+        return " ".join([renderers[name](getattr(self, name)) for name in self._options])
+
+
+class _PoolOptions(_SourceOptions):
+    """Chrony pool directive options.
+
+    For more detail: https://chrony-project.org/doc/4.5/chrony.conf.html
+    """
+
+    FIELDS: typing.ClassVar[dict[str, type]] = _POOL_OPTION_TYPES
+    DIRECTIVE: typing.ClassVar[str] = "pool"
+    _OPTION_INDEX: typing.ClassVar[dict[str, int]] = {
+        name: index for index, name in enumerate(sorted(_POOL_OPTION_TYPES))
+    }
+    _OPTION_RENDERERS: typing.ClassVar[dict[str, typing.Callable[[typing.Any], str]]] = (
+        _option_renderers(_POOL_OPTION_TYPES)
+    )
+    __slots__ = tuple(_POOL_OPTION_TYPES)
 
 
 class _NtpSource(_PoolOptions):
     """A NTP time source."""
 
-    host: typing.Annotated[str, pydantic.StringConstraints(min_length=1)]
-    port: int | None = None
+    FIELDS: typing.ClassVar[dict[str, type]] = {**_POOL_OPTION_TYPES, "host": str, "port": int}
+    __slots__ = ("host", "port")
+    host: str
+    port: int | None
 
     @classmethod
     def from_source_url(cls, url: str) -> "_NtpSource":
@@ -117,19 +581,22 @@ class _NtpSource(_PoolOptions):
         Raises:
             ValueError: If the URL is invalid.
         """
-        parsed = urllib.parse.urlparse(url)
-        if parsed.scheme != "ntp":
+        scheme, host, port, query = _split_source_url(url)
+        if scheme != "ntp":
             raise ValueError(f"Invalid NTP source URL: {url}")
-        query = dict(urllib.parse.parse_qsl(parsed.query))
-        return cls(host=parsed.hostname, port=parsed.port, **query)  # type: ignore
+        _check_url_options(url, query)
+        kind = query.pop("type", "pool")
+        if kind not in _SOURCE_TYPES:
+            raise ValueError(f"Invalid NTP source type: {kind}")
+        return _SOURCE_TYPES[kind][0](host=host, port=port, **query)
 
     def render(self) -> str:
-        """Render NTP time source as a chrony pool directive string.
+        """Render NTP time source as a chrony directive string.
 
         Returns:
-            Chrony pool directive string.
+            Chrony pool directive string, server directive string for servers.
         """
-        directive = f"pool {self.host}"
+        directive = f"{self.DIRECTIVE} {self.host}"
         if self.port is not None and self.port != 123:
             directive += f" port {self.port}"
         options = self.render_options()
@@ -141,8 +608,10 @@ class _NtpSource(_PoolOptions):
 class _NtsSource(_PoolOptions):
     """A NTP time source with NTS enabled."""
 
-    host: typing.Annotated[str, pydantic.StringConstraints(min_length=1)]
-    ntsport: int | None = None
+    FIELDS: typing.ClassVar[dict[str, type]] = {**_POOL_OPTION_TYPES, "host": str, "ntsport": int}
+    __slots__ = ("host", "ntsport")
+    host: str
+    ntsport: int | None
 
     @classmethod
     def from_source_url(cls, url: str) -> "_NtsSource":
@@ -157,19 +626,23 @@ class _NtsSource(_PoolOptions):
         Raises:
             ValueError: If the URL is invalid.
         """
-        parsed = urllib.parse.urlparse(url)
-        if parsed.scheme != "nts":
+        scheme, host, port, query = _split_source_url(url)
+        if scheme != "nts":
             raise ValueError(f"Invalid NTS source URL: {url}")
-        query = dict(urllib.parse.parse_qsl(parsed.query))
-        return cls(host=parsed.hostname, ntsport=parsed.port, **query)  # type: ignore
+        _check_url_options(url, query)
+        kind = query.pop("type", "pool")
+        model = _SOURCE_TYPES.get(kind, (None, None))[1]
+        if model is None:
+            raise ValueError(f"Invalid NTS source type: {kind}")
+        return model(host=host, ntsport=port, **query)
 
     def render(self) -> str:
-        """Render NTP time source as a chrony pool directive string with NTS enabled.
+        """Render NTP time source as a chrony directive string with NTS enabled.
 
         Returns:
-            Chrony pool directive string.
+            Chrony pool directive string, server directive string for servers.
         """
-        directive = f"pool {self.host} nts"
+        directive = f"{self.DIRECTIVE} {self.host} nts"
         if self.ntsport is not None and self.ntsport != 4460:
             directive += f" ntsport {self.ntsport}"
         options = self.render_options()
@@ -178,43 +651,646 @@ class _NtsSource(_PoolOptions):
         return directive
 
 
-TimeSource = _NtpSource | _NtsSource
+# options of the pool directive which don't apply to a single server or peer
+_POOL_ONLY_OPTIONS = frozenset({"maxsources"})
+
+
+class _NtpServerSource(_NtpSource):
+    """A single NTP server, rendered as a chrony server directive."""
+
+    FIELDS: typing.ClassVar[dict[str, type]] = {
+        name: kind for name, kind in _NtpSource.FIELDS.items() if name not in _POOL_ONLY_OPTIONS
+    }
+    DIRECTIVE: typing.ClassVar[str] = "server"
+
+
+class _NtpPeerSource(_NtpSource):
+    """A NTP peer in symmetric mode, rendered as a chrony peer directive."""
+
+    FIELDS: typing.ClassVar[dict[str, type]] = _NtpServerSource.FIELDS
+    DIRECTIVE: typing.ClassVar[str] = "peer"
+
+
+class _NtsServerSource(_NtsSource):
+    """A single NTP server with NTS enabled, rendered as a chrony server directive."""
+
+    FIELDS: typing.ClassVar[dict[str, type]] = {
+        name: kind for name, kind in _NtsSource.FIELDS.items() if name not in _POOL_ONLY_OPTIONS
+    }
+    DIRECTIVE: typing.ClassVar[str] = "server"
+
+
+# type of each chrony refclock directive option, bool options are flags
+_REFCLOCK_OPTION_TYPES: dict[str, type] = {
+    "refid": str,
+    "poll": int,
+    "precision": float,
+    "offset": float,
+    "delay": float,
+    "prefer": bool,
+}
+_REFCLOCK_DRIVERS = frozenset({"SOCK", "SHM"})
+_REFID_PATTERN = re.compile(r"[A-Za-z0-9]{1,4}")
+# size of sun_path in struct sockaddr_un on Linux, with the terminating null byte
+_UNIX_PATH_MAX = 108
+
+
+class _RefclockSource(_SourceOptions):
+    """A local reference clock, rendered as a chrony refclock directive.
+
+    The host is the driver parameter: the socket path of the SOCK driver, written by gpsd or
+    another program, or the shared memory segment number of the SHM driver.
+    """
+
+    FIELDS: typing.ClassVar[dict[str, type]] = {
+        **_REFCLOCK_OPTION_TYPES,
+        "driver": str,
+        "host": str,
+    }
+    DIRECTIVE: typing.ClassVar[str] = "refclock"
+    _OPTION_INDEX: typing.ClassVar[dict[str, int]] = {
+        name: index for index, name in enumerate(sorted(_REFCLOCK_OPTION_TYPES))
+    }
+    _OPTION_RENDERERS: typing.ClassVar[dict[str, typing.Callable[[typing.Any], str]]] = (
+        _option_renderers(_REFCLOCK_OPTION_TYPES)
+    )
+    __slots__ = ("driver", "host", *_REFCLOCK_OPTION_TYPES)
+    driver: str
+    host: str
+
+    def __init__(self, **values: typing.Any) -> None:
+        """Validate and set the fields.
+
+        Args:
+            values: The field values, unset options are unset flags or None.
+
+        Raises:
+            ValueError: If a value is invalid, or a field is unknown or missing.
+        """
+        super().__init__(**values)
+        if self.driver not in _REFCLOCK_DRIVERS:
+            raise ValueError(f"Invalid refclock driver: {self.driver}")
+        if self.driver == "SOCK" and not re.fullmatch(r"/[^\s]+", self.host):
+            raise ValueError(f"Invalid SOCK refclock socket path: {self.host}")
+        # chronyd binds the socket of the SOCK driver, the path must fit in sun_path
+        if self.driver == "SOCK" and len(os.fsencode(self.host)) >= _UNIX_PATH_MAX:
+            raise ValueError(f"Too long SOCK refclock socket path: {self.host}")
+        if self.driver == "SHM" and not self.host.isdigit():
+            raise ValueError(f"Invalid SHM refclock segment: {self.host}")
+        options = self.model_dump(exclude_defaults=True)
+        if "refid" in options and not _REFID_PATTERN.fullmatch(options["refid"]):
+            raise ValueError(f"Invalid refclock refid: {options['refid']}")
+        for option in ("precision", "delay"):
+            if options.get(option, 1) <= 0:
+                raise ValueError(f"Invalid refclock {option}: {options[option]}")
+
+    @classmethod
+    def from_source_url(cls, url: str) -> "_RefclockSource":
+        """Parse a reference clock from a URL.
+
+        The URL is ``refclock://sock/<socket path>`` or ``refclock://shm/<segment>``.
+
+        Args:
+            url: URL to parse.
+
+        Returns:
+            Parsed reference clock.
+
+        Raises:
+            ValueError: If the URL is invalid.
+        """
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme != "refclock" or not parsed.path:
+            raise ValueError(f"Invalid refclock source URL: {url}")
+        driver = parsed.netloc.upper()
+        host = parsed.path if driver == "SOCK" else parsed.path.removeprefix("/")
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        _check_url_options(url, query)
+        return cls(driver=driver, host=host, **query)
+
+    def render(self) -> str:
+        """Render the reference clock as a chrony refclock directive string.
+
+        Returns:
+            Chrony refclock directive string.
+        """
+        directive = f"refclock {self.driver} {self.host}"
+        options = self.render_options()
+        if options:
+            directive += f" {options}"
+        return directive
+
+
+TimeSource = _NtpSource | _NtsSource | _RefclockSource
+# NTP and NTS time source classes of each source directive, NTS doesn't support peers
+_SOURCE_TYPES: dict[str, tuple[type[_NtpSource], type[_NtsSource] | None]] = {
+    "pool": (_NtpSource, _NtsSource),
+    "server": (_NtpServerSource, _NtsServerSource),
+    "peer": (_NtpPeerSource, None),
+}
 TlsKeyPair = collections.namedtuple("TlsKeyPair", ["certificate", "key"])
 
+_SOURCE_DIRECTIVES = frozenset({"pool", "server", "peer"})
+_COMMENT_PREFIXES = ("#", "!", ";", "%")
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfigDiff:
+    """Semantic difference between two chrony configurations.
+
+    Attributes:
+        added: Canonical directives only in the new configuration.
+        removed: Canonical directives only in the old configuration.
+        changed: Old and new canonical directive of each directive with different arguments,
+            matched by the directive name, or the directive name and the host for time source
+            directives (for example, ``pool ntp.ubuntu.com``).
+    """
+
+    added: tuple[str, ...] = ()
+    removed: tuple[str, ...] = ()
+    changed: tuple[tuple[str, str], ...] = ()
+
+    def __bool__(self) -> bool:
+        """Check if the configurations differ.
+
+        Returns:
+            True if any directive was added, removed or changed.
+        """
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self) -> str:
+        """Describe the difference.
+
+        Returns:
+            The description of the difference.
+        """
+        parts = [
+            f"{name}: {', '.join(values)}"
+            for name, values in [
+                ("added", self.added),
+                ("removed", self.removed),
+                ("changed", [f"{old} -> {new}" for old, new in self.changed]),
+            ]
+            if values
+        ]
+        return "; ".join(parts) or "no change"
+
+
+@dataclasses.dataclass(frozen=True)
+class NormalizedSources:
+    """Time sources after normalization.
+
+    Attributes:
+        sources: The normalized time sources, without duplicates, in a deterministic order.
+        merged: Descriptions of the duplicate time sources merged into another source.
+    """
+
+    sources: tuple[TimeSource, ...]
+    merged: tuple[str, ...] = ()
+
+
+def _normalize_source(source: TimeSource) -> TimeSource:
+    """Normalize the host and the port of a time source.
+
+    Args:
+        source: The time source.
+
+    Returns:
+        The time source with a lower-case host and without the default port, reference clocks
+        with a canonical SHM segment number.
+    """
+    if isinstance(source, _RefclockSource):
+        if source.driver == "SHM":
+            return source.model_copy(update={"host": str(int(source.host))})
+        return source
+    update: dict[str, typing.Any] = {"host": source.host.lower().rstrip(".")}
+    if isinstance(source, _NtpSource) and source.port == 123:
+        update["port"] = None
+    if isinstance(source, _NtsSource) and source.ntsport == 4460:
+        update["ntsport"] = None
+    return source.model_copy(update=update)
+
+
+def _source_key(source: TimeSource) -> tuple[str, str, int | None, str]:
+    """Get the identity of a normalized time source.
+
+    Args:
+        source: The normalized time source.
+
+    Returns:
+        The scheme, the host, the port and the directive of the time source, the driver for
+        reference clocks.
+    """
+    if isinstance(source, _RefclockSource):
+        return "refclock", source.host, None, source.driver
+    if isinstance(source, _NtsSource):
+        return "nts", source.host, source.ntsport, source.DIRECTIVE
+    return "ntp", source.host, source.port, source.DIRECTIVE
+
+
+def _describe_source(key: tuple[str, str, int | None, str]) -> str:
+    """Describe a time source by its identity, as a URL without the options.
+
+    Args:
+        key: The identity of the time source, see _source_key.
+
+    Returns:
+        The time source URL.
+    """
+    scheme, host, _, directive = key
+    if scheme == "refclock":
+        return f"refclock://{directive.lower()}/{host.removeprefix('/')}"
+    return f"{scheme}://{host}" + ("" if directive == "pool" else f"?type={directive}")
+
+
+# directives with only numeric arguments, besides keywords
+_NUMERIC_DIRECTIVES = frozenset(
+    {
+        "clockprecision",
+        "combinelimit",
+        "corrtimeratio",
+        "logchange",
+        "makestep",
+        "maxchange",
+        "maxclockerror",
+        "maxdistance",
+        "maxdrift",
+        "maxjitter",
+        "maxslewrate",
+        "maxupdateskew",
+        "minsources",
+        "reselectdist",
+        "smoothtime",
+        "stratumweight",
+    }
+)
+# options of the source, refclock and local directives taking a numeric argument
+_NUMERIC_OPTIONS = frozenset(
+    {
+        "asymmetry",
+        "delay",
+        "distance",
+        "dpoll",
+        "filter",
+        "maxdelay",
+        "maxdelaydevratio",
+        "maxdelayratio",
+        "maxdispersion",
+        "maxlockage",
+        "maxpoll",
+        "maxsamples",
+        "maxsources",
+        "mindelay",
+        "minpoll",
+        "minsamples",
+        "minstratum",
+        "ntsport",
+        "offset",
+        "poll",
+        "polltarget",
+        "port",
+        "precision",
+        "rate",
+        "stratum",
+        "version",
+        "width",
+    }
+)
+
+
+def _normalize_number(token: str) -> str:
+    """Normalize the spelling of a numeric directive argument.
+
+    Args:
+        token: The numeric directive argument.
+
+    Returns:
+        The canonical argument, for example ``100`` for ``100.0``.
+    """
+    try:
+        number = float(token)
+    except ValueError:
+        return token
+    if not math.isfinite(number):
+        return token
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def _normalize_arguments(directive: str, arguments: list[str]) -> list[str]:
+    """Normalize the spelling of the numeric arguments of a directive.
+
+    Only the arguments of known numeric directives and options are normalized, hosts, paths,
+    reference IDs and key IDs are kept as written.
+
+    Args:
+        directive: The lower-case directive name.
+        arguments: The directive arguments.
+
+    Returns:
+        The arguments, with canonical numbers.
+    """
+    if directive in _NUMERIC_DIRECTIVES:
+        return [_normalize_number(token) for token in arguments]
+    normalized = []
+    numeric = False
+    for token in arguments:
+        normalized.append(_normalize_number(token) if numeric else token)
+        numeric = not numeric and token in _NUMERIC_OPTIONS
+    return normalized
+
+
+def _source_from_directive(tokens: list[str]) -> TimeSource | None:
+    """Parse a time source directive into a time source model.
+
+    Args:
+        tokens: The directive tokens, starting with the directive name.
+
+    Returns:
+        The time source, None if the directive can't be represented by a time source model.
+    """
+    if tokens[0] not in _SOURCE_TYPES or len(tokens) < 2:
+        return None
+    fields: dict[str, typing.Any] = {"host": tokens[1]}
+    options = iter(tokens[2:])
+    for option in options:
+        if option not in _POOL_OPTION_TYPES and option not in {"port", "ntsport"}:
+            return None
+        if _POOL_OPTION_TYPES.get(option) is bool:
+            fields[option] = True
+        else:
+            fields[option] = next(options, None)
+    ntp_model, nts_model = _SOURCE_TYPES[tokens[0]]
+    model: type[TimeSource] | None = nts_model if fields.pop("nts", False) else ntp_model
+    if model is None:
+        return None
+    try:
+        return model(**fields)
+    except ValueError:
+        return None
+
+
+def _canonical_source(tokens: list[str]) -> str | None:
+    """Get the canonical form of a pool directive, as rendered by the time source models.
+
+    Args:
+        tokens: The directive tokens, starting with the directive name.
+
+    Returns:
+        The canonical directive, None if it can't be represented by a time source model.
+    """
+    source = _source_from_directive(tokens)
+    return None if source is None else source.render()
+
+
+def _describe_source_error(exc: ValueError) -> str:
+    """Describe why a time source URL is invalid, in a single line.
+
+    Args:
+        exc: The parsing error.
+
+    Returns:
+        The error description.
+    """
+    import pydantic
+
+    if isinstance(exc, pydantic.ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc']) or 'url'}: {error['msg']}"
+            for error in exc.errors()
+        )
+    return str(exc)
+
+
+def _canonical_directive(line: str) -> tuple[str, str] | None:
+    """Get the key and the canonical form of a configuration line.
+
+    Args:
+        line: The configuration line.
+
+    Returns:
+        The directive key and the canonical directive, None for empty and comment lines.
+    """
+    tokens = line.split()
+    if not tokens or tokens[0].startswith(_COMMENT_PREFIXES):
+        return None
+    tokens[0] = tokens[0].lower()
+    if tokens[0] in _SOURCE_DIRECTIVES and len(tokens) > 1:
+        key = f"{tokens[0]} {tokens[1]}"
+        canonical = _canonical_source(tokens)
+        if canonical is not None:
+            return key, canonical
+        return key, " ".join([*tokens[:2], *_normalize_arguments(tokens[0], tokens[2:])])
+    return tokens[0], " ".join([tokens[0], *_normalize_arguments(tokens[0], tokens[1:])])
+
+
+@dataclasses.dataclass(frozen=True)
+class Tracking:
+    """Synchronization state reported by ``chronyc tracking``.
+
+    Attributes:
+        reference_id: The reference ID of the selected source, 00000000 if there's none.
+        offset: The offset of the system clock from the true time, in seconds.
+        leap_status: The leap status, "Not synchronised" if chronyd isn't synchronized.
+    """
+
+    reference_id: str
+    offset: float
+    leap_status: str
+
+    @property
+    def synchronized(self) -> bool:
+        """Check if chronyd has selected a source and is synchronized.
+
+        Returns:
+            True if synchronized.
+        """
+        return self.reference_id != "00000000" and self.leap_status != "Not synchronised"
+
+
+class ConfigApplyError(Exception):
+    """The chrony configuration couldn't be applied."""
+
+
+class SourcesFileError(ValueError):
+    """The sources file contains invalid lines.
+
+    Attributes:
+        errors: The line number and the error description of each invalid line.
+    """
+
+    def __init__(self, errors: list[tuple[int, str]]):
+        """Initialize the error.
+
+        Args:
+            errors: The line number and the error description of each invalid line.
+        """
+        super().__init__(f"{len(errors)} invalid line(s) in sources file")
+        self.errors = errors
+
+
+class Chrony:
+    """Chrony service manager."""
+
+    HEALTH_CHECK_TIMEOUT = 10.0
+    HEALTH_CHECK_INTERVAL = 0.5
+    SYNC_CHECK_INTERVAL = 1.0
+    # minpoll of the time sources in bootstrap mode, 16 seconds
+    BOOTSTRAP_MINPOLL = 4
+
+    CONFIG_FILE = pathlib.Path("/etc/chrony/chrony.conf")
+    # single backup file written by older charm revisions, replaced by the backup ring
+    CONFIG_FILE_BACKUP = pathlib.Path("/var/lib/chrony/chrony.conf.bak")
+    CONFIG_BACKUP_DIR = pathlib.Path("/var/lib/chrony/chrony.conf.backups")
+    SOURCES_FILE = pathlib.Path("/etc/chrony/sources.d/chrony-client.sources")
+    CERTS_DIR = pathlib.Path("/etc/chrony/certs")
+    EXPORTER_DIGEST_CACHE_FILE = pathlib.Path("/var/lib/chrony-charm/exporter-digests.json")
+    EXPORTER_DROPIN_FILE = pathlib.Path(
+        "/etc/systemd/system/prometheus-chrony-exporter.service.d/chrony-charm.conf"
+    )
+
+    def __init__(self) -> None:
+        """Initialize the chrony configuration file stores."""
+        self.config = ConfigStore(self.CONFIG_FILE, backup_dir=self.CONFIG_BACKUP_DIR)
+        self.sources_config = ConfigStore(self.SOURCES_FILE)
+        # an upgrade of chrony_exporter by install leaves its restart to configure_exporter
+        self._exporter_restart_pending = False
+
+    def is_installed(self) -> bool:
+        """Check if chrony related packages is installed.
+
+        Returns:
+            True if installed, False otherwise.
+        """
+        if not shutil.which("chrony_exporter"):
+            return False
+        if not shutil.which("chronyc"):
+            return False
+        expected = self._read_exporter_manifest()
+        installed = self.installed_file_digests()
+        for source, target in _manifest_files().items():
+            digest = expected.get(str(source))
+            if digest is None:
+                logger.warning("%s missing from the build manifest", source)
+                return False
+            if digest != installed[str(target)]:
+                return False
+        return True
+
+    @staticmethod
+    def _read_exporter_manifest() -> dict[str, str]:
+        """Read the digests of the bundled chrony_exporter and charm metrics service files.
+
+        The manifest is generated when the charm is built. If it's missing, the digests are
+        calculated from the bundled files instead.
+
+        Returns:
+            A mapping of bundled file path to its SHA-256 digest.
+        """
+        try:
+            manifest = _CHRONY_EXPORTER_MANIFEST_FILE.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            logger.warning("chrony_exporter manifest not found, calculate digests from files")
+            return {str(source): _sha256_file(source) for source in _manifest_files()}
+        digests = {}
+        for line in manifest.splitlines():
+            if not line.strip():
+                continue
+            digest, name = line.split(maxsplit=1)
+            digests[str(_CHRONY_EXPORTER_MANIFEST_FILE.parent / name.lstrip("*"))] = digest
+        return digests
+
+    def _read_exporter_digest_cache(self) -> dict[str, typing.Any]:  # pragma: nocover
+        """Read the digest cache of the installed bundled files.
+
+        Returns:
+            A mapping of installed file path to its cached stat signature and digest.
+        """
+        try:
+            return json.loads(self.EXPORTER_DIGEST_CACHE_FILE.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_exporter_digest_cache(
+        self, cache: dict[str, typing.Any]
+    ) -> None:  # pragma: nocover
+        """Write the digest cache of the installed bundled files.
+
+        Args:
+            cache: A mapping of installed file path to its stat signature and digest.
+        """
+        atomic_write(self.EXPORTER_DIGEST_CACHE_FILE, json.dumps(cache, sort_keys=True))
+
+    @staticmethod
+    def stat_exporter_files() -> dict[str, list[int] | None]:
+        """Get the stat signature of the installed chrony_exporter files.
+
+        Returns:
+            A mapping of installed file path to its stat signature, None if the file is missing.
+        """
+        return {str(target): _stat_signature(target) for target in _CHRONY_EXPORTER_FILES.values()}
+
+    @staticmethod
+    def stat_chrony_binaries() -> dict[str, list[int] | None]:
+        """Get the stat signature of the chrony binaries.
+
+        Returns:
+            A mapping of binary path to its stat signature, None if the binary is missing.
+        """
+        return {str(path): _stat_signature(path) for path in _CHRONY_BINARIES}
+
+    @staticmethod
+    def stat_metrics_service_files() -> dict[str, list[int] | None]:
+        """Get the stat signature of the installed charm metrics service files.
 
-class Chrony:
-    """Chrony service manager."""
+        Returns:
+            A mapping of installed file path to its stat signature, None if the file is missing.
+        """
+        return {str(target): _stat_signature(target) for target in _METRICS_SERVICE_FILES.values()}
 
-    CONFIG_FILE = pathlib.Path("/etc/chrony/chrony.conf")
-    CONFIG_FILE_BACKUP = pathlib.Path("/var/lib/chrony/chrony.conf.bak")
-    CERTS_DIR = pathlib.Path("/etc/chrony/certs")
+    def installed_file_digests(self) -> dict[str, str | None]:
+        """Get the SHA-256 digest of the installed chrony_exporter and charm metrics service files.
 
-    @staticmethod
-    def is_installed() -> bool:
-        """Check if chrony related packages is installed.
+        Digests are cached by the stat signature of the file, a file is only hashed again if
+        its stat signature changed.
 
         Returns:
-            True if installed, False otherwise.
+            A mapping of installed file path to its digest, None if the file is missing.
         """
-        if not shutil.which("chrony_exporter"):
-            return False
-        if not shutil.which("chronyc"):
-            return False
-        for source, target in _CHRONY_EXPORTER_FILES.items():
-            if source.read_bytes() != target.read_bytes():
-                return False
-        return True
+        cache = self._read_exporter_digest_cache()
+        digests: dict[str, str | None] = {}
+        cache_changed = False
+        signatures = {**self.stat_exporter_files(), **self.stat_metrics_service_files()}
+        for target, signature in signatures.items():
+            if signature is None:
+                digests[target] = None
+                cache_changed = cache.pop(target, None) is not None or cache_changed
+                continue
+            cached = cache.get(target)
+            if cached is not None and cached["stat"] == signature:
+                digests[target] = cached["sha256"]
+                continue
+            digests[target] = _sha256_file(pathlib.Path(target))
+            cache[target] = {"stat": signature, "sha256": digests[target]}
+            cache_changed = True
+        if cache_changed:
+            self._write_exporter_digest_cache(cache)
+        return digests
 
     def install(self) -> None:  # pragma: nocover
         """Install or upgrade Chrony on the system."""
-        apt.add_package(
-            ["chrony", "ca-certificates"],
-            update_cache=True,
-        )
-        if not shutil.which("chrony_exporter"):
-            self._install_chrony_exporter()
-        else:
-            self._upgrade_chrony_exporter()
+        from charms.operator_libs_linux.v0 import apt
+
+        with timing.span("install"):
+            with timing.span("install.apt"):
+                apt.add_package(
+                    ["chrony", "ca-certificates"],
+                    update_cache=True,
+                )
+            if not shutil.which("chrony_exporter"):
+                self._install_chrony_exporter()
+            else:
+                self._upgrade_chrony_exporter()
+            self._install_metrics_service()
 
     def uninstall(self) -> None:
         """Uninstall installed packages from the system.
@@ -222,15 +1298,19 @@ class Chrony:
         Not all packages will be uninstalled, as some are system defaults.
         For example, ca-certificates and chrony (as in Ubuntu 26.04).
         """
-        self._uninstall_chrony_exporter()
+        with timing.span("uninstall"):
+            self._uninstall_chrony_exporter()
+            self._uninstall_metrics_service()
 
     def read_config(self) -> str:
         """Read the current chrony configuration file.
 
+        Use the config attribute to avoid reading the file more than once.
+
         Returns:
             The current chrony configuration file content.
         """
-        return self.CONFIG_FILE.read_text(encoding="utf-8")  # pragma: nocover
+        return self.config.load()
 
     def write_config(self, config: str) -> None:
         """Write the chrony configuration file.
@@ -238,22 +1318,119 @@ class Chrony:
         Args:
             config: The new chrony configuration file content.
         """
-        self.CONFIG_FILE.write_text(config, encoding="utf-8")  # pragma: nocover
+        with timing.span("write"):
+            self.config.write(config)
+
+    def read_sources_config(self) -> str:
+        """Read the current charm managed chrony sources file.
+
+        Use the sources_config attribute to avoid reading the file more than once.
+
+        Returns:
+            The current sources file content, empty string if the file doesn't exist.
+        """
+        return self.sources_config.load()
+
+    def write_sources_config(self, config: str) -> None:
+        """Write the charm managed chrony sources file.
+
+        Args:
+            config: The new sources file content.
+        """
+        with timing.span("write-sources"):
+            self.sources_config.write(config)
+
+    def remove_sources_config(self) -> None:
+        """Remove the charm managed chrony sources file."""
+        self.sources_config.remove()
+
+    @staticmethod
+    def _chronyc(*args: str) -> str:  # pragma: nocover
+        """Run a chronyc command.
+
+        Args:
+            args: chronyc arguments.
+
+        Returns:
+            The command output.
+        """
+        process = subprocess.run(  # nosec B603
+            ["/usr/bin/chronyc", *args], check=True, capture_output=True, text=True, timeout=30
+        )
+        return process.stdout
+
+    def reload_sources(self) -> None:
+        """Reload the sources files in the running chrony service, without a restart."""
+        with timing.span("reload-sources"):
+            self._chronyc("reload", "sources")
+
+    def _source_addresses(self) -> dict[str, list[str]]:
+        """Get the addresses of the NTP sources in the running chrony service.
+
+        Returns:
+            A mapping of the configured source name (for example, the pool host) to the
+            addresses of the sources currently in use.
+        """
+        addresses = self._chronyc("-c", "-n", "sources").splitlines()
+        names = self._chronyc("-c", "-N", "sources").splitlines()
+        if len(addresses) != len(names):
+            # the source list changed between the two commands
+            return {}
+        result: dict[str, list[str]] = collections.defaultdict(list)
+        for address, name in zip(addresses, names, strict=True):
+            address_fields, name_fields = address.split(","), name.split(",")
+            if address_fields[0] == "#":
+                continue
+            result[name_fields[2]].append(address_fields[2])
+        return dict(result)
+
+    def apply_source_options(self, changes: dict[str, dict[str, typing.Any]]) -> bool:
+        """Apply changed source options to the running chrony service with chronyc.
+
+        Args:
+            changes: A mapping of source host to the changed options and their new value,
+                see diff_source_options.
+
+        Returns:
+            True if all changes were applied, False otherwise.
+        """
+        with timing.span("apply-source-options"):
+            try:
+                addresses = self._source_addresses()
+            except subprocess.SubprocessError:
+                logger.exception("failed to list chrony sources")
+                return False
+            commands = []
+            for host, options in sorted(changes.items()):
+                if not addresses.get(host):
+                    logger.info("no source of %s in use, can't change its options", host)
+                    return False
+                for address in addresses[host]:
+                    for option, value in sorted(options.items()):
+                        if option == "offline":
+                            commands.append(f"{'offline' if value else 'online'} {address}")
+                        else:
+                            commands.append(f"{option} {address} {value}")
+            try:
+                self._chronyc("-m", *commands)
+            except subprocess.SubprocessError:
+                logger.exception("failed to change chrony source options")
+                return False
+        return True
 
     def backup_config(self) -> None:
         """Backup the current chrony configuration file."""
-        if self.CONFIG_FILE_BACKUP.exists():
-            logger.warning("failed to backup configuration file: backup already exists")
-            return
-        self.CONFIG_FILE_BACKUP.write_text(self.read_config(), encoding="utf-8")
+        self.config.backup()
 
     def restore_config(self) -> None:
         """Restore the chrony configuration file from backup."""
-        if not self.CONFIG_FILE_BACKUP.exists():
-            logger.warning("failed to restore chrony configuration file from backup: no backup")
+        if self.config.restore():
+            return
+        if self.CONFIG_FILE_BACKUP.exists():
+            self.config.write(self.CONFIG_FILE_BACKUP.read_text(encoding="utf-8"))
+            self.CONFIG_FILE_BACKUP.unlink()
             return
-        self.write_config(self.CONFIG_FILE_BACKUP.read_text(encoding="utf-8"))
-        self.CONFIG_FILE_BACKUP.unlink()
+        logger.warning("failed to restore chrony configuration file from backup: no backup")
 
     def _make_certs_dir(self) -> None:  # pragma: nocover
         """Create the chrony TLS certificates directory."""
@@ -276,8 +1453,7 @@ class Chrony:
             path: The path to the certificate file.
             content: The content to write to the file.
         """
-        path.touch(mode=0o600, exist_ok=True)
-        path.write_text(content, encoding="utf-8")
+        atomic_write(path, content, mode=0o600)
         shutil.chown(path, "_chrony", "_chrony")
 
     @staticmethod
@@ -364,9 +1540,202 @@ class Chrony:
                 self._write_certs_file(key_file, key_pair.key)
 
     @staticmethod
-    def restart() -> None:
+    def restart() -> None:  # pragma: nocover
         """Restart the chrony service."""
-        systemd.service_restart("chrony")  # pragma: nocover
+        from charms.operator_libs_linux.v1 import systemd
+
+        with timing.span("restart"):
+            systemd.service_restart("chrony")
+
+    @staticmethod
+    def _service_running() -> bool:  # pragma: nocover
+        """Check if the chrony service is running.
+
+        Returns:
+            True if the chrony service is active.
+        """
+        from charms.operator_libs_linux.v1 import systemd
+
+        return systemd.service_running("chrony")
+
+    @staticmethod
+    def _chronyd(*args: str, stdin: str = "") -> str:  # pragma: nocover
+        """Run chronyd in the foreground.
+
+        Args:
+            args: chronyd arguments.
+            stdin: The standard input.
+
+        Returns:
+            The command output.
+        """
+        process = subprocess.run(  # nosec B603
+            ["/usr/sbin/chronyd", *args],
+            input=stdin,
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        return process.stdout
+
+    def validate_config(self, config: str, sources_config: str) -> None:
+        """Check the syntax of a candidate configuration with chronyd in parse-only mode.
+
+        Args:
+            config: The candidate chrony configuration file content.
+            sources_config: The candidate sources file content.
+
+        Raises:
+            ConfigApplyError: If chronyd rejects the configuration.
+        """
+        with timing.span("validate"):
+            try:
+                self._chronyd("-p", "-f", "/dev/stdin", stdin=f"{config}\n{sources_config}")
+            except subprocess.CalledProcessError as exc:
+                logger.error("chronyd rejected the configuration: %s", exc.stderr)
+                raise ConfigApplyError("chronyd rejected the configuration") from exc
+
+    def tracking(self) -> Tracking | None:
+        """Get the synchronization state of the running chrony service.
+
+        Returns:
+            The tracking state, None if chronyc didn't answer.
+        """
+        try:
+            fields = self._chronyc("-c", "tracking").strip().split(",")
+            return Tracking(
+                reference_id=fields[0], offset=float(fields[4]), leap_status=fields[13]
+            )
+        except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+            logger.debug("chronyc tracking failed", exc_info=True)
+            return None
+
+    @staticmethod
+    def _journalctl(*args: str) -> str:  # pragma: nocover
+        """Run a journalctl command.
+
+        Args:
+            args: journalctl arguments.
+
+        Returns:
+            The command output, journalctl fails when no entry matches.
+        """
+        process = subprocess.run(  # nosec B603
+            ["/usr/bin/journalctl", *args], check=False, capture_output=True, text=True, timeout=30
+        )
+        return process.stdout
+
+    def first_source_selection(self, boot_id: str, monotonic: float) -> float | None:
+        """Get the time chronyd first selected a source after a restart, from its journal.
+
+        chronyd logs the selection of a source, which also updates the leap status from
+        unsynchronised, so the time of the first selection is the time chrony synchronized.
+
+        Args:
+            boot_id: The boot ID of the restart.
+            monotonic: The CLOCK_MONOTONIC time of the restart, in seconds.
+
+        Returns:
+            The CLOCK_MONOTONIC time of the first source selection, in seconds, None if chronyd
+            didn't select a source since the restart.
+        """
+        try:
+            output = self._journalctl(
+                "--unit=chrony.service",
+                f"--boot={boot_id}",
+                "--grep=^Selected source",
+                "--output=json",
+                "--output-fields=MESSAGE",
+                "--quiet",
+            )
+        except (OSError, subprocess.SubprocessError):
+            logger.debug("journalctl failed", exc_info=True)
+            return None
+        for line in output.splitlines():
+            try:
+                selected = int(json.loads(line)["__MONOTONIC_TIMESTAMP"]) / 1e6
+            except (KeyError, TypeError, ValueError):
+                continue
+            if selected >= monotonic:
+                return selected
+        return None
+
+    def wait_sync(
+        self,
+        timeout: float,
+        max_offset: float,
+        report: typing.Callable[[Tracking | None], None],
+    ) -> Tracking | None:
+        """Wait for chrony to synchronize with an offset within a bound, like chronyc waitsync.
+
+        The tracking state is checked at least once, even with a zero timeout.
+
+        Args:
+            timeout: Maximum time to wait, in seconds.
+            max_offset: Maximum absolute offset of the system clock, in seconds.
+            report: Called with the tracking state after each unsuccessful check.
+
+        Returns:
+            The synchronized tracking state, None if chrony isn't synchronized within the
+            timeout.
+        """
+        with timing.span("sync-wait"):
+            deadline = time.monotonic() + timeout
+            while True:
+                tracking = self.tracking()
+                if tracking and tracking.synchronized and abs(tracking.offset) <= max_offset:
+                    return tracking
+                report(tracking)
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(min(self.SYNC_CHECK_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+    def check_health(self) -> None:
+        """Wait for the chrony service to run and answer chronyc requests.
+
+        Raises:
+            ConfigApplyError: If chrony is not healthy within the health check timeout.
+        """
+        with timing.span("health-check"):
+            deadline = time.monotonic() + self.HEALTH_CHECK_TIMEOUT
+            while True:
+                if self._service_running():
+                    try:
+                        self._chronyc("-n", "tracking")
+                        return
+                    except subprocess.SubprocessError:
+                        logger.debug("chronyd is not answering yet")
+                if time.monotonic() >= deadline:
+                    raise ConfigApplyError("chronyd unhealthy, configuration rolled back")
+                time.sleep(self.HEALTH_CHECK_INTERVAL)
+
+    @contextlib.contextmanager
+    def transaction(self, snapshot: tuple[str, str] | None = None) -> typing.Iterator[None]:
+        """Restore the configuration files and restart chrony if applying them fails.
+
+        Args:
+            snapshot: The chrony configuration and sources file contents to restore, the
+                current contents by default.
+
+        Yields:
+            None.
+        """
+        config, sources_config = snapshot or (self.config.content, self.sources_config.content)
+        try:
+            yield
+        except Exception:
+            logger.exception("failed to apply chrony configuration, roll back")
+            if self.config.content == config and self.sources_config.content == sources_config:
+                raise
+            with timing.span("rollback"):
+                if not sources_config:
+                    self.sources_config.remove()
+                else:
+                    self.sources_config.write(sources_config)
+                self.config.write(config)
+                self.restart()
+            raise
 
     @staticmethod
     def parse_source_url(url: str) -> TimeSource:
@@ -385,26 +1754,239 @@ class Chrony:
             return _NtpSource.from_source_url(url)
         if url.startswith("nts://"):
             return _NtsSource.from_source_url(url)
+        if url.startswith("refclock://"):
+            return _RefclockSource.from_source_url(url)
         raise ValueError(f"Invalid time source URL: {url}")
 
     @staticmethod
-    def new_config(sources: list[TimeSource], header: str = "") -> str:
+    def _open_sources_file(path: pathlib.Path) -> typing.TextIO:
+        """Open a sources file for reading, decompressing it if needed.
+
+        Args:
+            path: The path to the sources file.
+
+        Returns:
+            The text stream of the sources file.
+        """
+        import bz2
+        import gzip
+        import lzma
+
+        with path.open("rb") as file:
+            magic = file.read(6)
+        if magic.startswith(b"\x1f\x8b"):
+            return gzip.open(path, "rt", encoding="utf-8")
+        if magic.startswith(b"BZh"):
+            return bz2.open(path, "rt", encoding="utf-8")
+        if magic.startswith(b"\xfd7zXZ\x00"):
+            return lzma.open(path, "rt", encoding="utf-8")
+        return path.open("r", encoding="utf-8")
+
+    @classmethod
+    def parse_sources_file(cls, path: pathlib.Path) -> list[TimeSource]:
+        """Parse time sources from a file of time source URLs, one per line.
+
+        The file is read line by line and can be gzip, bzip2 or xz compressed. Blank lines and
+        lines starting with # are ignored. Every invalid line is reported, not only the first.
+
+        Args:
+            path: The path to the sources file.
+
+        Returns:
+            Parsed time sources, in the order of the file.
+
+        Raises:
+            SourcesFileError: If any line is not a valid time source URL, or the file can't be
+                read.
+        """
+        import lzma
+
+        sources = []
+        errors = []
+        number = 0
+        with timing.span("parse-sources-file"):
+            try:
+                with cls._open_sources_file(path) as file:
+                    for number, line in enumerate(file, start=1):
+                        url = line.strip()
+                        if not url or url.startswith("#"):
+                            continue
+                        try:
+                            sources.append(cls.parse_source_url(url))
+                        except ValueError as exc:
+                            errors.append((number, _describe_source_error(exc)))
+            except (OSError, EOFError, lzma.LZMAError, UnicodeDecodeError) as exc:
+                errors.append((number + 1, f"unreadable file: {exc}"))
+        if errors:
+            raise SourcesFileError(errors)
+        return sources
+
+    @staticmethod
+    def parse_sources_config(content: str) -> list[TimeSource] | None:
+        """Parse the time sources of a sources file generated by new_sources_config.
+
+        Args:
+            content: The sources file content.
+
+        Returns:
+            The time sources, None if a directive can't be represented by a time source model.
+        """
+        sources = []
+        for line in content.splitlines():
+            tokens = line.split()
+            if not tokens or tokens[0].startswith(_COMMENT_PREFIXES):
+                continue
+            source = _source_from_directive(tokens)
+            if source is None:
+                return None
+            sources.append(source)
+        return sources
+
+    @staticmethod
+    def normalize_sources(sources: typing.Iterable[TimeSource]) -> NormalizedSources:
+        """Normalize time sources and merge the duplicates.
+
+        Hosts are lower-cased and default ports (123 for NTP, 4460 for NTS-KE) are dropped,
+        option values are already coerced to their canonical type by the time source models.
+        Sources with the same scheme, host, port and type are merged: flags set in any of them
+        are kept and for other options the last value wins. The result is sorted, so the order
+        of the configured sources doesn't change the rendered sources file.
+
+        Args:
+            sources: The time sources.
+
+        Returns:
+            The normalized time sources and the description of the merged duplicates.
+        """
+        unique: dict[tuple[str, str, int | None, str], TimeSource] = {}
+        merged = []
+        for source in sources:
+            source = _normalize_source(source)
+            key = _source_key(source)
+            previous = unique.get(key)
+            if previous is None:
+                unique[key] = source
+                continue
+            before = previous.model_dump(exclude_defaults=True)
+            after = source.model_dump(exclude_defaults=True)
+            conflicts = [
+                f"{option} {before[option]} -> {value}"
+                for option, value in sorted(after.items())
+                if option in before and before[option] != value
+            ]
+            unique[key] = type(source)(**{**before, **after})
+            merged.append(
+                _describe_source(key) + (f" ({', '.join(conflicts)})" if conflicts else "")
+            )
+        return NormalizedSources(
+            sources=tuple(
+                unique[key] for key in sorted(unique, key=lambda k: (k[1], k[0], k[2] or 0, k[3]))
+            ),
+            merged=tuple(merged),
+        )
+
+    @staticmethod
+    def diff_source_options(
+        old: list[TimeSource], new: list[TimeSource]
+    ) -> dict[str, dict[str, typing.Any]] | None:
+        """Compare the options of two lists of the same time sources.
+
+        Args:
+            old: Time sources before the change.
+            new: Time sources after the change.
+
+        Returns:
+            A mapping of source host to the changed options and their new value, or None if
+            sources were added or removed, or an option without a runtime equivalent changed.
+        """
+        old_sources = {(type(s), s.host): s for s in old}
+        new_sources = {(type(s), s.host): s for s in new}
+        if len(old_sources) != len(old) or len(new_sources) != len(new):
+            # the same host is used more than once, the chrony sources can't be told apart
+            return None
+        if old_sources.keys() != new_sources.keys():
+            return None
+        changes = {}
+        for key, after in new_sources.items():
+            before, after_values = old_sources[key].model_dump(), after.model_dump()
+            changed = {k: v for k, v in after_values.items() if before[k] != v}
+            if any(k not in _RUNTIME_SOURCE_OPTIONS or v is None for k, v in changed.items()):
+                return None
+            if changed:
+                changes[after.host] = changed
+        return changes
+
+    @staticmethod
+    def parse_config(content: str) -> dict[str, list[str]]:
+        """Parse a chrony configuration into canonical directives.
+
+        Comments, blank lines, whitespace, directive order and equivalent spellings of the
+        arguments, such as ``100.0`` and ``100``, don't affect the result. Pool directives are
+        canonicalized with the time source models, so rendering a parsed source gives the same
+        canonical directive.
+
+        Args:
+            content: The chrony configuration content.
+
+        Returns:
+            A mapping of the directive key to the sorted canonical directives with that key.
+        """
+        directives: dict[str, list[str]] = collections.defaultdict(list)
+        for line in content.splitlines():
+            parsed = _canonical_directive(line)
+            if parsed is not None:
+                directives[parsed[0]].append(parsed[1])
+        return {key: sorted(values) for key, values in directives.items()}
+
+    @classmethod
+    def diff_config(cls, old: str, new: str) -> ConfigDiff:
+        """Compare two chrony configurations semantically.
+
+        Args:
+            old: The old configuration content.
+            new: The new configuration content.
+
+        Returns:
+            The semantic difference.
+        """
+        before, after = cls.parse_config(old), cls.parse_config(new)
+        added: list[str] = []
+        removed: list[str] = []
+        changed: list[tuple[str, str]] = []
+        for key in sorted(before.keys() | after.keys()):
+            old_directives = collections.Counter(before.get(key, ()))
+            new_directives = collections.Counter(after.get(key, ()))
+            only_old = list((old_directives - new_directives).elements())
+            only_new = list((new_directives - old_directives).elements())
+            # a single directive of the same key on both sides changed its arguments
+            if len(only_old) == len(only_new) == 1:
+                changed.append((only_old[0], only_new[0]))
+            else:
+                removed.extend(only_old)
+                added.extend(only_new)
+        return ConfigDiff(added=tuple(added), removed=tuple(removed), changed=tuple(changed))
+
+    @staticmethod
+    def new_config(
+        header: str = "", bootstrap: bool = False, refclocks: list[TimeSource] | None = None
+    ) -> str:
         """Generate the chrony configuration file content.
 
+        The network time sources are not part of the configuration file, they are loaded from
+        the sources file (see new_sources_config) through the sourcedir directive. Reference
+        clocks can't be loaded from a sources file, they are rendered in the configuration file.
+
         Args:
             header: Optional header in the configuration file.
-            sources: List of chrony time sources.
+            bootstrap: Step the clock on any update with an offset above 0.1 seconds, instead of
+                the first three updates with an offset above 1 second.
+            refclocks: Reference clocks, see split_refclocks.
 
         Returns:
             Generated chrony configuration file content.
-
-        Raises:
-            ValueError: If no sources are provided.
         """
-        if not sources:
-            raise ValueError("No time sources provided")
-        sources_config = "\n".join(s.render() for s in sources)
-        static = textwrap.dedent("""\
+        makestep = "makestep 0.1 -1" if bootstrap else "makestep 1 3"
+        static = textwrap.dedent(f"""\
                 sourcedir /run/chrony-dhcp
                 sourcedir /etc/chrony/sources.d
                 keyfile /etc/chrony/chrony.keys
@@ -413,38 +1995,276 @@ class Chrony:
                 logdir /var/log/chrony
                 maxupdateskew 100.0
                 rtcsync
-                makestep 1 3
+                {makestep}
                 leapsectz right/UTC
             """)
-        return "\n\n".join(part for part in [header, sources_config, static] if part).lstrip()
+        if refclocks:
+            static += "\n" + "".join(f"{refclock.render()}\n" for refclock in refclocks)
+        return "\n\n".join(part for part in [header, static] if part).lstrip()
+
+    @classmethod
+    def bootstrap_sources(cls, sources: list[TimeSource]) -> list[TimeSource]:
+        """Add the fast convergence options of the bootstrap mode to time sources.
+
+        Args:
+            sources: The time sources.
+
+        Returns:
+            The time sources with the iburst and burst options, polled at most every
+            2^BOOTSTRAP_MINPOLL seconds.
+        """
+        bootstrapped = []
+        for source in sources:
+            options = source.model_dump(exclude_defaults=True)
+            minpoll = min(
+                cls.BOOTSTRAP_MINPOLL,
+                options.get("minpoll", cls.BOOTSTRAP_MINPOLL),
+                options.get("maxpoll", cls.BOOTSTRAP_MINPOLL),
+            )
+            bootstrapped.append(
+                source.model_copy(update={"iburst": True, "burst": True, "minpoll": minpoll})
+            )
+        return bootstrapped
+
+    @staticmethod
+    def split_refclocks(sources: list[TimeSource]) -> tuple[list[TimeSource], list[TimeSource]]:
+        """Split the reference clocks from the network time sources.
+
+        Args:
+            sources: The time sources.
+
+        Returns:
+            The network time sources and the reference clocks.
+        """
+        network: list[TimeSource] = []
+        refclocks: list[TimeSource] = []
+        for source in sources:
+            (refclocks if isinstance(source, _RefclockSource) else network).append(source)
+        return network, refclocks
+
+    @staticmethod
+    def pool_hosts(sources: list[TimeSource]) -> list[str]:
+        """Get the hosts of the NTP pools, which can be pre-resolved by the charm.
+
+        Args:
+            sources: The time sources.
+
+        Returns:
+            The hosts of the NTP pool sources.
+        """
+        return [source.host for source in sources if type(source) is _NtpSource]
+
+    @staticmethod
+    def resolved_sources(
+        sources: list[TimeSource],
+        addresses: dict[str, list[list[str]]],
+        family: str = "",
+        servers: bool = False,
+    ) -> list[TimeSource]:
+        """Apply the pre-resolved addresses of the NTP pool hosts to time sources.
+
+        With a preferred address family, only the addresses of that family are used if the host
+        has any, and the pool directive of the host gets the ipv4 or ipv6 option. With servers,
+        the pool is replaced by server directives for up to maxsources of its addresses. NTS
+        sources are kept as they are, the NTS-KE server name must match its certificate.
+
+        Args:
+            sources: The time sources.
+            addresses: The address family name and the address of each address of the resolved
+                hosts, see resolve.resolve_hosts.
+            family: The preferred address family, ipv4, ipv6 or empty for any.
+            servers: Replace the pools with server directives of their addresses.
+
+        Returns:
+            The time sources with the resolved addresses applied.
+        """
+        result: list[TimeSource] = []
+        seen = set()
+        for source in sources:
+            resolved = addresses.get(source.host) if type(source) is _NtpSource else None
+            if not resolved:
+                result.append(source)
+                continue
+            preferred = [address for name, address in resolved if name == family]
+            if not servers:
+                result.append(source.model_copy(update={family: True}) if preferred else source)
+                continue
+            options = source.model_dump(exclude_defaults=True)
+            del options["host"]
+            count = options.pop("maxsources", None) or _POOL_MAXSOURCES
+            for address in (preferred or [address for _, address in resolved])[:count]:
+                if (address, options.get("port")) not in seen:
+                    seen.add((address, options.get("port")))
+                    result.append(_NtpServerSource(host=address, **options))
+        return result
+
+    @staticmethod
+    def new_sources_config(sources: list[TimeSource], header: str = "") -> str:
+        """Generate the chrony sources file content.
+
+        Args:
+            header: Optional header in the sources file.
+            sources: List of chrony network time sources, empty if only reference clocks are
+                configured.
+
+        Returns:
+            Generated chrony sources file content.
+        """
+        sources_config = "".join(f"{s.render()}\n" for s in sources)
+        return "\n\n".join(part for part in [header, sources_config] if part).lstrip()
+
+    @staticmethod
+    def new_exporter_dropin(collectors: typing.Collection[str], dns_lookups: bool) -> str:
+        """Generate the chrony_exporter systemd drop-in.
+
+        Every collector is explicitly enabled or disabled, since the chrony_exporter defaults
+        differ from the packaged service file.
+
+        Args:
+            collectors: The enabled collectors, from EXPORTER_COLLECTORS.
+            dns_lookups: Whether the sources collector resolves the source addresses.
+
+        Returns:
+            The drop-in content, empty if the packaged service file already matches.
+        """
+        if set(collectors) == set(EXPORTER_COLLECTORS) and dns_lookups:
+            return ""
+        flags = [
+            f"--{'' if collector in collectors else 'no-'}collector.{collector}"
+            for collector in EXPORTER_COLLECTORS
+        ]
+        flags.append(f"--{'' if dns_lookups else 'no-'}collector.dns-lookups")
+        return textwrap.dedent(
+            f"""\
+            # This is managed by chrony-client charm (https://charmhub.io/chrony-client).
+            # Do not edit.
+            [Service]
+            ExecStart=
+            ExecStart={_CHRONY_EXPORTER_COMMAND} {" ".join(flags)}
+            """
+        )
+
+    def configure_exporter(self, collectors: typing.Collection[str], dns_lookups: bool) -> bool:
+        """Configure the chrony_exporter collectors with a systemd drop-in.
+
+        The exporter is restarted once, only if the drop-in changed or install upgraded it.
+
+        Args:
+            collectors: The enabled collectors, from EXPORTER_COLLECTORS.
+            dns_lookups: Whether the sources collector resolves the source addresses.
+
+        Returns:
+            True if the drop-in changed and the exporter was restarted.
+        """
+        dropin = self.new_exporter_dropin(collectors, dns_lookups)
+        # the default collectors need no drop-in, which is the common case
+        if not dropin and not self.EXPORTER_DROPIN_FILE.exists():
+            self.restart_pending_exporter()
+            return False
+        try:
+            current = self.EXPORTER_DROPIN_FILE.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            current = ""
+        if dropin == current:
+            self.restart_pending_exporter()
+            return False
+        if dropin:
+            atomic_write(self.EXPORTER_DROPIN_FILE, dropin)
+        else:
+            self.EXPORTER_DROPIN_FILE.unlink()
+        self._exporter_restart_pending = True
+        self.restart_pending_exporter()
+        return True
+
+    def restart_pending_exporter(self) -> None:
+        """Restart chrony_exporter if install upgraded it, and configure_exporter didn't run."""
+        if not self._exporter_restart_pending:
+            return
+        self._exporter_restart_pending = False
+        with timing.span("exporter-restart"):
+            self._restart_exporter()
+
+    @staticmethod
+    def _restart_exporter() -> None:  # pragma: nocover
+        """Reload the systemd units and restart chrony_exporter."""
+        from charms.operator_libs_linux.v1 import systemd
+
+        systemd.daemon_reload()
+        systemd.service_restart(_CHRONY_EXPORTER_SERVICE_NAME)
 
     def _install_chrony_exporter_files(self) -> None:
         """Install chrony_exporter files."""
+        manifest = self._read_exporter_manifest()
+        cache = self._read_exporter_digest_cache()
         for source, dest in _CHRONY_EXPORTER_FILES.items():
             executable = os.access(source, os.X_OK)
             if executable:
                 dest.unlink(missing_ok=True)
             shutil.copy(source, dest)
             os.chmod(dest, 0o755 if executable else 0o644)
+            # the installed copy is identical to the bundled file, no need to hash it again
+            cache[str(dest)] = {"stat": _stat_signature(dest), "sha256": manifest[str(source)]}
+        self._write_exporter_digest_cache(cache)
 
     def _install_chrony_exporter(self) -> None:
         """Install chrony_exporter service."""
-        self._install_chrony_exporter_files()
-        systemd.service_reload("apparmor")
-        systemd.service_enable(_CHRONY_EXPORTER_SERVICE_NAME)
-        systemd.service_start(_CHRONY_EXPORTER_SERVICE_NAME)
+        from charms.operator_libs_linux.v1 import systemd
+
+        with timing.span("install.exporter-files"):
+            self._install_chrony_exporter_files()
+        with timing.span("install.apparmor-reload"):
+            systemd.service_reload("apparmor")
+        with timing.span("install.exporter-service"):
+            systemd.service_enable(_CHRONY_EXPORTER_SERVICE_NAME)
+            systemd.service_start(_CHRONY_EXPORTER_SERVICE_NAME)
 
     def _upgrade_chrony_exporter(self) -> None:
-        self._install_chrony_exporter_files()
+        from charms.operator_libs_linux.v1 import systemd
+
+        with timing.span("install.exporter-files"):
+            self._install_chrony_exporter_files()
+        with timing.span("install.apparmor-reload"):
+            systemd.daemon_reload()
+            systemd.service_reload("apparmor")
+        # restarted once by configure_exporter, along with a change of its drop-in
+        self._exporter_restart_pending = True
+
+    def _install_metrics_service(self) -> None:  # pragma: nocover
+        """Install or upgrade the socket activated charm metrics service."""
+        from charms.operator_libs_linux.v1 import systemd
+
+        with timing.span("install.metrics-service"):
+            manifest = self._read_exporter_manifest()
+            cache = self._read_exporter_digest_cache()
+            for source, dest in _METRICS_SERVICE_FILES.items():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy(source, dest)
+                os.chmod(dest, 0o644)
+                cache[str(dest)] = {"stat": _stat_signature(dest), "sha256": manifest[str(source)]}
+            self._write_exporter_digest_cache(cache)
+            systemd.daemon_reload()
+            systemd.service_enable(_METRICS_SOCKET_NAME)
+            systemd.service_restart(_METRICS_SOCKET_NAME)
+
+    @staticmethod
+    def _uninstall_metrics_service() -> None:  # pragma: nocover
+        """Uninstall the charm metrics service."""
+        from charms.operator_libs_linux.v1 import systemd
+
+        systemd.service_stop(_METRICS_SOCKET_NAME)
+        systemd.service_disable(_METRICS_SOCKET_NAME)
+        for dest in _METRICS_SERVICE_FILES.values():
+            dest.unlink(missing_ok=True)
         systemd.daemon_reload()
-        systemd.service_reload("apparmor")
-        systemd.service_restart(_CHRONY_EXPORTER_SERVICE_NAME)
 
     def _uninstall_chrony_exporter(self) -> None:
         """Uninstall chrony_exporter service."""
+        from charms.operator_libs_linux.v1 import systemd
+
         systemd.service_stop("prometheus-chrony-exporter")
         systemd.service_disable("prometheus-chrony-exporter")
         os.unlink(_CHRONY_EXPORTER_SERVICE_FILE)
         os.unlink(_CHRONY_EXPORTER_APPARMOR_FILE)
+        self.EXPORTER_DROPIN_FILE.unlink(missing_ok=True)
         systemd.service_reload("apparmor")
         os.unlink(_CHRONY_EXPORTER_BIN_FILE)
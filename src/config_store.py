@@ -0,0 +1,201 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Configuration file store.
+
+The store reads a configuration file at most once and keeps its content and digest in
+memory. Writes replace the file atomically, so a reader never sees a partially written file,
+even if the hook is killed in the middle of the write.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+
+logger = logging.getLogger(__name__)
+
+_BACKUP_INDEX_FILE_NAME = "index.json"
+
+
+def atomic_write(path: pathlib.Path, content: str, mode: int = 0o644) -> None:
+    """Replace the content of a file atomically.
+
+    The content is written and synced to a temporary file in the same directory, which is then
+    renamed over the file.
+
+    Args:
+        path: The path to the file.
+        content: The new file content.
+        mode: The permission of the file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def sha256(content: str) -> str:
+    """Calculate the SHA-256 digest of a text content.
+
+    Args:
+        content: The text content.
+
+    Returns:
+        The hex encoded SHA-256 digest.
+    """
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ConfigStore:
+    """A configuration file, read at most once.
+
+    Attributes:
+        path: The path to the configuration file.
+        backup_dir: The directory of the backup ring, None if backups are not supported.
+        backup_count: The maximum number of backups kept in the backup ring.
+    """
+
+    def __init__(
+        self, path: pathlib.Path, backup_dir: pathlib.Path | None = None, backup_count: int = 5
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            path: The path to the configuration file.
+            backup_dir: The directory of the backup ring, None if backups are not supported.
+            backup_count: The maximum number of backups kept in the backup ring.
+        """
+        self.path = path
+        self.backup_dir = backup_dir
+        self.backup_count = backup_count
+        self._content: str | None = None
+        self._sha256 = ""
+
+    def load(self) -> str:
+        """Read the configuration file, discarding the content in memory.
+
+        Returns:
+            The configuration file content, empty string if the file doesn't exist.
+        """
+        try:
+            content = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            content = ""
+        self._set_content(content)
+        return content
+
+    def _set_content(self, content: str) -> None:
+        """Set the content in memory.
+
+        Args:
+            content: The configuration file content.
+        """
+        self._content = content
+        self._sha256 = sha256(content)
+
+    @property
+    def content(self) -> str:
+        """The configuration file content, empty string if the file doesn't exist."""
+        if self._content is None:
+            return self.load()
+        return self._content
+
+    @property
+    def sha256(self) -> str:
+        """The SHA-256 digest of the configuration file content."""
+        if self._content is None:
+            self.load()
+        return self._sha256
+
+    def write(self, content: str) -> None:
+        """Replace the configuration file atomically.
+
+        Args:
+            content: The new configuration file content.
+        """
+        atomic_write(self.path, content)
+        self._set_content(content)
+
+    def remove(self) -> None:
+        """Remove the configuration file."""
+        self.path.unlink(missing_ok=True)
+        self._set_content("")
+
+    def _read_backup_index(self) -> list[dict[str, str]]:
+        """Read the backup ring index.
+
+        Returns:
+            The backup entries, with the file name and the digest of each backup, newest last.
+        """
+        if self.backup_dir is None:
+            return []
+        try:
+            index = (self.backup_dir / _BACKUP_INDEX_FILE_NAME).read_text(encoding="utf-8")
+            return json.loads(index)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def backup(self) -> None:
+        """Add the current configuration file content to the backup ring.
+
+        The oldest backup is dropped if the ring is full. Backing up a content already in the
+        ring only makes it the newest backup.
+
+        Raises:
+            ValueError: If the store doesn't support backups.
+        """
+        if self.backup_dir is None:
+            raise ValueError(f"backup is not supported for {self.path}")
+        digest = self.sha256
+        index = self._read_backup_index()
+        if index and index[-1]["sha256"] == digest:
+            return
+        entry = next((e for e in index if e["sha256"] == digest), None)
+        if entry is not None:
+            index.remove(entry)
+        else:
+            used = {e["file"] for e in index}
+            slots = (f"{self.path.name}.{i}" for i in range(self.backup_count))
+            free = [f for f in slots if f not in used]
+            # reuse the file of the oldest backup when the ring is full
+            entry = {"file": free[0] if free else index.pop(0)["file"], "sha256": digest}
+            atomic_write(self.backup_dir / entry["file"], self.content)
+        index.append(entry)
+        atomic_write(self.backup_dir / _BACKUP_INDEX_FILE_NAME, json.dumps(index))
+
+    def restore(self) -> bool:
+        """Restore the newest intact backup and discard the backup ring.
+
+        Returns:
+            True if a backup was restored, False if there is no intact backup.
+        """
+        if self.backup_dir is None:
+            return False
+        for entry in reversed(self._read_backup_index()):
+            try:
+                content = (self.backup_dir / entry["file"]).read_text(encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            if sha256(content) != entry["sha256"]:
+                logger.warning("backup %s of %s is corrupted", entry["file"], self.path)
+                continue
+            self.write(content)
+            shutil.rmtree(self.backup_dir)
+            return True
+        return False
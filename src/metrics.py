@@ -0,0 +1,158 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Charm metrics.
+
+The time chrony takes to synchronize after each restart by the charm is recorded in a
+Prometheus histogram, labelled with the hook that restarted chrony. The histogram is kept in
+a JSON file on the machine and rendered in the Prometheus text format after every change.
+The rendered file is served next to chrony_exporter by the socket activated
+chrony-charm-metrics service, see files/chrony-charm-metrics@.service.
+
+The charm starts a measurement before each restart, and ends it in a later hook from the
+CLOCK_MONOTONIC timestamp of the first source selection that chronyd logged after the restart,
+so the measurement doesn't depend on when the later hook runs.
+"""
+
+import json
+import logging
+import pathlib
+import time
+import typing
+
+from config_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = pathlib.Path("/var/lib/chrony-charm/metrics")
+HISTOGRAM_FILE = METRICS_DIR / "time-to-sync.json"
+METRICS_FILE = METRICS_DIR / "metrics.prom"
+BOOT_ID_FILE = pathlib.Path("/proc/sys/kernel/random/boot_id")
+METRICS_PORT = 9124
+TIME_TO_SYNC_BUCKETS = (1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+# measurements without a source selection for this long are discarded, in seconds
+TIME_TO_SYNC_MAX_AGE = 86400.0
+_TIME_TO_SYNC_METRIC = "chrony_charm_time_to_sync_seconds"
+
+
+def read_boot_id() -> str:
+    """Read the boot ID of the machine.
+
+    Returns:
+        The boot ID, empty string if not available.
+    """
+    try:
+        return BOOT_ID_FILE.read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+def _load_histograms() -> dict[str, dict[str, typing.Any]]:
+    """Load the time to sync histograms.
+
+    Returns:
+        The cumulative bucket counts, the sum and the count of each trigger.
+    """
+    try:
+        return json.loads(HISTOGRAM_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("discard the corrupted time to sync histogram file")
+        return {}
+
+
+def render(histograms: dict[str, dict[str, typing.Any]]) -> str:
+    """Render the time to sync histograms in the Prometheus text format.
+
+    Args:
+        histograms: The cumulative bucket counts, the sum and the count of each trigger.
+
+    Returns:
+        The metrics in the Prometheus text format.
+    """
+    lines = [
+        f"# HELP {_TIME_TO_SYNC_METRIC} Time from a chrony restart by the charm until chrony "
+        "is synchronized.",
+        f"# TYPE {_TIME_TO_SYNC_METRIC} histogram",
+    ]
+    for trigger, histogram in sorted(histograms.items()):
+        for bound, count in zip(TIME_TO_SYNC_BUCKETS, histogram["buckets"], strict=True):
+            lines.append(
+                f'{_TIME_TO_SYNC_METRIC}_bucket{{trigger="{trigger}",le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'{_TIME_TO_SYNC_METRIC}_bucket{{trigger="{trigger}",le="+Inf"}} {histogram["count"]}'
+        )
+        lines.append(f'{_TIME_TO_SYNC_METRIC}_sum{{trigger="{trigger}"}} {histogram["sum"]}')
+        lines.append(f'{_TIME_TO_SYNC_METRIC}_count{{trigger="{trigger}"}} {histogram["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def observe_time_to_sync(seconds: float, trigger: str) -> None:
+    """Record a time to sync measurement and render the metrics file.
+
+    Args:
+        seconds: The time from the chrony restart until chrony is synchronized.
+        trigger: The hook that restarted chrony.
+    """
+    histograms = _load_histograms()
+    histogram = histograms.setdefault(
+        trigger, {"buckets": [0] * len(TIME_TO_SYNC_BUCKETS), "sum": 0.0, "count": 0}
+    )
+    for i, bound in enumerate(TIME_TO_SYNC_BUCKETS):
+        if seconds <= bound:
+            histogram["buckets"][i] += 1
+    histogram["sum"] = round(histogram["sum"] + seconds, 3)
+    histogram["count"] += 1
+    atomic_write(HISTOGRAM_FILE, json.dumps(histograms, sort_keys=True))
+    atomic_write(METRICS_FILE, render(histograms))
+
+
+def start_time_to_sync(trigger: str) -> dict[str, typing.Any]:
+    """Start measuring the time until chrony is synchronized, before a restart.
+
+    Args:
+        trigger: The hook restarting chrony.
+
+    Returns:
+        The pending measurement, to keep until finish_time_to_sync records it.
+    """
+    return {
+        "trigger": trigger,
+        "boot_id": read_boot_id(),
+        "monotonic": time.monotonic(),
+    }
+
+
+def finish_time_to_sync(
+    measurement: dict[str, typing.Any],
+    first_selection: typing.Callable[[str, float], float | None],
+) -> bool:
+    """Record the pending measurement, once chronyd selected a source after the restart.
+
+    Measurements started before a reboot are discarded, the monotonic clock restarts on boot.
+
+    Args:
+        measurement: The pending measurement, from start_time_to_sync.
+        first_selection: Get the CLOCK_MONOTONIC time of the first source selection by
+            chronyd in the given boot, at or after the given CLOCK_MONOTONIC time, see
+            Chrony.first_source_selection.
+
+    Returns:
+        True if the measurement is done, recorded or discarded, False if it's still pending.
+    """
+    if not measurement["boot_id"] or measurement["boot_id"] != read_boot_id():
+        return True
+    selected = first_selection(measurement["boot_id"], measurement["monotonic"])
+    if selected is None:
+        if time.monotonic() - measurement["monotonic"] > TIME_TO_SYNC_MAX_AGE:
+            logger.warning("discard the time to sync measurement, chrony didn't synchronize")
+            return True
+        return False
+    seconds = round(selected - measurement["monotonic"], 3)
+    logger.info(
+        "chrony synchronized %.1fs after the restart in %s", seconds, measurement["trigger"]
+    )
+    observe_time_to_sync(seconds, measurement["trigger"])
+    return True
@@ -0,0 +1,323 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Latency probing of time sources.
+
+The candidate time sources are probed concurrently under a global time budget: NTP sources
+with NTP client mode queries and NTS sources with an NTS-KE request. The best sources by
+delay and jitter are selected for the chrony configuration.
+
+The module imports asyncio and ssl, it's only imported by the charm when the selection is
+enabled.
+"""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import ssl
+import statistics
+import struct
+import threading
+import time
+import typing
+
+import timing
+from chrony import TimeSource, _NtsSource
+
+logger = logging.getLogger(__name__)
+
+_T = typing.TypeVar("_T")
+
+NTP_SAMPLES = 4
+NTP_SAMPLE_TIMEOUT = 1.0
+NTS_KE_ALPN = "ntske/1"
+# NTS next protocol negotiation (NTPv4), AEAD algorithm negotiation (AEAD_AES_SIV_CMAC_256),
+# end of message, all critical records (RFC 8915)
+NTS_KE_REQUEST = bytes.fromhex("80010002000080040002000f80000000")
+_NTS_KE_END_OF_MESSAGE = 0
+_NTS_KE_ERROR = 2
+# NTPv4 client mode request, with a random transmit timestamp to match the response
+_NTP_REQUEST_HEADER = bytes([0x23]) + bytes(39)
+
+
+@dataclasses.dataclass(frozen=True)
+class ProbeResult:
+    """Latency of a time source.
+
+    Attributes:
+        delay: The median round-trip delay, in seconds.
+        jitter: The standard deviation of the round-trip delay, in seconds.
+    """
+
+    delay: float
+    jitter: float
+
+    @property
+    def score(self) -> float:
+        """Get the score of the time source, lower is better.
+
+        Returns:
+            The delay plus the jitter, in seconds.
+        """
+        return self.delay + self.jitter
+
+
+class _DaemonThreadExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Run each call on its own daemon thread, which is never joined.
+
+    The event loop resolves the source hosts in its default executor. The threads of a regular
+    executor are joined when the loop and the interpreter shut down, so a stalled DNS lookup
+    would outlast the probe budget and hold the hook.
+    """
+
+    def submit(  # type: ignore[override]
+        self, fn: typing.Callable[..., _T], /, *args: typing.Any, **kwargs: typing.Any
+    ) -> "concurrent.futures.Future[_T]":
+        """Run a call on a new daemon thread.
+
+        Args:
+            fn: The callable.
+            args: The positional arguments of the call.
+            kwargs: The keyword arguments of the call.
+
+        Returns:
+            The future of the call result.
+        """
+        future: concurrent.futures.Future[_T] = concurrent.futures.Future()
+
+        def _run() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:  # pylint: disable=broad-exception-caught
+                future.set_exception(exc)
+
+        threading.Thread(target=_run, name="probe-resolve", daemon=True).start()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Return without waiting for the running calls.
+
+        Args:
+            wait: Ignored, the calls are never waited for.
+            cancel_futures: Ignored, the calls start immediately.
+        """
+
+
+class _NtpClientProtocol(asyncio.DatagramProtocol):
+    """Receive the NTP responses with their reception time."""
+
+    def __init__(self) -> None:
+        """Initialize the response queue."""
+        self.responses: asyncio.Queue[tuple[bytes, float]] = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, addr: tuple[str | int, ...]) -> None:
+        """Queue a response.
+
+        Args:
+            data: The received datagram.
+            addr: The address of the sender.
+        """
+        self.responses.put_nowait((data, time.perf_counter()))
+
+
+def _is_ntp_response(data: bytes, transmit: bytes) -> bool:
+    """Check if a datagram is a valid NTP server response to a request.
+
+    Args:
+        data: The received datagram.
+        transmit: The transmit timestamp of the request.
+
+    Returns:
+        True if the datagram is a server mode response to the request, not a kiss-o'-death.
+    """
+    return len(data) >= 48 and data[0] & 0x07 == 4 and data[1] != 0 and data[24:32] == transmit
+
+
+async def _ntp_sample(transport: asyncio.DatagramTransport, protocol: _NtpClientProtocol) -> float:
+    """Send an NTP request and measure the round-trip delay.
+
+    Args:
+        transport: The UDP transport connected to the server.
+        protocol: The protocol receiving the responses.
+
+    Returns:
+        The round-trip delay, excluding the server processing time, in seconds.
+    """
+    transmit = os.urandom(8)
+    start = time.perf_counter()
+    transport.sendto(_NTP_REQUEST_HEADER + transmit)
+    while True:
+        data, end = await protocol.responses.get()
+        if _is_ntp_response(data, transmit):
+            break
+    receive_ts, transmit_ts = struct.unpack("!QQ", data[32:48])
+    return max(end - start - (transmit_ts - receive_ts) / 2**32, 0.0)
+
+
+async def _probe_ntp(host: str, port: int) -> ProbeResult:
+    """Probe an NTP server with client mode queries.
+
+    Args:
+        host: The server host.
+        port: The server port.
+
+    Returns:
+        The latency of the server.
+
+    Raises:
+        TimeoutError: If the server didn't answer any query.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _NtpClientProtocol, remote_addr=(host, port)
+    )
+    delays = []
+    try:
+        for _ in range(NTP_SAMPLES):
+            try:
+                delays.append(
+                    await asyncio.wait_for(_ntp_sample(transport, protocol), NTP_SAMPLE_TIMEOUT)
+                )
+            # asyncio.TimeoutError is only an alias of TimeoutError from Python 3.11
+            except asyncio.TimeoutError:
+                logger.debug("NTP query to %s timed out", host)
+    finally:
+        transport.close()
+    if not delays:
+        raise TimeoutError(f"no NTP response from {host}")
+    return ProbeResult(delay=statistics.median(delays), jitter=statistics.pstdev(delays))
+
+
+async def _probe_nts(host: str, port: int, ssl_context: ssl.SSLContext) -> ProbeResult:
+    """Probe an NTS-KE server with an NTS-KE request.
+
+    The TLS handshake takes more than one round trip, so only the NTS-KE request and response
+    exchange, over the established connection, is measured.
+
+    Args:
+        host: The server host.
+        port: The NTS-KE port.
+        ssl_context: The TLS context.
+
+    Returns:
+        The latency of the server, from a single sample.
+
+    Raises:
+        ConnectionError: If the server doesn't speak NTS-KE or reports an error.
+    """
+    reader, writer = await asyncio.open_connection(
+        host, port, ssl=ssl_context, server_hostname=host
+    )
+    try:
+        if writer.get_extra_info("ssl_object").selected_alpn_protocol() != NTS_KE_ALPN:
+            raise ConnectionError(f"{host} didn't negotiate {NTS_KE_ALPN}")
+        start = time.perf_counter()
+        writer.write(NTS_KE_REQUEST)
+        await writer.drain()
+        while True:
+            kind, length = struct.unpack("!HH", await reader.readexactly(4))
+            await reader.readexactly(length)
+            if kind & 0x7FFF == _NTS_KE_ERROR:
+                raise ConnectionError(f"{host} rejected the NTS-KE request")
+            if kind & 0x7FFF == _NTS_KE_END_OF_MESSAGE:
+                break
+        return ProbeResult(delay=time.perf_counter() - start, jitter=0.0)
+    finally:
+        writer.close()
+
+
+async def _probe_all(
+    sources: list[TimeSource], timeout: float, ssl_context: ssl.SSLContext
+) -> list[ProbeResult | None]:
+    """Probe time sources concurrently.
+
+    Args:
+        sources: The time sources.
+        timeout: The global time budget, in seconds.
+        ssl_context: The TLS context of the NTS-KE requests.
+
+    Returns:
+        The latency of each time source, None if it didn't answer within the budget.
+    """
+    asyncio.get_running_loop().set_default_executor(_DaemonThreadExecutor())
+    tasks = []
+    for source in sources:
+        if isinstance(source, _NtsSource):
+            probe = _probe_nts(source.host, source.ntsport or 4460, ssl_context)
+        else:
+            probe = _probe_ntp(source.host, source.port or 123)
+        tasks.append(asyncio.ensure_future(probe))
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    results: list[ProbeResult | None] = []
+    for source, task in zip(sources, tasks, strict=True):
+        if task.cancelled():
+            logger.info("time source %s didn't answer within %ss", source.host, timeout)
+            results.append(None)
+        elif task.exception() is not None:
+            logger.info("time source %s unreachable: %s", source.host, task.exception())
+            results.append(None)
+        else:
+            results.append(task.result())
+    return results
+
+
+def probe_sources(
+    sources: list[TimeSource], timeout: float, ssl_context: ssl.SSLContext | None = None
+) -> list[ProbeResult | None]:
+    """Probe the latency of time sources concurrently, under a global time budget.
+
+    Args:
+        sources: The time sources.
+        timeout: The global time budget, in seconds.
+        ssl_context: The TLS context of the NTS-KE requests, verifying the server certificate
+            with the system CA certificates by default.
+
+    Returns:
+        The latency of each time source, None if it didn't answer within the budget.
+    """
+    if not sources:
+        return []
+    if ssl_context is None:
+        ssl_context = ssl.create_default_context()
+        ssl_context.set_alpn_protocols([NTS_KE_ALPN])
+    with timing.span("probe"):
+        return asyncio.run(_probe_all(sources, timeout, ssl_context))
+
+
+def select_sources(
+    sources: list[TimeSource], results: list[ProbeResult | None], count: int
+) -> list[TimeSource]:
+    """Select the time sources with the lowest delay and jitter.
+
+    The selected time sources keep their order. The best time source is marked prefer, unless
+    a selected time source is already marked prefer.
+
+    Args:
+        sources: The time sources.
+        results: The latency of each time source, None if it's unreachable.
+        count: The maximum number of time sources to select.
+
+    Returns:
+        The selected time sources, all time sources if none is reachable.
+    """
+    ranked = sorted((result.score, i) for i, result in enumerate(results) if result is not None)[
+        :count
+    ]
+    if not ranked:
+        logger.warning("no time source answered the latency probe, keep all time sources")
+        return sources
+    best = ranked[0][1]
+    selected = sorted(i for _, i in ranked)
+    if any(sources[i].model_dump()["prefer"] for i in selected):
+        return [sources[i] for i in selected]
+    return [
+        sources[i].model_copy(update={"prefer": True}) if i == best else sources[i]
+        for i in selected
+    ]
@@ -0,0 +1,157 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Pre-resolution of the time source hosts.
+
+chronyd resolves the pool hosts itself when it starts, one at a time, which delays the first
+measurements on networks with slow or broken DNS answers. The charm resolves the hosts
+concurrently under a global timeout instead, and caches the addresses on disk for a fixed time
+to live, so the following hooks don't resolve them again.
+
+The module is only imported by the charm when the pre-resolution is enabled.
+"""
+
+import ipaddress
+import json
+import logging
+import pathlib
+import queue
+import socket
+import threading
+import time
+import typing
+
+import timing
+from config_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = pathlib.Path("/var/lib/chrony-charm/resolve-cache.json")
+FAMILIES = {socket.AF_INET: "ipv4", socket.AF_INET6: "ipv6"}
+MAX_WORKERS = 16
+
+
+def is_address(host: str) -> bool:
+    """Check if a host is an IP address, which doesn't need to be resolved.
+
+    Args:
+        host: The host.
+
+    Returns:
+        True if the host is an IPv4 or IPv6 address.
+    """
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def _load_cache() -> dict[str, dict[str, typing.Any]]:
+    """Load the resolution cache.
+
+    Returns:
+        The addresses and the expiry time of each host.
+    """
+    try:
+        return json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("discard the corrupted resolution cache file")
+        return {}
+
+
+def _getaddrinfo(host: str) -> list[list[str]]:
+    """Resolve a host.
+
+    Args:
+        host: The host.
+
+    Returns:
+        The address family name and the address of each address, sorted.
+    """
+    infos = socket.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+    addresses = {
+        (FAMILIES[family], str(sockaddr[0]))
+        for family, _, _, _, sockaddr in infos
+        if family in FAMILIES
+    }
+    return [list(address) for address in sorted(addresses)]
+
+
+def _resolve_in_background(
+    hosts: list[str], results: "queue.Queue[tuple[str, typing.Any]]"
+) -> None:
+    """Resolve hosts on daemon threads, which never delay the exit of the hook process.
+
+    The threads are never joined: a thread stuck in the system resolver is abandoned when the
+    hook process exits, unlike the concurrent.futures workers, which are joined at exit.
+
+    Args:
+        hosts: The hosts to resolve.
+        results: Receives the host and its addresses, or the resolution error, of each host.
+    """
+    pending: queue.SimpleQueue[str] = queue.SimpleQueue()
+    for host in hosts:
+        pending.put(host)
+
+    def _worker() -> None:
+        while True:
+            try:
+                host = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results.put((host, _getaddrinfo(host)))
+            except OSError as exc:
+                results.put((host, exc))
+
+    for _ in range(min(len(hosts), MAX_WORKERS)):
+        threading.Thread(target=_worker, name="resolve", daemon=True).start()
+
+
+def resolve_hosts(
+    hosts: typing.Iterable[str], timeout: float, ttl: float
+) -> tuple[dict[str, list[list[str]]], float]:
+    """Resolve hosts concurrently, with a cache.
+
+    The hosts missing from the cache or expired are resolved concurrently with the system
+    resolver. Hosts not resolved within the timeout are left out and retried by the next call;
+    their resolver threads are daemon threads, abandoned when the hook process exits.
+
+    Args:
+        hosts: The hosts to resolve.
+        timeout: The global resolution timeout, in seconds.
+        ttl: The time to live of the resolved addresses in the cache, in seconds.
+
+    Returns:
+        The address family name and the address of each address of the resolved hosts, and
+        the time, in seconds since the epoch, at which the first of them expires.
+    """
+    now = time.time()
+    cache = {host: entry for host, entry in _load_cache().items() if entry["expires"] > now}
+    hosts = sorted(set(hosts))
+    missing = [host for host in hosts if host not in cache]
+    if missing:
+        results: queue.Queue[tuple[str, typing.Any]] = queue.Queue()
+        unresolved = set(missing)
+        with timing.span("resolve"):
+            _resolve_in_background(missing, results)
+            deadline = time.monotonic() + timeout
+            while unresolved:
+                try:
+                    host, addresses = results.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                unresolved.discard(host)
+                if isinstance(addresses, OSError):
+                    logger.info("failed to resolve %s: %s", host, addresses)
+                elif addresses:
+                    cache[host] = {"addresses": addresses, "expires": now + ttl}
+        for host in sorted(unresolved):
+            logger.info("resolving %s timed out after %ss", host, timeout)
+        atomic_write(CACHE_FILE, json.dumps(cache, sort_keys=True))
+    resolved = {host: cache[host]["addresses"] for host in hosts if host in cache}
+    expires = min((cache[host]["expires"] for host in resolved), default=now + ttl)
+    return resolved, expires
@@ -0,0 +1,183 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hook phase timing.
+
+Phases of a hook are timed with named spans. Besides the OpenTelemetry span, which is a no-op
+unless a tracing backend is configured, the duration of every span is appended to a rotating
+JSONL trace file on the machine at the end of the hook.
+
+Run this module to print the p50/p95 duration of each phase recorded in the trace file, for
+example from the charm directory: ``PYTHONPATH=venv:src python3 -m timing``.
+"""
+
+import argparse
+import collections
+import contextlib
+import json
+import logging
+import pathlib
+import statistics
+import time
+import typing
+
+import opentelemetry.trace
+
+logger = logging.getLogger(__name__)
+tracer = opentelemetry.trace.get_tracer(__name__)
+
+TRACE_FILE = pathlib.Path("/var/lib/chrony-charm/trace.jsonl")
+TRACE_FILE_MAX_BYTES = 1024 * 1024
+TRACE_FILE_BACKUP_COUNT = 2
+
+_spans: list[tuple[str, float]] = []
+_started: dict[str, float] = {}
+
+
+@contextlib.contextmanager
+def span(name: str) -> typing.Iterator[None]:
+    """Time a phase of the current hook.
+
+    Args:
+        name: Name of the phase.
+
+    Yields:
+        None.
+    """
+    start = time.monotonic()
+    with tracer.start_as_current_span(name):
+        try:
+            yield
+        finally:
+            _spans.append((name, time.monotonic() - start))
+
+
+def start(name: str) -> None:
+    """Start timing a phase of the current hook, which spans several event observers.
+
+    Args:
+        name: Name of the phase.
+    """
+    _started[name] = time.monotonic()
+
+
+def stop(name: str) -> None:
+    """Stop timing a phase started with start.
+
+    Args:
+        name: Name of the phase.
+    """
+    started = _started.pop(name, None)
+    if started is not None:
+        _spans.append((name, time.monotonic() - started))
+
+
+def reset() -> None:
+    """Discard the spans recorded so far."""
+    _spans.clear()
+    _started.clear()
+
+
+def _rotate() -> None:
+    """Rotate the trace file if it exceeds the maximum size."""
+    if TRACE_FILE.stat().st_size < TRACE_FILE_MAX_BYTES:
+        return
+    for index in range(TRACE_FILE_BACKUP_COUNT, 0, -1):
+        source = (
+            TRACE_FILE.with_name(f"{TRACE_FILE.name}.{index - 1}") if index > 1 else TRACE_FILE
+        )
+        if source.exists():
+            source.replace(TRACE_FILE.with_name(f"{TRACE_FILE.name}.{index}"))
+
+
+def flush(hook: str, app: str) -> None:
+    """Append the spans recorded in the current hook to the trace file.
+
+    Nothing is written if the charm state directory doesn't exist, for example after the charm
+    was removed.
+
+    Args:
+        hook: Name of the hook.
+        app: Name of the charm application.
+    """
+    spans = list(_spans)
+    reset()
+    if not spans or not TRACE_FILE.parent.exists():
+        return
+    now = time.time()
+    lines = "".join(
+        json.dumps({"time": now, "app": app, "hook": hook, "phase": name, "duration": duration})
+        + "\n"
+        for name, duration in spans
+    )
+    try:
+        with TRACE_FILE.open("a", encoding="utf-8") as file:
+            file.write(lines)
+        _rotate()
+    except OSError:
+        logger.exception("failed to write trace file %s", TRACE_FILE)
+
+
+def _percentile(durations: list[float], percent: int) -> float:
+    """Calculate a percentile of the durations.
+
+    Args:
+        durations: Durations.
+        percent: Percentile to calculate.
+
+    Returns:
+        The percentile.
+    """
+    if len(durations) == 1:
+        return durations[0]
+    return statistics.quantiles(durations, n=100, method="inclusive")[percent - 1]
+
+
+def summarize(lines: typing.Iterable[str], hook: str | None = None) -> dict[str, dict[str, float]]:
+    """Summarize the duration of each phase in trace file lines.
+
+    Args:
+        lines: Trace file lines.
+        hook: Only summarize spans of this hook.
+
+    Returns:
+        Count, p50 and p95 duration in seconds of each phase.
+    """
+    durations: dict[str, list[float]] = collections.defaultdict(list)
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if hook is None or record["hook"] == hook:
+            durations[record["phase"]].append(record["duration"])
+    return {
+        phase: {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+        }
+        for phase, values in sorted(durations.items())
+    }
+
+
+def main() -> None:
+    """Print the p50/p95 duration of each phase in the trace file."""
+    parser = argparse.ArgumentParser(description="Summarize chrony charm hook phase timings.")
+    parser.add_argument("--file", type=pathlib.Path, default=TRACE_FILE)
+    parser.add_argument("--hook", help="only summarize this hook, for example config-changed")
+    args = parser.parse_args()
+    files = [
+        args.file.with_name(f"{args.file.name}.{i}") for i in range(TRACE_FILE_BACKUP_COUNT, 0, -1)
+    ]
+    lines: list[str] = []
+    for file in [*files, args.file]:
+        if file.exists():
+            lines.extend(file.read_text(encoding="utf-8").splitlines())
+    print(f"{'phase':<32}{'count':>8}{'p50 (s)':>12}{'p95 (s)':>12}")
+    for phase, summary in summarize(lines, hook=args.hook).items():
+        print(f"{phase:<32}{summary['count']:>8}{summary['p50']:>12.4f}{summary['p95']:>12.4f}")
+
+
+if __name__ == "__main__":  # pragma: nocover
+    main()
@@ -0,0 +1,207 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""A fake machine for running the charm without touching the host.
+
+Unlike the unit test fixtures, the fake host doesn't patch any Chrony method, it redirects
+the files managed by the charm into a temporary directory and replaces the subprocesses
+with successful no-ops, so the real charm code paths (and their imports) are exercised.
+"""
+
+import contextlib
+import pathlib
+import shutil
+import subprocess  # nosec B404
+import typing
+from unittest.mock import patch
+
+_DPKG_LIST_HEADER = """\
+Desired=Unknown/Install/Remove/Purge/Hold
+| Status=Not/Inst/Conf-files/Unpacked/halF-conf/Half-inst/trig-aWait/Trig-pend
+|/ Err?=(none)/Reinst-required (Status,Err: uppercase=bad)
+||/ Name           Version      Architecture Description
++++-==============-============-============-=================================
+"""
+
+
+def _fake_output(args: typing.Sequence[str]) -> str:
+    """Get the output of a faked command.
+
+    Args:
+        args: The command arguments.
+
+    Returns:
+        The command output.
+    """
+    args = list(args)
+    if args == ["dpkg", "--print-architecture"]:
+        return "amd64\n"
+    if args[:2] == ["dpkg", "-l"]:
+        return _DPKG_LIST_HEADER + f"ii  {args[2]}  1.0-1  amd64  {args[2]}\n"
+    if args[1:] == ["-c", "tracking"]:
+        # a synchronized chronyd, see Chrony.tracking
+        return "C0000201,192.0.2.1,3,1700000000.0,0.000012,0,0,0,0,0,0,0,64.0,Normal\n"
+    return ""
+
+
+def _fake_run(args: typing.Sequence[str], *_: typing.Any, **kwargs: typing.Any) -> typing.Any:
+    """Fake subprocess.run.
+
+    Args:
+        args: The command arguments.
+        kwargs: Keyword arguments passed to subprocess.run.
+
+    Returns:
+        A successful completed process.
+    """
+    output = _fake_output(args)
+    text = kwargs.get("text") or kwargs.get("universal_newlines") or kwargs.get("encoding")
+    return subprocess.CompletedProcess(args, 0, output if text else output.encode(), "")
+
+
+def _fake_check_output(
+    args: typing.Sequence[str], *_: typing.Any, **kwargs: typing.Any
+) -> typing.Any:
+    """Fake subprocess.check_output.
+
+    Args:
+        args: The command arguments.
+        kwargs: Keyword arguments passed to subprocess.check_output.
+
+    Returns:
+        The command output.
+    """
+    return _fake_run(args, **kwargs).stdout
+
+
+@contextlib.contextmanager
+def fake_subprocess() -> typing.Iterator[None]:
+    """Replace the subprocess functions used by the charm libraries.
+
+    This must be entered before the charm libraries are imported, since they bind some of the
+    subprocess functions at import time.
+
+    Yields:
+        None.
+    """
+    with (
+        patch("subprocess.run", side_effect=_fake_run),
+        patch("subprocess.check_output", side_effect=_fake_check_output),
+        patch("subprocess.check_call", return_value=0),
+        patch("shutil.which", side_effect=lambda cmd, *_, **__: f"/usr/bin/{cmd}"),
+        patch("shutil.chown"),
+    ):
+        yield
+
+
+def _populate_bundle(root: pathlib.Path) -> dict[pathlib.Path, pathlib.Path]:
+    """Create the bundled chrony_exporter files of a fake charm.
+
+    Args:
+        root: The fake host root directory.
+
+    Returns:
+        A mapping of bundled file to installed file, like chrony._CHRONY_EXPORTER_FILES,
+        with both files inside the root directory.
+    """
+    import chrony  # pylint: disable=import-outside-toplevel
+
+    files = {}
+    for source, target in chrony._CHRONY_EXPORTER_FILES.items():  # pylint: disable=protected-access
+        bundled = root / "charm" / source.parent.name / source.name
+        bundled.parent.mkdir(parents=True, exist_ok=True)
+        if not bundled.exists():
+            if source.exists():
+                shutil.copy(source, bundled)
+            else:
+                bundled.write_bytes(source.name.encode() * 1024)
+        installed = root / target.relative_to("/")
+        installed.parent.mkdir(parents=True, exist_ok=True)
+        files[bundled] = installed
+    return files
+
+
+def sources_resource(root: pathlib.Path) -> pathlib.Path:
+    """Create the sources resource of a fake charm, empty like the resource published with it.
+
+    Args:
+        root: The fake host root directory.
+
+    Returns:
+        The path to the sources resource file.
+    """
+    path = root / "resources" / "sources.txt"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return path
+
+
+@contextlib.contextmanager
+def fake_host(root: pathlib.Path) -> typing.Iterator[None]:
+    """Redirect the files managed by the charm into a fake host root directory.
+
+    The host state is kept in the root directory, so it can be shared across processes.
+
+    Args:
+        root: The fake host root directory.
+
+    Yields:
+        None.
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    import charm
+    import chrony
+    import metrics
+    import timing
+
+    def _redirect(path: pathlib.Path) -> pathlib.Path:
+        return root / path.relative_to("/")
+
+    files = _populate_bundle(root)
+    config_file = _redirect(chrony.Chrony.CONFIG_FILE)
+    if not config_file.exists():
+        config_file.parent.mkdir(parents=True, exist_ok=True)
+        config_file.write_text("pool ntp.ubuntu.com iburst maxsources 4\n", encoding="utf-8")
+    _redirect(chrony.Chrony.CONFIG_FILE_BACKUP).parent.mkdir(parents=True, exist_ok=True)
+    with (
+        fake_subprocess(),
+        patch.object(charm, "CHRONY_CHARM_LOCK_FILE", _redirect(charm.CHRONY_CHARM_LOCK_FILE)),
+        patch.object(timing, "TRACE_FILE", _redirect(timing.TRACE_FILE)),
+        patch.object(metrics, "HISTOGRAM_FILE", _redirect(metrics.HISTOGRAM_FILE)),
+        patch.object(metrics, "METRICS_FILE", _redirect(metrics.METRICS_FILE)),
+        patch.object(
+            chrony,
+            "_METRICS_SERVICE_FILES",
+            {s: _redirect(t) for s, t in chrony._METRICS_SERVICE_FILES.items()},
+        ),
+        patch.object(chrony, "_CHRONY_EXPORTER_FILES", files),
+        patch.object(chrony, "_CHRONY_EXPORTER_MANIFEST_FILE", root / "charm/manifest"),
+        patch.object(
+            chrony, "_CHRONY_EXPORTER_BIN_FILE", _redirect(chrony._CHRONY_EXPORTER_BIN_FILE)
+        ),
+        patch.object(
+            chrony,
+            "_CHRONY_EXPORTER_SERVICE_FILE",
+            _redirect(chrony._CHRONY_EXPORTER_SERVICE_FILE),
+        ),
+        patch.object(
+            chrony,
+            "_CHRONY_EXPORTER_APPARMOR_FILE",
+            _redirect(chrony._CHRONY_EXPORTER_APPARMOR_FILE),
+        ),
+        patch.object(chrony.Chrony, "CONFIG_FILE", config_file),
+        patch.object(
+            chrony.Chrony, "CONFIG_FILE_BACKUP", _redirect(chrony.Chrony.CONFIG_FILE_BACKUP)
+        ),
+        patch.object(
+            chrony.Chrony, "CONFIG_BACKUP_DIR", _redirect(chrony.Chrony.CONFIG_BACKUP_DIR)
+        ),
+        patch.object(chrony.Chrony, "SOURCES_FILE", _redirect(chrony.Chrony.SOURCES_FILE)),
+        patch.object(chrony.Chrony, "CERTS_DIR", _redirect(chrony.Chrony.CERTS_DIR)),
+        patch.object(
+            chrony.Chrony,
+            "EXPORTER_DIGEST_CACHE_FILE",
+            _redirect(chrony.Chrony.EXPORTER_DIGEST_CACHE_FILE),
+        ),
+    ):
+        yield
@@ -0,0 +1,205 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""End-to-end hook benchmark.
+
+Event sequences are replayed through the real charm class with ops.testing, against a fake
+host (see fake_host.py). Each scenario runs in a fresh interpreter, so the peak RSS of an
+event isn't inflated by earlier scenarios. The wall time, the CPU time and the peak RSS are
+reported for each event, with the p50 duration of the hook phases recorded by the charm
+(see src/timing.py), such as the COS agent refresh and the chrony configuration.
+
+Usage:
+    python -m tests.benchmark.hooks [--output FILE] [--baseline FILE] [--tolerance T]
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import resource
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+import typing
+
+# scenario name: (events dispatched before the measurement, measured events)
+SCENARIOS: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    "install": ((), ("install", "config-changed")),
+    "config-changed-steady": (("install", "config-changed"), ("config-changed",) * 100),
+    "upgrade-charm": (("install", "config-changed"), ("upgrade-charm",)),
+    "cos-agent": (
+        ("install", "config-changed"),
+        ("cos-agent-relation-joined", "cos-agent-relation-changed"),
+    ),
+}
+DEFAULT_BASELINE = pathlib.Path(__file__).parent / "baselines" / "hooks.json"
+
+
+def event(ctx: typing.Any, state: typing.Any, hook: str) -> typing.Any:
+    """Create the ops.testing event of a benchmarked hook.
+
+    Args:
+        ctx: The ops.testing context.
+        state: The state the event is dispatched on, with a cos-agent relation for the
+            cos-agent relation hooks.
+        hook: Name of the hook.
+
+    Returns:
+        The event.
+    """
+    if hook.startswith("cos-agent-relation-"):
+        cos_agent = next(r for r in state.relations if r.endpoint == "cos-agent")
+        if hook == "cos-agent-relation-joined":
+            return ctx.on.relation_joined(cos_agent)
+        return ctx.on.relation_changed(cos_agent)
+    return getattr(ctx.on, hook.replace("-", "_"))()
+
+
+def _peak_rss_kib() -> int:
+    """Get the peak resident set size of this process.
+
+    Returns:
+        The peak RSS in KiB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_scenario(name: str) -> dict[str, typing.Any]:
+    """Run a scenario against a fake host in this process.
+
+    Args:
+        name: Name of the scenario.
+
+    Returns:
+        The measurements of each measured event and the hook phase durations.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ops import testing
+
+    import charm
+    import timing
+
+    from .fake_host import fake_host, sources_resource
+
+    setup, measured = SCENARIOS[name]
+    cos_agent = testing.Relation(endpoint="cos-agent", id=2)
+    ctx = testing.Context(charm.ChronyClientCharm)
+    samples: dict[str, list[tuple[float, float, int]]] = {}
+    with tempfile.TemporaryDirectory() as tmp, fake_host(pathlib.Path(tmp)):
+        state = testing.State(
+            config={"sources": "ntp://ntp.ubuntu.com?iburst=true,nts://time.example.com"},
+            relations=[testing.SubordinateRelation(endpoint="juju-info", id=1), cos_agent],
+            resources={testing.Resource(name="sources", path=sources_resource(pathlib.Path(tmp)))},
+        )
+        for hook in setup:
+            state = ctx.run(event(ctx, state, hook), state)
+        timing.TRACE_FILE.unlink(missing_ok=True)
+        for hook in measured:
+            wall, cpu = time.perf_counter(), time.process_time()
+            state = ctx.run(event(ctx, state, hook), state)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            samples.setdefault(hook, []).append((wall, cpu, _peak_rss_kib()))
+        trace = timing.TRACE_FILE.read_text(encoding="utf-8").splitlines()
+    return {
+        "events": {
+            hook: {
+                "count": len(values),
+                "wall_ms": round(statistics.median(v[0] for v in values) * 1000, 3),
+                "cpu_ms": round(statistics.median(v[1] for v in values) * 1000, 3),
+                "peak_rss_kib": max(v[2] for v in values),
+            }
+            for hook, values in samples.items()
+        },
+        "phases_ms": {
+            phase: round(summary["p50"] * 1000, 3)
+            for phase, summary in timing.summarize(trace).items()
+        },
+    }
+
+
+def measure(name: str) -> dict[str, typing.Any]:
+    """Run a scenario in a fresh interpreter.
+
+    Args:
+        name: Name of the scenario.
+
+    Returns:
+        The measurements of each measured event and the hook phase durations.
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+    process = subprocess.run(  # nosec B603
+        [sys.executable, "-m", __spec__.name, "--scenario", name],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def compare(
+    results: dict[str, dict[str, typing.Any]],
+    baseline: dict[str, dict[str, typing.Any]],
+    tolerance: float,
+) -> list[str]:
+    """Compare the benchmark results with a baseline.
+
+    Args:
+        results: Benchmark results.
+        baseline: Baseline results.
+        tolerance: Allowed relative increase of the CPU time and the peak RSS of an event.
+
+    Returns:
+        Descriptions of the regressions.
+    """
+    regressions = []
+    for scenario, result in results.items():
+        for hook, after in result["events"].items():
+            before = baseline.get(scenario, {}).get("events", {}).get(hook)
+            if before is None:
+                continue
+            key = f"{scenario}/{hook}"
+            deltas = {
+                metric: after[metric] / before[metric] - 1 if before[metric] else 0.0
+                for metric in ("wall_ms", "cpu_ms", "peak_rss_kib")
+            }
+            print(
+                f"{key:<56} wall {after['wall_ms']:>8.2f}ms ({deltas['wall_ms']:+.0%})"
+                f" cpu {after['cpu_ms']:>8.2f}ms ({deltas['cpu_ms']:+.0%})"
+                f" rss {after['peak_rss_kib']:>7}KiB ({deltas['peak_rss_kib']:+.0%})"
+            )
+            # the wall time is reported but not guarded, it depends on the machine load
+            for metric in ("cpu_ms", "peak_rss_kib"):
+                if deltas[metric] > tolerance:
+                    regressions.append(f"{key}: {metric} {deltas[metric]:+.0%}")
+    return regressions
+
+
+def main() -> None:
+    """Run the end-to-end hook benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=pathlib.Path, help="write the results to this file")
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.scenario:
+        print(json.dumps(_run_scenario(args.scenario)))
+        return
+
+    results = {name: measure(name) for name in SCENARIOS}
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.baseline.exists():
+        regressions = compare(
+            results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance
+        )
+        if regressions:
+            sys.exit("hook benchmark regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
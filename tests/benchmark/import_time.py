@@ -0,0 +1,252 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Import time benchmark of the charm hooks.
+
+Every hook is dispatched in a fresh interpreter running with ``-X importtime`` against a
+fake host (see fake_host.py). The modules needed by the benchmark machinery itself, such as
+``ops.testing`` and ``unittest.mock``, are imported before the measurement starts, so the
+result only covers the modules imported by the charm code for that hook.
+
+The hooks preceding the measured hook (for example, ``install`` before ``config-changed``)
+are dispatched in a separate interpreter sharing the same fake host, so they don't affect
+the measurement.
+
+Usage:
+    python -m tests.benchmark.import_time [--repeat N] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import pathlib
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import typing
+
+# hooks dispatched before the measured hook, to bring the unit into a realistic state
+HOOKS: dict[str, tuple[str, ...]] = {
+    "install": (),
+    "config-changed": ("install", "config-changed"),
+    "upgrade-charm": ("install", "config-changed"),
+    "cos-agent-relation-joined": ("install", "config-changed"),
+    "cos-agent-relation-changed": ("install", "config-changed", "cos-agent-relation-joined"),
+    "remove": ("install", "config-changed"),
+}
+DEFAULT_BASELINE = pathlib.Path(__file__).parent / "baselines" / "import_time.json"
+_MARKER = "chrony-charm-benchmark: measurement starts"
+
+
+@dataclasses.dataclass
+class ImportTime:
+    """Import time measurement of a hook.
+
+    Attributes:
+        import_us: Cumulative import time in microseconds.
+        modules: Names of the modules imported by the hook.
+    """
+
+    import_us: int
+    modules: list[str]
+
+    def report(self) -> dict[str, typing.Any]:
+        """Summarize the measurement.
+
+        Returns:
+            The JSON serializable summary.
+        """
+        return {
+            "import_us": self.import_us,
+            "module_count": len(self.modules),
+            "packages": sorted({m.split(".")[0] for m in self.modules}),
+        }
+
+
+def _dispatch(hooks: typing.Sequence[str], root: pathlib.Path) -> None:
+    """Dispatch hooks through ops.testing against the fake host in the root directory.
+
+    Args:
+        hooks: Names of the hooks to dispatch.
+        root: Fake host root directory.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ops import testing
+
+    import charm
+
+    from .fake_host import fake_host, sources_resource
+    from .hooks import event
+
+    state_file = root / "state.json"
+    stored_states = []
+    if state_file.exists():
+        stored_states = [
+            testing.StoredState(**s) for s in json.loads(state_file.read_text(encoding="utf-8"))
+        ]
+    cos_agent = testing.Relation(endpoint="cos-agent", id=2)
+    state = testing.State(
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1), cos_agent],
+        resources={testing.Resource(name="sources", path=sources_resource(root))},
+        stored_states=stored_states,
+    )
+    ctx = testing.Context(charm.ChronyClientCharm)
+    with fake_host(root):
+        for hook in hooks:
+            state = ctx.run(event(ctx, state, hook), state)
+    state_file.write_text(
+        json.dumps(
+            [
+                {"name": s.name, "owner_path": s.owner_path, "content": s.content}
+                for s in state.stored_states
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+
+def _run_child(*args: str, importtime: bool = False) -> str:
+    """Run this module in a fresh interpreter.
+
+    Args:
+        args: Command line arguments.
+        importtime: Run the interpreter with -X importtime.
+
+    Returns:
+        The standard error output.
+    """
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-m", __spec__.name]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+    process = subprocess.run([*cmd, *args], env=env, check=True, capture_output=True, text=True)  # nosec B603
+    return process.stderr
+
+
+def _parse_importtime(output: str) -> ImportTime:
+    """Parse the -X importtime output after the measurement marker.
+
+    Args:
+        output: The standard error output of the interpreter.
+
+    Returns:
+        The import time measurement.
+    """
+    lines = output.partition(_MARKER)[2].splitlines()
+    total = 0
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules.append(name.strip())
+        # nested imports are indented, their time is included in the top-level cumulative
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return ImportTime(import_us=total, modules=sorted(modules))
+
+
+def measure(hook: str) -> ImportTime:
+    """Measure the modules imported while dispatching a hook.
+
+    Args:
+        hook: Name of the hook.
+
+    Returns:
+        The import time measurement.
+    """
+    with tempfile.TemporaryDirectory() as root:
+        if HOOKS[hook]:
+            _run_child("--root", root, "--setup", *HOOKS[hook])
+        return _parse_importtime(_run_child("--root", root, "--measure", hook, importtime=True))
+
+
+def _measure_child(hook: str, root: pathlib.Path) -> None:
+    """Dispatch a hook with the measurement marker, in a -X importtime interpreter.
+
+    Args:
+        hook: Name of the hook.
+        root: Fake host root directory.
+    """
+    # pylint: disable=import-outside-toplevel
+    import ops
+    from ops import testing
+
+    from . import hooks  # noqa: F401  pylint: disable=unused-import
+    from .fake_host import fake_subprocess
+
+    # dispatch a hook of an empty charm first to import the ops.testing runtime modules
+    ctx = testing.Context(ops.CharmBase, meta={"name": "warmup"})
+    ctx.run(ctx.on.install(), testing.State())
+
+    with fake_subprocess():
+        print(_MARKER, file=sys.stderr, flush=True)
+        _dispatch([hook], root)
+
+
+def compare(
+    results: dict[str, dict[str, typing.Any]],
+    baseline: dict[str, dict[str, typing.Any]],
+    tolerance: float,
+) -> list[str]:
+    """Compare the benchmark results with a baseline.
+
+    Args:
+        results: Benchmark results.
+        baseline: Baseline results.
+        tolerance: Allowed relative import time increase.
+
+    Returns:
+        Descriptions of the regressions.
+    """
+    regressions = []
+    for hook, result in results.items():
+        if hook not in baseline:
+            continue
+        before, after = baseline[hook]["import_us"], result["import_us"]
+        delta = (after - before) / before if before else 0.0
+        new_packages = sorted(set(result["packages"]) - set(baseline[hook]["packages"]))
+        print(f"{hook:<28} {before:>9}us -> {after:>9}us ({delta:+.0%}) {' '.join(new_packages)}")
+        if delta > tolerance:
+            regressions.append(f"{hook}: import time {before}us -> {after}us ({delta:+.0%})")
+    return regressions
+
+
+def main() -> None:
+    """Run the import time benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per hook, median is used")
+    parser.add_argument("--output", type=pathlib.Path, help="write the results to this file")
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--root", type=pathlib.Path, help=argparse.SUPPRESS)
+    parser.add_argument("--setup", nargs="+", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.setup:
+        _dispatch(args.setup, args.root)
+        return
+    if args.measure:
+        _measure_child(args.measure, args.root)
+        return
+
+    results = {}
+    for hook in HOOKS:
+        runs = [measure(hook) for _ in range(args.repeat)]
+        result = runs[0].report()
+        result["import_us"] = int(statistics.median(r.import_us for r in runs))
+        results[hook] = result
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.baseline.exists():
+        regressions = compare(
+            results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance
+        )
+        if regressions:
+            sys.exit("import time regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
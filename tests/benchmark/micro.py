@@ -0,0 +1,205 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Micro-benchmarks of the time source parsing and the configuration rendering.
+
+Every function is run over 10, 1k and 100k generated sources, a deterministic mix of NTP and
+NTS URLs with dense option query strings. The throughput is the best of several runs, the
+peak allocation is measured with tracemalloc in a separate run.
+
+Usage:
+    python -m tests.benchmark.micro [--sizes N ...] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import dataclasses
+import json
+import pathlib
+import random
+import sys
+import time
+import tracemalloc
+import typing
+
+import chrony
+
+SIZES = (10, 1_000, 100_000)
+DEFAULT_BASELINE = pathlib.Path(__file__).parent / "baselines" / "micro.json"
+_HEADER = "# This is managed by chrony-client charm (https://charmhub.io/chrony-client).\n"
+
+
+def generate_urls(count: int, seed: int = 0) -> list[str]:
+    """Generate a deterministic mix of NTP and NTS source URLs.
+
+    Args:
+        count: Number of URLs.
+        seed: Random seed.
+
+    Returns:
+        Source URLs, about two thirds of them NTP.
+    """
+    rng = random.Random(seed)  # nosec B311
+    urls = []
+    for i in range(count):
+        if rng.random() < 2 / 3:
+            urls.append(
+                f"ntp://{i}.pool.example.com:{rng.choice([123, 1123])}"
+                f"?iburst=true&minpoll={rng.randint(4, 6)}&maxpoll={rng.randint(8, 10)}"
+                f"&maxdelay={rng.randint(1, 9) / 10}&polltarget={rng.randint(6, 60)}"
+                f"&maxsources={rng.randint(1, 4)}&offset={rng.randint(-9, 9) / 1000}&prefer=true"
+            )
+        else:
+            urls.append(
+                f"nts://nts{i}.example.net:{rng.choice([4460, 4461])}"
+                f"?require=true&minstratum={rng.randint(1, 3)}&maxdelaydevratio=10"
+                f"&certset={rng.randint(0, 2)}&xleave=true&minsamples={rng.randint(4, 8)}"
+            )
+    return urls
+
+
+@dataclasses.dataclass
+class Case:
+    """A benchmark case.
+
+    Attributes:
+        name: Name of the case.
+        setup: Create the input of the case from source URLs.
+        run: Run the benchmarked function over the input.
+    """
+
+    name: str
+    setup: typing.Callable[[list[str]], typing.Any]
+    run: typing.Callable[[typing.Any], typing.Any]
+
+
+def _parse(urls: list[str]) -> list[chrony.TimeSource]:
+    """Parse source URLs.
+
+    Args:
+        urls: Source URLs.
+
+    Returns:
+        Time sources.
+    """
+    return [chrony.Chrony.parse_source_url(url) for url in urls]
+
+
+CASES = [
+    Case("parse_source_url", lambda urls: urls, _parse),
+    Case(
+        "ntp_from_source_url",
+        lambda urls: [url for url in urls if url.startswith("ntp://")],
+        # pylint: disable-next=protected-access
+        lambda urls: [chrony._NtpSource.from_source_url(url) for url in urls],
+    ),
+    Case("render_options", _parse, lambda sources: [s.render_options() for s in sources]),
+    Case("normalize_sources", _parse, chrony.Chrony.normalize_sources),
+    Case(
+        "new_sources_config",
+        _parse,
+        lambda sources: chrony.Chrony.new_sources_config(sources, header=_HEADER),
+    ),
+    # the static configuration doesn't depend on the sources, it's rendered once per source
+    Case(
+        "new_config",
+        lambda urls: urls,
+        lambda urls: [chrony.Chrony.new_config(header=_HEADER) for _ in urls],
+    ),
+]
+
+
+def measure(case: Case, size: int, repeat: int) -> dict[str, float]:
+    """Measure the throughput and the peak allocation of a benchmark case.
+
+    Args:
+        case: The benchmark case.
+        size: Number of sources.
+        repeat: Number of runs, the fastest run is used.
+
+    Returns:
+        The throughput in sources per second and the peak allocation in KiB.
+    """
+    data = case.setup(generate_urls(size))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case.run(data)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        case.run(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ops_per_s": round(size / best, 1), "peak_kib": round(peak / 1024, 1)}
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    """Compare the benchmark results with a baseline.
+
+    Args:
+        results: Benchmark results, keyed by "<case>/<size>".
+        baseline: Baseline results.
+        tolerance: Allowed relative throughput decrease and peak allocation increase.
+
+    Returns:
+        Descriptions of the regressions.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key], result
+        speed = after["ops_per_s"] / before["ops_per_s"] - 1
+        memory = after["peak_kib"] / before["peak_kib"] - 1 if before["peak_kib"] else 0.0
+        print(
+            f"{key:<32} {after['ops_per_s']:>12.0f}/s ({speed:+.0%})"
+            f" {after['peak_kib']:>10.0f}KiB ({memory:+.0%})"
+        )
+        if speed < -tolerance:
+            regressions.append(f"{key}: throughput {speed:+.0%}")
+        if memory > tolerance:
+            regressions.append(f"{key}: peak allocation {memory:+.0%}")
+    return regressions
+
+
+def run(sizes: typing.Sequence[int], repeat: int) -> dict[str, dict[str, float]]:
+    """Run all benchmark cases.
+
+    Args:
+        sizes: Numbers of sources.
+        repeat: Number of runs of each case, the fastest run is used.
+
+    Returns:
+        The results, keyed by "<case>/<size>".
+    """
+    return {f"{case.name}/{size}": measure(case, size, repeat) for case in CASES for size in sizes}
+
+
+def main() -> None:
+    """Run the micro-benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, fastest is used")
+    parser.add_argument("--output", type=pathlib.Path, help="write the results to this file")
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.baseline.exists():
+        regressions = compare(
+            results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance
+        )
+        if regressions:
+            sys.exit("micro-benchmark regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""End-to-end hook benchmark tests."""
+
+from . import hooks
+
+
+def test_upgrade_charm():
+    """
+    arrange: bring a fake host into the state preceding the upgrade-charm hook.
+    act: dispatch the upgrade-charm hook in a fresh interpreter.
+    assert: the event and its hook phases are measured.
+    """
+    result = hooks.measure("upgrade-charm")
+
+    event = result["events"]["upgrade-charm"]
+    assert event["count"] == 1
+    assert event["wall_ms"] > 0 and event["cpu_ms"] > 0 and event["peak_rss_kib"] > 0
+    assert {"cos-setup", "cos-refresh", "render"} <= set(result["phases_ms"])
+
+
+def test_compare():
+    """
+    arrange: create a baseline of an event.
+    act: compare results using more CPU time, and taking more wall time, with the baseline.
+    assert: only the CPU time regression is reported.
+    """
+    baseline = {
+        "install": {"events": {"install": {"wall_ms": 10, "cpu_ms": 10, "peak_rss_kib": 100}}}
+    }
+    results = {
+        "install": {"events": {"install": {"wall_ms": 100, "cpu_ms": 20, "peak_rss_kib": 100}}}
+    }
+
+    assert hooks.compare(results, baseline, tolerance=0.5) == ["install/install: cpu_ms +100%"]
@@ -0,0 +1,39 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Import time benchmark tests."""
+
+import pytest
+
+from . import import_time
+
+APT = "charms.operator_libs_linux.v0.apt"
+SYSTEMD = "charms.operator_libs_linux.v1.systemd"
+COS_AGENT = "charms.grafana_agent.v0.cos_agent"
+
+
+@pytest.mark.parametrize(
+    "hook, imported, not_imported",
+    [
+        pytest.param("install", [APT, SYSTEMD], [COS_AGENT], id="install"),
+        pytest.param("config-changed", [], [APT, SYSTEMD, COS_AGENT], id="config-changed"),
+        pytest.param("upgrade-charm", [COS_AGENT], [APT], id="upgrade-charm"),
+        pytest.param(
+            "cos-agent-relation-joined", [COS_AGENT], [APT, SYSTEMD], id="cos-agent-joined"
+        ),
+        pytest.param("remove", [SYSTEMD], [APT, COS_AGENT], id="remove"),
+    ],
+)
+def test_hook_imports(hook: str, imported: list[str], not_imported: list[str]):
+    """
+    arrange: bring a fake host into the state preceding the hook.
+    act: dispatch the hook in a fresh interpreter with -X importtime.
+    assert: the charm libraries are only imported by the hooks using them.
+    """
+    result = import_time.measure(hook)
+
+    assert "charm" in result.modules
+    for module in imported:
+        assert module in result.modules
+    for module in not_imported:
+        assert module not in result.modules
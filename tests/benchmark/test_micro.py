@@ -0,0 +1,36 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Micro-benchmark tests."""
+
+from . import micro
+
+
+def test_generate_urls():
+    """
+    arrange: none.
+    act: generate source URLs.
+    assert: the URLs are deterministic, valid and mix NTP and NTS sources.
+    """
+    urls = micro.generate_urls(100)
+
+    assert urls == micro.generate_urls(100)
+    assert {url.split(":")[0] for url in urls} == {"ntp", "nts"}
+    assert len(micro._parse(urls)) == 100  # pylint: disable=protected-access
+
+
+def test_compare():
+    """
+    arrange: run the micro-benchmarks over a few sources.
+    act: compare the results with a faster and smaller baseline.
+    assert: the throughput and peak allocation regressions are reported.
+    """
+    results = micro.run([10], repeat=1)
+    baseline = {
+        key: {"ops_per_s": result["ops_per_s"] * 2, "peak_kib": result["peak_kib"] / 2}
+        for key, result in results.items()
+    }
+
+    assert set(results) == {f"{case.name}/10" for case in micro.CASES}
+    assert not micro.compare(results, results, tolerance=0.25)
+    assert len(micro.compare(results, baseline, tolerance=0.25)) == 2 * len(results)
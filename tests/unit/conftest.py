@@ -3,24 +3,142 @@
 
 """Fixtures for charm tests."""
 
+import collections
+import contextlib
 import pathlib
+import typing
 from unittest.mock import patch
 
+import ops
 import pytest
 
+import charm
 import chrony
+import config_store
+import metrics
+import resolve
+import timing
+
+
+class SystemCalls:
+    """Count the files read or written and the chrony commands run by the charm code.
+
+    The charm's own file store functions and Chrony methods are patched to count the
+    operations they stand for.
+
+    Attributes:
+        counts: Number of operations, keyed by "read:<file name>", "write:<file name>",
+            "restore:<file name>" or "chrony:<method>".
+    """
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def clear(self) -> None:
+        """Reset the counters."""
+        self.counts.clear()
+
+    def record(self, operation: str, path: pathlib.Path | None = None) -> None:
+        """Count an operation.
+
+        Args:
+            operation: "read", "write", "restore" or "chrony:<method>".
+            path: The file read or written.
+        """
+        self.counts[f"{operation}:{path.name}" if path is not None else operation] += 1
+
+    def assert_within(self, budget: dict[str, int]) -> None:
+        """Assert that the operations stay within a budget.
+
+        Args:
+            budget: Maximum number of each operation, operations not listed are not allowed.
+        """
+        exceeded = {k: v for k, v in self.counts.items() if v > budget.get(k, 0)}
+        assert not exceeded, f"operations over budget {budget}: {exceeded}"
+
+
+@pytest.fixture(name="system_calls", autouse=True)
+def system_calls_fixture():  # noqa: C901 pylint: disable=too-many-locals
+    """Count the files read or written by the file store functions of the charm."""
+    system_calls = SystemCalls()
+    real_atomic_write = config_store.atomic_write
+    real_load = config_store.ConfigStore.load
+    real_read_backup_index = config_store.ConfigStore._read_backup_index
+    real_restore = config_store.ConfigStore.restore
+    real_read_charm_revision = charm.ChronyClientCharm._read_charm_revision
+    real_read_boot_id = metrics.read_boot_id
+    real_load_histograms = metrics._load_histograms
+    real_load_cache = resolve._load_cache
+    real_flush = timing.flush
+
+    def _atomic_write(path: pathlib.Path, content: str, mode: int = 0o644) -> None:
+        system_calls.record("write", path)
+        real_atomic_write(path, content, mode)
+
+    def _load(self: config_store.ConfigStore) -> str:
+        system_calls.record("read", self.path)
+        return real_load(self)
+
+    def _read_backup_index(self: config_store.ConfigStore) -> list[dict[str, str]]:
+        if self.backup_dir is not None:
+            system_calls.record("read", self.backup_dir / "index.json")
+        return real_read_backup_index(self)
+
+    def _restore(self: config_store.ConfigStore) -> bool:
+        system_calls.record("restore", self.path)
+        return real_restore(self)
+
+    def _read_charm_revision(self: charm.ChronyClientCharm) -> str:
+        system_calls.record("read", self.charm_dir / ".juju-charm")
+        return real_read_charm_revision(self)
+
+    def _read_boot_id() -> str:
+        system_calls.record("read", metrics.BOOT_ID_FILE)
+        return real_read_boot_id()
+
+    def _load_histograms() -> dict[str, dict[str, typing.Any]]:
+        system_calls.record("read", metrics.HISTOGRAM_FILE)
+        return real_load_histograms()
+
+    def _load_cache() -> dict[str, dict[str, typing.Any]]:
+        system_calls.record("read", resolve.CACHE_FILE)
+        return real_load_cache()
+
+    def _flush(hook: str, app: str) -> None:
+        system_calls.record("write", timing.TRACE_FILE)
+        real_flush(hook, app)
+
+    with contextlib.ExitStack() as stack:
+        for module in (config_store, chrony, metrics, resolve):
+            stack.enter_context(patch.object(module, "atomic_write", _atomic_write))
+        stack.enter_context(patch.object(config_store.ConfigStore, "load", _load))
+        stack.enter_context(
+            patch.object(config_store.ConfigStore, "_read_backup_index", _read_backup_index)
+        )
+        stack.enter_context(patch.object(config_store.ConfigStore, "restore", _restore))
+        stack.enter_context(
+            patch.object(charm.ChronyClientCharm, "_read_charm_revision", _read_charm_revision)
+        )
+        stack.enter_context(patch.object(metrics, "read_boot_id", _read_boot_id))
+        stack.enter_context(patch.object(metrics, "_load_histograms", _load_histograms))
+        stack.enter_context(patch.object(resolve, "_load_cache", _load_cache))
+        stack.enter_context(patch.object(timing, "flush", _flush))
+        yield system_calls
 
 
 @pytest.fixture(name="patch_charm", autouse=True)
-def patch_charm_fixture():
+def patch_charm_fixture(system_calls: SystemCalls):
     """Patch necessary functions in the charm."""
     chrony_lock_file = None
 
     def _write_chrony_lock_file(content: str) -> None:
         nonlocal chrony_lock_file
+        system_calls.record("write", charm.CHRONY_CHARM_LOCK_FILE)
         chrony_lock_file = content
 
     def _read_chrony_lock_file() -> None | str:
+        system_calls.record("read", charm.CHRONY_CHARM_LOCK_FILE)
         return chrony_lock_file
 
     def _delete_chrony_lock_file():
@@ -38,27 +156,113 @@ def patch_charm_fixture():
         yield
 
 
+@pytest.fixture(name="unattached_resources", autouse=True)
+def unattached_resources_fixture():
+    """Fail to fetch the resources missing from the state, like Juju does."""
+    real_fetch = ops.model.Resources.fetch
+
+    def _fetch(self: ops.model.Resources, name: str) -> pathlib.Path:
+        try:
+            return real_fetch(self, name)
+        except RuntimeError as exc:
+            raise ops.ModelError(str(exc)) from exc
+
+    with patch.object(ops.model.Resources, "fetch", _fetch):
+        yield
+
+
+@pytest.fixture(name="trace_file", autouse=True)
+def trace_file_fixture(tmp_path: pathlib.Path):
+    """Redirect the hook timing trace file into a temporary directory."""
+    trace_file = tmp_path / "trace.jsonl"
+    with patch("timing.TRACE_FILE", trace_file):
+        yield trace_file
+
+
+@pytest.fixture(name="metrics_files", autouse=True)
+def metrics_files_fixture(tmp_path: pathlib.Path):
+    """Redirect the charm metrics files into a temporary directory."""
+    with (
+        patch("metrics.HISTOGRAM_FILE", tmp_path / "metrics/time-to-sync.json"),
+        patch("metrics.METRICS_FILE", tmp_path / "metrics/metrics.prom"),
+    ):
+        yield tmp_path / "metrics"
+
+
+@pytest.fixture(name="resolve_cache", autouse=True)
+def resolve_cache_fixture(tmp_path: pathlib.Path):
+    """Redirect the resolution cache file into a temporary directory."""
+    with patch("resolve.CACHE_FILE", tmp_path / "resolve-cache.json"):
+        yield tmp_path / "resolve-cache.json"
+
+
+@pytest.fixture(name="chrony_files", autouse=True)
+def chrony_files_fixture(tmp_path: pathlib.Path):
+    """Redirect the chrony configuration files into a temporary directory."""
+    with (
+        patch("chrony.Chrony.CONFIG_FILE", tmp_path / "etc/chrony/chrony.conf"),
+        patch("chrony.Chrony.CONFIG_FILE_BACKUP", tmp_path / "var/lib/chrony/chrony.conf.bak"),
+        patch("chrony.Chrony.CONFIG_BACKUP_DIR", tmp_path / "var/lib/chrony/chrony.conf.backups"),
+        patch(
+            "chrony.Chrony.SOURCES_FILE", tmp_path / "etc/chrony/sources.d/chrony-client.sources"
+        ),
+        patch(
+            "chrony.Chrony.EXPORTER_DROPIN_FILE",
+            tmp_path / "etc/systemd/system/prometheus-chrony-exporter.service.d/chrony-charm.conf",
+        ),
+        patch(
+            "chrony._CHRONY_BINARIES",
+            (tmp_path / "usr/bin/chronyc", tmp_path / "usr/sbin/chronyd"),
+        ),
+    ):
+        yield tmp_path
+
+
 @pytest.fixture(name="mock_chrony", autouse=True)
-def mock_chrony_fixture():  # noqa: C901 pylint: disable=too-many-locals
+def mock_chrony_fixture(system_calls: SystemCalls, chrony_files: pathlib.Path):  # noqa: C901 pylint: disable=too-many-locals
     """Create a Chrony object with necessary methods patched."""
     installed = False
 
     def install():
         nonlocal installed
+        system_calls.record("chrony:install")
         installed = True
 
     def uninstall():
         nonlocal installed
+        system_calls.record("chrony:uninstall")
         installed = False
 
-    mock_config = ""
+    def restart():
+        system_calls.record("chrony:restart")
+
+    def reload_sources():
+        system_calls.record("chrony:reload_sources")
+
+    def _restart_exporter():
+        system_calls.record("chrony:restart_exporter")
+
+    def _chronyc(*args: str) -> str:
+        system_calls.record("chrony:chronyc")
+        if args == ("-c", "tracking"):
+            return "C0000201,192.0.2.1,3,1700000000.0,0.000012,0.0,0.0,0.0,0.0,0.0,0.0,0.0,64.0,Normal\n"
+        if args[-1] != "sources":
+            return ""
+        # one source in use for each pool in the sources file, with an address from TEST-NET-1
+        lines = chrony.Chrony.SOURCES_FILE.read_text(encoding="utf-8").splitlines()
+        hosts = [line.split()[1] for line in lines if line.startswith("pool ")]
+        return "".join(
+            f"^,+,{f'192.0.2.{i + 1}' if '-n' in args else host},2,6,377,10,0.0,0.0,0.001\n"
+            for i, host in enumerate(hosts)
+        )
 
-    def read_config():
-        return mock_config
+    def _journalctl(*_: str) -> str:
+        system_calls.record("chrony:journalctl")
+        return ""
 
-    def write_config(config: str):
-        nonlocal mock_config
-        mock_config = config
+    def _chronyd(*_: str, **__: str) -> str:
+        system_calls.record("chrony:chronyd")
+        return ""
 
     certs: dict[str, str] = {}
 
@@ -67,46 +271,57 @@ def mock_chrony_fixture():  # noqa: C901 pylint: disable=too-many-locals
             yield pathlib.Path("/etc/chrony/certs") / file
 
     def _write_certs_file(path: pathlib.Path, content: str):
+        system_calls.record("write", path)
         certs[path.name] = content
 
     def _read_certs_file(path: pathlib.Path):
+        system_calls.record("read", path)
         return certs[path.name]
 
     def _unlink_certs_file(path: pathlib.Path) -> None:
         del certs[path.name]
 
-    backup_config_content = None
+    exporter_digest_cache: dict = {}
 
-    def backup_config():
-        nonlocal backup_config_content
-        backup_config_content = read_config()
+    def _read_exporter_digest_cache():
+        system_calls.record("read", chrony.Chrony.EXPORTER_DIGEST_CACHE_FILE)
+        return dict(exporter_digest_cache)
 
-    def restore_config():
-        if backup_config_content is not None:
-            write_config(backup_config_content)
+    def _write_exporter_digest_cache(cache: dict):
+        system_calls.record("write", chrony.Chrony.EXPORTER_DIGEST_CACHE_FILE)
+        exporter_digest_cache.clear()
+        exporter_digest_cache.update(cache)
 
     with (
         patch("chrony.Chrony.install") as mock_install,
         patch("chrony.Chrony.uninstall") as mock_uninstall,
-        patch("chrony.Chrony.restart"),
-        patch("chrony.Chrony.write_config") as mock_write_config,
-        patch("chrony.Chrony.read_config") as mock_read_config,
-        patch("chrony.Chrony.backup_config") as mock_backup_config,
-        patch("chrony.Chrony.restore_config") as mock_restore_config,
+        patch("chrony.Chrony.restart") as mock_restart,
+        patch("chrony.Chrony.reload_sources") as mock_reload_sources,
+        patch("chrony.Chrony._restart_exporter") as mock_restart_exporter,
+        patch("chrony.Chrony._chronyc") as mock_chronyc,
+        patch("chrony.Chrony._chronyd") as mock_chronyd,
+        patch("chrony.Chrony._journalctl") as mock_journalctl,
+        patch("chrony.Chrony._service_running", return_value=True),
         patch("chrony.Chrony._make_certs_dir"),
         patch("chrony.Chrony._iter_certs_dir") as mock_iter_certs_dir,
         patch("chrony.Chrony._write_certs_file") as mock_write_certs_file,
         patch("chrony.Chrony._read_certs_file") as mock_read_certs_file,
         patch("chrony.Chrony._unlink_certs_file") as mock_unlink_certs_file,
+        patch("chrony.Chrony._read_exporter_digest_cache") as mock_read_exporter_digest_cache,
+        patch("chrony.Chrony._write_exporter_digest_cache") as mock_write_exporter_digest_cache,
     ):
         mock_install.side_effect = install
         mock_uninstall.side_effect = uninstall
-        mock_read_config.side_effect = read_config
-        mock_write_config.side_effect = write_config
-        mock_backup_config.side_effect = backup_config
-        mock_restore_config.side_effect = restore_config
+        mock_restart.side_effect = restart
+        mock_reload_sources.side_effect = reload_sources
+        mock_restart_exporter.side_effect = _restart_exporter
+        mock_chronyc.side_effect = _chronyc
+        mock_chronyd.side_effect = _chronyd
+        mock_journalctl.side_effect = _journalctl
         mock_iter_certs_dir.side_effect = _iter_certs_dir
         mock_write_certs_file.side_effect = _write_certs_file
         mock_read_certs_file.side_effect = _read_certs_file
         mock_unlink_certs_file.side_effect = _unlink_certs_file
+        mock_read_exporter_digest_cache.side_effect = _read_exporter_digest_cache
+        mock_write_exporter_digest_cache.side_effect = _write_exporter_digest_cache
         yield chrony.Chrony()
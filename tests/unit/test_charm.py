@@ -7,13 +7,22 @@
 
 """Unit tests."""
 
+import dataclasses
+import gzip
+import json
+import pathlib
+import subprocess  # nosec B404
 import textwrap
+import time
+import typing
+from unittest.mock import patch
 
 import pytest
 from ops import testing
 
 import charm
 import chrony
+import probe
 
 
 @pytest.mark.parametrize(
@@ -61,14 +70,32 @@ import chrony
             True,
             textwrap.dedent(
                 """\
-                pool ntp.ubuntu.com iburst maxsources 4
                 pool 0.ubuntu.pool.ntp.org iburst maxsources 1
                 pool 1.ubuntu.pool.ntp.org iburst maxsources 1
                 pool 2.ubuntu.pool.ntp.org iburst maxsources 2
+                pool ntp.ubuntu.com iburst maxsources 4
                 """
             ),
             id="multiple ntp server",
         ),
+        pytest.param(
+            "ntp://a.example?iburst=true,ntp://A.example:123?iburst=1&maxpoll=8,nts://a.example",
+            True,
+            "pool a.example iburst maxpoll 8\npool a.example nts",
+            id="duplicate ntp server",
+        ),
+        pytest.param(
+            "ntp://192.0.2.1?type=server&iburst=true,ntp://192.0.2.2?type=peer",
+            True,
+            "server 192.0.2.1 iburst\npeer 192.0.2.2",
+            id="ntp server and peer directives",
+        ),
+        pytest.param(
+            "ntp://192.0.2.1?type=server&maxsources=2",
+            False,
+            "",
+            id="invalid sources: pool option on a server",
+        ),
         pytest.param(
             "example.com",
             False,
@@ -105,6 +132,12 @@ import chrony
             "",
             id="invalid sources: unknown param",
         ),
+        pytest.param(
+            "ntp://example.com?host=example.net",
+            False,
+            "",
+            id="invalid sources: reserved param",
+        ),
     ],
 )
 def test_chrony_config(sources: str, valid: bool, source_config: str, mock_chrony: chrony.Chrony):
@@ -134,8 +167,6 @@ def test_chrony_config(sources: str, valid: bool, source_config: str, mock_chron
     assert state_out.unit_status == testing.ActiveStatus()
     expected_config = (
         charm.CHRONY_CHARM_CONFIG_HEADER
-        + "\n\n"
-        + source_config.strip()
         + "\n"
         + textwrap.dedent(
             """
@@ -153,9 +184,378 @@ def test_chrony_config(sources: str, valid: bool, source_config: str, mock_chron
         )
     )
     assert mock_chrony.read_config() == expected_config
+    expected_sources_config = (
+        charm.CHRONY_CHARM_CONFIG_HEADER + "\n\n" + source_config.strip() + "\n"
+    )
+    assert mock_chrony.read_sources_config() == expected_sources_config
     mock_chrony.restart.assert_called_once()
 
 
+def test_chrony_sources_reload(mock_chrony: chrony.Chrony):
+    """
+    arrange: run the `config-changed` event to configure chrony.
+    act: trigger the 'config-changed' event with different sources charm configuration.
+    assert: the sources file is updated and reloaded without restarting chrony.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    config = mock_chrony.read_config()
+    mock_chrony.restart.reset_mock()
+
+    state_out = ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(state_out, config={"sources": "nts://example.net"}),
+    )
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert mock_chrony.read_config() == config
+    assert "pool example.net nts" in mock_chrony.read_sources_config()
+    assert "example.com" not in mock_chrony.read_sources_config()
+    mock_chrony.reload_sources.assert_called_once()
+    mock_chrony.restart.assert_not_called()
+
+
+def test_chrony_sources_reordered(mock_chrony: chrony.Chrony, system_calls):
+    """
+    arrange: run the `config-changed` event to configure chrony.
+    act: trigger the 'config-changed' event with the same sources in another order.
+    assert: the sources file is not rewritten and chrony is not reloaded.
+    """
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://a.example,nts://b.example"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    system_calls.clear()
+
+    state_out = ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(state_out, config={"sources": "nts://B.example,ntp://a.example:123"}),
+    )
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert system_calls.counts["write:chrony-client.sources"] == 0
+    mock_chrony.reload_sources.assert_not_called()
+
+
+def test_chrony_sources_resource(mock_chrony: chrony.Chrony, tmp_path: pathlib.Path):
+    """
+    arrange: attach a gzip compressed sources resource.
+    act: trigger the 'config-changed' event, then attach an empty sources resource.
+    assert: the resource replaces the sources charm configuration until it's emptied.
+    """
+    resource = tmp_path / "sources.txt"
+    resource.write_bytes(gzip.compress(b"# estate\nntp://a.example\nnts://b.example\n"))
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+        resources={testing.Resource(name="sources", path=resource)},
+    )
+
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    sources_config = mock_chrony.read_sources_config()
+    assert "pool a.example\npool b.example nts\n" in sources_config
+    assert "example.com" not in sources_config
+
+    resource.write_bytes(b"")
+    state_out = ctx.run(ctx.on.upgrade_charm(), state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert "pool example.com\n" in mock_chrony.read_sources_config()
+
+
+def test_chrony_sources_resource_invalid(mock_chrony: chrony.Chrony, tmp_path: pathlib.Path):
+    """
+    arrange: attach a sources resource with invalid lines.
+    act: trigger the 'config-changed' event.
+    assert: the unit is blocked, reporting all invalid lines, and chrony is not configured.
+    """
+    resource = tmp_path / "sources.txt"
+    resource.write_text(
+        "ntp://a.example\nfoo\nntp://b.example?bar=1\nrefclock://shm/0?driver=SOCK\n",
+        encoding="utf-8",
+    )
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+        resources={testing.Resource(name="sources", path=resource)},
+    )
+
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert state_out.unit_status == testing.BlockedStatus(
+        "invalid sources resource: 3 invalid line(s), first at line 2"
+    )
+    assert mock_chrony.read_sources_config() == ""
+
+
+@pytest.mark.parametrize(
+    "failure, status, restarts",
+    [
+        pytest.param("validate", "chronyd rejected the configuration", 0, id="invalid config"),
+        pytest.param("health", "chronyd unhealthy, configuration rolled back", 2, id="unhealthy"),
+    ],
+)
+def test_chrony_config_rollback(
+    failure: str, status: str, restarts: int, mock_chrony: chrony.Chrony
+):
+    """
+    arrange: make chronyd reject the configuration, or chrony fail to start.
+    act: trigger the 'config-changed' event.
+    assert: the previous configuration is restored and the unit is blocked.
+    """
+    mock_chrony.write_config("default")
+    if failure == "validate":
+        mock_chrony._chronyd.side_effect = subprocess.CalledProcessError(1, "chronyd")
+    else:
+        mock_chrony._service_running.return_value = False
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    with patch.object(chrony.Chrony, "HEALTH_CHECK_TIMEOUT", 0):
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert state_out.unit_status == testing.BlockedStatus(status)
+    assert mock_chrony.read_config() == "default"
+    assert not mock_chrony.SOURCES_FILE.exists()
+    assert mock_chrony.restart.call_count == restarts
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert stored.content["reconcile_fingerprint"] == ""
+
+
+def test_chrony_restart_once_per_burst(mock_chrony: chrony.Chrony):
+    """
+    arrange: none.
+    act: trigger a burst of hooks, 'config-changed' changing chrony.conf, 'upgrade-charm',
+        'cos-agent-relation-joined' and 'config-changed' changing the sources.
+    assert: chrony is restarted once, by the first hook, and the restart is recorded.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    cos_agent = testing.Relation(endpoint="cos-agent", id=2)
+    state = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1), cos_agent],
+    )
+
+    state = ctx.run(ctx.on.config_changed(), state)
+    mock_chrony.restart.assert_called_once()
+    state = ctx.run(ctx.on.upgrade_charm(), state)
+    state = ctx.run(ctx.on.relation_joined(state.get_relation(cos_agent.id)), state)
+    state = ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(state, config={"sources": "ntp://example.net"}),
+    )
+
+    assert state.unit_status == testing.ActiveStatus()
+    mock_chrony.restart.assert_called_once()
+    mock_chrony.reload_sources.assert_called_once()
+    stored = state.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert stored.content["restart_count"] == 1
+
+
+def test_chrony_sync_gate(mock_chrony: chrony.Chrony):
+    """
+    arrange: enable the sync gate and make chrony synchronize after two checks.
+    act: trigger the 'config-changed' event.
+    assert: the unit reports the offset while waiting, then it's set to active.
+    """
+    mock_chrony.write_config("default")
+    unsynchronized = chrony.Tracking(reference_id="00000000", offset=0.25, leap_status="Normal")
+    synchronized = chrony.Tracking(reference_id="C0000201", offset=0.002, leap_status="Normal")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com", "sync-timeout": 30},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    with (
+        patch.object(chrony.Chrony, "SYNC_CHECK_INTERVAL", 0),
+        patch.object(chrony.Chrony, "tracking", side_effect=[None, unsynchronized, synchronized]),
+    ):
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert testing.WaitingStatus("waiting for time sync") in ctx.unit_status_history
+    assert (
+        testing.WaitingStatus("waiting for time sync, offset +250.0 ms") in ctx.unit_status_history
+    )
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert not stored.content["sync_pending"]
+
+
+def test_chrony_sync_gate_timeout(mock_chrony: chrony.Chrony):
+    """
+    arrange: enable the sync gate and keep chrony unsynchronized.
+    act: trigger the 'config-changed' event, then the 'update-status' event once chrony is
+        synchronized.
+    assert: the unit is waiting after the bounded wait, then it's set to active.
+    """
+    mock_chrony.write_config("default")
+    unsynchronized = chrony.Tracking(
+        reference_id="C0000201", offset=-1.5, leap_status="Not synchronised"
+    )
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com", "sync-timeout": 3600},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    with (
+        patch.object(charm, "SYNC_TIMEOUT_MAX", 0.05),
+        patch.object(chrony.Chrony, "SYNC_CHECK_INTERVAL", 0.01),
+        patch.object(chrony.Chrony, "tracking", return_value=unsynchronized),
+    ):
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert state_out.unit_status == testing.WaitingStatus(
+        "waiting for time sync, offset -1500.0 ms"
+    )
+
+    state_out = ctx.run(ctx.on.update_status(), state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert not stored.content["sync_pending"]
+
+
+def test_chrony_bootstrap(mock_chrony: chrony.Chrony):
+    """
+    arrange: enable the bootstrap mode and keep chrony unsynchronized.
+    act: trigger the 'install' event, then the 'update-status' event once chrony is
+        synchronized.
+    assert: the bootstrap configuration is applied to the new unit, then replaced with the
+        steady-state configuration, which an 'install' event of the same unit keeps.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com", "bootstrap": True},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    with patch.object(chrony.Chrony, "tracking", return_value=None):
+        state_out = ctx.run(ctx.on.install(), state_in)
+        assert "makestep 0.1 -1\n" in mock_chrony.read_config()
+        assert "pool example.com burst iburst minpoll 4\n" in mock_chrony.read_sources_config()
+
+        state_out = ctx.run(ctx.on.update_status(), state_out)
+        assert "makestep 0.1 -1\n" in mock_chrony.read_config()
+
+    mock_chrony.restart.reset_mock()
+    state_out = ctx.run(ctx.on.update_status(), state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert "makestep 1 3\n" in mock_chrony.read_config()
+    assert "pool example.com\n" in mock_chrony.read_sources_config()
+    mock_chrony.restart.assert_called_once()
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert not stored.content["bootstrap"]
+
+    state_out = ctx.run(ctx.on.install(), state_out)
+
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert not stored.content["bootstrap"]
+
+
+def test_chrony_probe_sources(mock_chrony: chrony.Chrony):
+    """
+    arrange: enable the latency probe of time sources.
+    act: trigger the 'config-changed' event, again with another probe budget, then once the
+        probe results expired.
+    assert: only the time sources with the lowest latency are configured, the best one is
+        marked prefer. The cached probe results keep the selection until they expire.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={
+            "sources": "ntp://a.example.com,ntp://b.example.com,nts://c.example.com",
+            "probe-sources": 2,
+        },
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    results = [
+        probe.ProbeResult(delay=0.030, jitter=0.002),
+        probe.ProbeResult(delay=0.010, jitter=0.001),
+        None,
+    ]
+
+    with patch.object(probe, "probe_sources", return_value=results) as probe_sources:
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert probe_sources.call_args.kwargs == {"timeout": 2.0}
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert mock_chrony.read_sources_config().splitlines()[-2:] == [
+        "pool a.example.com",
+        "pool b.example.com prefer",
+    ]
+
+    state_in = dataclasses.replace(state_out, config={**state_in.config, "probe-timeout": 1.0})
+    reversed_results = [results[1], results[0], None]
+    with patch.object(probe, "probe_sources", return_value=reversed_results) as probe_sources:
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+        probe_sources.assert_not_called()
+        assert mock_chrony.read_sources_config().splitlines()[-1] == "pool b.example.com prefer"
+
+        with patch.object(time, "time", return_value=time.time() + 86401):
+            state_out = ctx.run(
+                ctx.on.config_changed(),
+                dataclasses.replace(state_out, config={**state_in.config, "probe-timeout": 3.0}),
+            )
+    probe_sources.assert_called_once()
+    assert mock_chrony.read_sources_config().splitlines()[-2:] == [
+        "pool a.example.com prefer",
+        "pool b.example.com",
+    ]
+
+
+def test_chrony_refclock(mock_chrony: chrony.Chrony):
+    """
+    arrange: configure a reference clock and a network time source.
+    act: trigger the 'config-changed' event, then remove the network time source.
+    assert: the reference clock is configured in the chrony configuration file and the network
+        time source in the sources file, so removing the network time source doesn't restart
+        chrony.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    refclock = "refclock://sock/run/chrony.ttyS0.sock?refid=GPS&prefer=true"
+    state_in = testing.State(
+        config={"sources": f"{refclock},ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    assert mock_chrony.read_config().endswith(
+        "\nrefclock SOCK /run/chrony.ttyS0.sock prefer refid GPS\n"
+    )
+    assert mock_chrony.read_sources_config().endswith("\npool example.com\n")
+
+    mock_chrony.restart.reset_mock()
+    state_out = ctx.run(
+        ctx.on.config_changed(), dataclasses.replace(state_out, config={"sources": refclock})
+    )
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert "refclock SOCK" in mock_chrony.read_config()
+    assert "pool" not in mock_chrony.read_sources_config()
+    mock_chrony.restart.assert_not_called()
+
+
 def test_chrony_uninstall(mock_chrony: chrony.Chrony):
     """
     arrange: run the `config-changed` event
@@ -181,3 +581,384 @@ def test_chrony_uninstall(mock_chrony: chrony.Chrony):
     assert charm.ChronyClientCharm._read_chrony_lock_file() is None
     assert mock_chrony.read_config() == "default"
     mock_chrony.uninstall.assert_called_once()
+
+
+def test_chrony_config_unchanged_fast_path(mock_chrony: chrony.Chrony):
+    """
+    arrange: run the `config-changed` event to configure chrony.
+    act: trigger the 'config-changed' event again with the same charm configuration.
+    assert: the charm skips the reconciliation and records the fast path.
+    """
+    mock_chrony.write_config("default")
+
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    mock_chrony.install.reset_mock()
+    mock_chrony.restart.reset_mock()
+
+    state_out = ctx.run(ctx.on.config_changed(), state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    mock_chrony.install.assert_not_called()
+    mock_chrony.restart.assert_not_called()
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert stored.content["reconcile_count"] == 2
+    assert stored.content["reconcile_fast_path_count"] == 1
+
+
+def test_chrony_config_equivalent(mock_chrony: chrony.Chrony):
+    """
+    arrange: run the `config-changed` event to configure chrony.
+    act: reorder the directives in the configuration files and trigger the 'config-changed'
+        event.
+    assert: the configuration files are rewritten without restarting or reloading chrony.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com,ntp://example.net"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    config, sources_config = mock_chrony.read_config(), mock_chrony.read_sources_config()
+    mock_chrony.restart.reset_mock()
+    mock_chrony.write_config("\n".join(reversed(config.splitlines())))
+    mock_chrony.write_sources_config("\n".join(reversed(sources_config.splitlines())))
+
+    state_out = ctx.run(ctx.on.config_changed(), state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert mock_chrony.read_config() == config
+    assert mock_chrony.read_sources_config() == sources_config
+    mock_chrony.restart.assert_not_called()
+    mock_chrony.reload_sources.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "new_sources, commands",
+    [
+        pytest.param(
+            "ntp://example.com?minpoll=4,nts://example.net?maxdelay=0.5",
+            ("minpoll 192.0.2.1 4", "maxdelay 192.0.2.2 0.5"),
+            id="runtime options",
+        ),
+        pytest.param(
+            "ntp://example.com?minpoll=6&offline=true,nts://example.net",
+            ("offline 192.0.2.1",),
+            id="offline",
+        ),
+        pytest.param("ntp://example.com?iburst=true,nts://example.net", None, id="iburst"),
+        pytest.param("ntp://example.com,nts://example.net", None, id="option unset"),
+        pytest.param("ntp://example.com?minpoll=4", None, id="source removed"),
+    ],
+)
+def test_chrony_source_options_runtime(
+    new_sources: str, commands: tuple[str, ...] | None, mock_chrony: chrony.Chrony
+):
+    """
+    arrange: run the `config-changed` event to configure chrony.
+    act: trigger the 'config-changed' event with different source options.
+    assert: options with a chronyc equivalent are changed with chronyc, other changes reload
+        the sources.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com?minpoll=6,nts://example.net"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    mock_chrony.restart.reset_mock()
+
+    state_out = ctx.run(
+        ctx.on.config_changed(), dataclasses.replace(state_out, config={"sources": new_sources})
+    )
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert mock_chrony.read_sources_config().endswith(
+        "\n".join(mock_chrony.parse_source_url(u).render() for u in new_sources.split(",")) + "\n"
+    )
+    mock_chrony.restart.assert_not_called()
+    if commands is None:
+        mock_chrony.reload_sources.assert_called_once()
+    else:
+        mock_chrony.reload_sources.assert_not_called()
+        mock_chrony._chronyc.assert_any_call("-m", *commands)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        pytest.param("sources", id="sources changed"),
+        pytest.param("config", id="config file changed on disk"),
+        pytest.param("binary", id="chrony binary changed on disk"),
+        pytest.param("upgrade", id="charm upgraded"),
+    ],
+)
+def test_chrony_config_changed_slow_path(change: str, mock_chrony: chrony.Chrony):
+    """
+    arrange: run the `config-changed` event to configure chrony.
+    act: change the charm configuration, the config file, the chrony binaries or upgrade the
+        charm.
+    assert: the charm does a full reconciliation and restores the configuration.
+    """
+    mock_chrony.write_config("default")
+
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    expected_config = mock_chrony.read_config()
+    expected_sources_config = mock_chrony.read_sources_config()
+    event = ctx.on.config_changed()
+    if change == "sources":
+        expected_sources_config = expected_sources_config.replace("example.com", "example.net")
+        state_out = dataclasses.replace(state_out, config={"sources": "ntp://example.net"})
+    elif change == "config":
+        mock_chrony.write_config("modified")
+    elif change == "binary":
+        chronyd = chrony._CHRONY_BINARIES[1]
+        chronyd.parent.mkdir(parents=True)
+        chronyd.write_bytes(b"chronyd")
+    else:
+        event = ctx.on.upgrade_charm()
+
+    state_out = ctx.run(event, state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert mock_chrony.read_config() == expected_config
+    assert mock_chrony.read_sources_config() == expected_sources_config
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert stored.content["reconcile_fast_path_count"] == 0
+
+
+def test_cos_agent_refresh(mock_chrony: chrony.Chrony):
+    """
+    arrange: relate the charm with a COS agent.
+    act: trigger the 'cos-agent-relation-joined' and the 'config-changed' events.
+    assert: the COS agent integration is only set up in the hooks refreshing it.
+    """
+    mock_chrony.write_config("default")
+    cos_agent = testing.Relation(endpoint="cos-agent", id=2)
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1), cos_agent],
+    )
+
+    with ctx(ctx.on.config_changed(), state_in) as manager:
+        assert manager.charm._grafana_agent is None
+        manager.run()
+    state_out = ctx.run(ctx.on.relation_joined(cos_agent), state_in)
+
+    assert "config" in dict(state_out.get_relation(cos_agent.id).local_unit_data)
+
+
+def test_exporter_configuration(mock_chrony: chrony.Chrony, system_calls):
+    """
+    arrange: select the chrony_exporter collectors and disable the DNS lookups.
+    act: trigger the 'config-changed' event twice, then with invalid collectors.
+    assert: the exporter is configured with a drop-in and restarted once, the unchanged
+        configuration is skipped and the invalid collectors block the unit.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={
+            "sources": "ntp://example.com",
+            "exporter-collectors": "tracking, sources",
+            "exporter-dns-lookups": False,
+        },
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    state_out = ctx.run(ctx.on.config_changed(), state_out)
+
+    assert state_out.unit_status == testing.ActiveStatus()
+    assert "--no-collector.serverstats --no-collector.dns-lookups" in (
+        mock_chrony.EXPORTER_DROPIN_FILE.read_text(encoding="utf-8")
+    )
+    assert system_calls.counts["chrony:restart_exporter"] == 1
+
+    state_out = ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(
+            state_out, config={**state_in.config, "exporter-collectors": "tracking,ntpdata"}
+        ),
+    )
+    assert state_out.unit_status == testing.BlockedStatus(
+        "invalid exporter-collectors configuration"
+    )
+
+
+def test_exporter_scrape_settings(mock_chrony: chrony.Chrony):
+    """
+    arrange: relate the charm with a COS agent.
+    act: trigger the 'config-changed' event with a scrape interval and timeout, then again.
+    assert: the scrape settings are sent to the COS agent, which is only set up again if they
+        change.
+    """
+    mock_chrony.write_config("default")
+    cos_agent = testing.Relation(endpoint="cos-agent", id=2)
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={
+            "sources": "ntp://example.com",
+            "exporter-scrape-interval": "5m",
+            "exporter-scrape-timeout": "30s",
+        },
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1), cos_agent],
+    )
+
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+    with ctx(ctx.on.config_changed(), state_out) as manager:
+        assert manager.charm._grafana_agent is None
+        manager.run()
+
+    unit_data = typing.cast(dict[str, str], state_out.get_relation(cos_agent.id).local_unit_data)
+    config = json.loads(unit_data["config"])
+    jobs = {job["static_configs"][0]["targets"][0]: job for job in config["metrics_scrape_jobs"]}
+    assert jobs["localhost:9123"]["scrape_interval"] == "5m"
+    assert jobs["localhost:9123"]["scrape_timeout"] == "30s"
+    assert "scrape_interval" not in jobs["localhost:9124"]
+
+    state_out = ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(
+            state_out, config={**state_in.config, "exporter-scrape-interval": "1 minute"}
+        ),
+    )
+    assert state_out.unit_status == testing.BlockedStatus(
+        "invalid exporter-scrape-interval configuration"
+    )
+
+
+@pytest.mark.parametrize(
+    "hook, budget",
+    [
+        pytest.param(
+            "config-changed",
+            {
+                "read:lock": 1,
+                "read:.juju-charm": 1,
+                "read:chrony.conf": 1,
+                "read:chrony-client.sources": 1,
+                "write:trace.jsonl": 1,
+            },
+            id="steady config-changed",
+        ),
+        pytest.param(
+            "upgrade-charm",
+            {
+                "read:lock": 1,
+                "read:.juju-charm": 1,
+                "read:chrony.conf": 1,
+                "read:chrony-client.sources": 1,
+                "read:exporter-digests.json": 1,
+                "read:chrony.rule": 1,
+                "read:chrony.json": 1,
+                "chrony:install": 1,
+                "write:trace.jsonl": 1,
+            },
+            id="upgrade-charm",
+        ),
+        pytest.param(
+            "cos-agent-relation-changed",
+            {"read:chrony.rule": 1, "read:chrony.json": 1, "write:trace.jsonl": 1},
+            id="cos-agent-relation-changed",
+        ),
+        pytest.param(
+            "remove",
+            {
+                "read:lock": 2,
+                "read:index.json": 1,
+                "restore:chrony.conf": 1,
+                "write:chrony.conf": 1,
+                "chrony:uninstall": 1,
+                "chrony:restart": 1,
+                "write:trace.jsonl": 1,
+            },
+            id="remove",
+        ),
+    ],
+)
+def test_hook_system_call_budget(
+    hook: str, budget: dict[str, int], mock_chrony: chrony.Chrony, system_calls
+):
+    """
+    arrange: install and configure the charm.
+    act: trigger a hook.
+    assert: the chrony commands run and the files read or written stay within the budget.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[
+            testing.SubordinateRelation(endpoint="juju-info", id=1),
+            testing.Relation(endpoint="cos-agent", id=2),
+        ],
+    )
+    state = ctx.run(ctx.on.install(), state)
+    # chrony synchronized since, the time to sync measurement is recorded
+    stored = state.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    stored = dataclasses.replace(stored, content={**stored.content, "time_to_sync": ""})
+    state = dataclasses.replace(state, stored_states={stored})
+    system_calls.clear()
+
+    events = {
+        "config-changed": ctx.on.config_changed,
+        "upgrade-charm": ctx.on.upgrade_charm,
+        "remove": ctx.on.remove,
+        "cos-agent-relation-changed": lambda: ctx.on.relation_changed(state.get_relation(2)),
+    }
+    ctx.run(events[hook](), state)
+
+    system_calls.assert_within(budget)
+
+
+def test_install_system_call_budget(mock_chrony: chrony.Chrony, system_calls):
+    """
+    arrange: none.
+    act: trigger the 'install' event on a new unit.
+    assert: the chrony commands run and the files read or written stay within the budget.
+    """
+    mock_chrony.write_config("default")
+    system_calls.clear()
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    ctx.run(ctx.on.install(), state_in)
+
+    system_calls.assert_within(
+        {
+            "read:lock": 1,
+            "write:lock": 1,
+            "read:.juju-charm": 1,
+            "read:chrony.conf": 1,
+            "read:index.json": 1,
+            "write:chrony.conf.0": 1,
+            "write:index.json": 1,
+            "write:chrony.conf": 1,
+            "read:chrony-client.sources": 1,
+            "write:chrony-client.sources": 1,
+            "read:exporter-digests.json": 1,
+            "chrony:install": 1,
+            "chrony:chronyd": 1,
+            "chrony:restart": 1,
+            "chrony:chronyc": 1,
+            # start of the time to sync measurement of the restart
+            "read:boot_id": 1,
+            "write:trace.jsonl": 1,
+        }
+    )
@@ -0,0 +1,746 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# pylint: disable=missing-function-docstring,protected-access
+
+"""Unit tests for the chrony controller."""
+
+import bz2
+import gzip
+import hashlib
+import lzma
+import pathlib
+import socket
+import subprocess  # nosec B404
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import chrony
+
+
+@pytest.fixture(name="exporter_files")
+def exporter_files_fixture(tmp_path: pathlib.Path):
+    """Create bundled and installed chrony_exporter files in a temporary directory."""
+    charm_dir = tmp_path / "charm"
+    (charm_dir / "bin").mkdir(parents=True)
+    (charm_dir / "files").mkdir()
+    installed_dir = tmp_path / "installed"
+    installed_dir.mkdir()
+    files = {}
+    manifest = []
+    for name, content in [
+        ("bin/chrony_exporter", b"binary"),
+        ("files/chrony-exporter.service", b"service"),
+        ("files/usr.bin.chrony_exporter", b"apparmor"),
+    ]:
+        source = charm_dir / name
+        source.write_bytes(content)
+        target = installed_dir / source.name
+        target.write_bytes(content)
+        files[source] = target
+        manifest.append(f"{hashlib.sha256(content).hexdigest()}  {name}")
+    metrics_service_files = {}
+    for name in ("chrony-charm-metrics.socket", "chrony-charm-metrics@.service"):
+        source = charm_dir / "files" / name
+        source.write_bytes(name.encode())
+        metrics_service_files[source] = installed_dir / name
+        metrics_service_files[source].write_bytes(name.encode())
+        manifest.append(f"{hashlib.sha256(name.encode()).hexdigest()}  files/{name}")
+    manifest_file = charm_dir / "chrony-exporter.sha256"
+    manifest_file.write_text("\n".join(manifest) + "\n", encoding="utf-8")
+    with (
+        patch("chrony._CHRONY_EXPORTER_FILES", files),
+        patch("chrony._METRICS_SERVICE_FILES", metrics_service_files),
+        patch("chrony._CHRONY_EXPORTER_MANIFEST_FILE", manifest_file),
+        patch("chrony.shutil.which", return_value="/usr/bin/chronyc"),
+    ):
+        yield {**files, **metrics_service_files}
+
+
+def test_is_installed(
+    exporter_files: dict[pathlib.Path, pathlib.Path], mock_chrony: chrony.Chrony
+):
+    """
+    arrange: install chrony_exporter files identical to the bundled files.
+    act: check if chrony is installed, then modify one installed file.
+    assert: installed files are compared with the build manifest.
+    """
+    assert mock_chrony.is_installed()
+
+    target = next(iter(exporter_files.values()))
+    target.write_bytes(b"modified binary")
+
+    assert not mock_chrony.is_installed()
+
+
+def test_is_installed_metrics_service_modified(
+    exporter_files: dict[pathlib.Path, pathlib.Path], mock_chrony: chrony.Chrony
+):
+    """
+    arrange: install the bundled files, then modify the installed charm metrics socket unit.
+    act: check if chrony is installed.
+    assert: the metrics service files are compared with the build manifest too.
+    """
+    target = exporter_files[next(s for s in exporter_files if s.suffix == ".socket")]
+    target.write_bytes(b"modified socket")
+
+    assert not mock_chrony.is_installed()
+
+
+def test_is_installed_missing_manifest_entry(
+    exporter_files: dict[pathlib.Path, pathlib.Path], mock_chrony: chrony.Chrony
+):
+    """
+    arrange: write a build manifest without the charm metrics service unit.
+    act: check if chrony is installed.
+    assert: the file missing from the manifest is treated as not installed.
+    """
+    manifest_file = chrony._CHRONY_EXPORTER_MANIFEST_FILE
+    lines = manifest_file.read_text(encoding="utf-8").splitlines()
+    manifest_file.write_text(
+        "\n".join(line for line in lines if not line.endswith("@.service")) + "\n",
+        encoding="utf-8",
+    )
+
+    assert not mock_chrony.is_installed()
+
+
+def test_installed_file_digests_cached(
+    exporter_files: dict[pathlib.Path, pathlib.Path], mock_chrony: chrony.Chrony
+):
+    """
+    arrange: calculate the digests of the installed bundled files once.
+    act: calculate the digests again with unchanged and with changed files.
+    assert: files are only hashed again when their stat signature changed.
+    """
+    digests = mock_chrony.installed_file_digests()
+
+    with patch("chrony._sha256_file") as mock_sha256_file:
+        assert mock_chrony.installed_file_digests() == digests
+        mock_sha256_file.assert_not_called()
+
+    target = next(iter(exporter_files.values()))
+    target.write_bytes(b"modified binary")
+    with patch("chrony._sha256_file", return_value="modified") as mock_sha256_file:
+        assert mock_chrony.installed_file_digests()[str(target)] == "modified"
+        mock_sha256_file.assert_called_once_with(target)
+
+
+@pytest.mark.parametrize(
+    "old, new, expected",
+    [
+        pytest.param(
+            "ntp://a.example?maxpoll=10,nts://b.example",
+            "ntp://a.example?maxpoll=8&polltarget=6,nts://b.example?minstratum=2",
+            {"a.example": {"maxpoll": 8, "polltarget": 6}, "b.example": {"minstratum": 2}},
+            id="runtime options",
+        ),
+        pytest.param("ntp://a.example", "ntp://a.example", {}, id="unchanged"),
+        pytest.param("ntp://a.example", "ntp://a.example?prefer=true", None, id="prefer"),
+        pytest.param("ntp://a.example?minpoll=4", "ntp://a.example", None, id="unset"),
+        pytest.param("ntp://a.example", "nts://a.example", None, id="scheme changed"),
+        pytest.param("ntp://a.example", "ntp://a.example,ntp://b.example", None, id="added"),
+        pytest.param(
+            "ntp://a.example,ntp://a.example:1123",
+            "ntp://a.example?minpoll=4,ntp://a.example:1123",
+            None,
+            id="duplicated host",
+        ),
+    ],
+)
+def test_diff_source_options(old: str, new: str, expected: dict | None):
+    """
+    arrange: parse two lists of time sources.
+    act: compare the source options.
+    assert: only changes of options with a chronyc equivalent are returned.
+    """
+    old_sources = [chrony.Chrony.parse_source_url(url) for url in old.split(",")]
+    new_sources = [chrony.Chrony.parse_source_url(url) for url in new.split(",")]
+
+    assert chrony.Chrony.diff_source_options(old_sources, new_sources) == expected
+
+
+def test_apply_source_options_failure(mock_chrony: chrony.Chrony):
+    """
+    arrange: configure a pool with no source in use, then a pool with a failing chronyc.
+    act: apply changed source options.
+    assert: the failure is reported so the sources can be reloaded instead.
+    """
+    mock_chrony.write_sources_config("pool a.example\n")
+
+    assert not mock_chrony.apply_source_options({"b.example": {"minpoll": 4}})
+
+    mock_chrony._chronyc.side_effect = subprocess.CalledProcessError(1, "chronyc")
+    assert not mock_chrony.apply_source_options({"a.example": {"minpoll": 4}})
+
+
+def test_restore_legacy_backup(mock_chrony: chrony.Chrony):
+    """
+    arrange: write a configuration backup in the single backup file of older charm revisions.
+    act: restore the chrony configuration file.
+    assert: the configuration file is restored from the legacy backup file.
+    """
+    mock_chrony.write_config("managed")
+    mock_chrony.CONFIG_FILE_BACKUP.parent.mkdir(parents=True, exist_ok=True)
+    mock_chrony.CONFIG_FILE_BACKUP.write_text("original", encoding="utf-8")
+
+    mock_chrony.restore_config()
+
+    assert mock_chrony.read_config() == "original"
+    assert not mock_chrony.CONFIG_FILE_BACKUP.exists()
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "ntp://example.com",
+        "ntp://example.com:1123?iburst=true&maxsources=4&offset=-0.1",
+        "nts://example.com:4461?require=true&maxdelay=0.5&certset=1",
+        "ntp://192.0.2.1?type=server&iburst=true",
+        "nts://example.com:4461?type=server",
+        "ntp://192.0.2.1?type=peer&xleave=true",
+    ],
+)
+def test_parse_config_round_trip(url: str):
+    """
+    arrange: render a time source.
+    act: parse the rendered pool directive.
+    assert: the canonical directive is the rendered directive.
+    """
+    directive = chrony.Chrony.parse_source_url(url).render()
+
+    assert list(chrony.Chrony.parse_config(directive).values()) == [[directive]]
+
+
+@pytest.mark.parametrize(
+    "new, expected",
+    [
+        pytest.param(
+            "# comment\n\nmakestep   1.0 3\nmaxupdateskew 100\n\tpool a.example iburst\n",
+            chrony.ConfigDiff(),
+            id="equivalent",
+        ),
+        pytest.param(
+            "pool a.example iburst port 123\nmaxupdateskew 100.0\nmakestep 1 3\n",
+            chrony.ConfigDiff(),
+            id="default port",
+        ),
+        pytest.param(
+            "makestep 0.1 3\nmaxupdateskew 100.0\npool a.example iburst\n",
+            chrony.ConfigDiff(changed=(("makestep 1 3", "makestep 0.1 3"),)),
+            id="changed",
+        ),
+        pytest.param(
+            "makestep 1 3\npool a.example\nrtcsync\n",
+            chrony.ConfigDiff(
+                added=("rtcsync",),
+                removed=("maxupdateskew 100",),
+                changed=(("pool a.example iburst", "pool a.example"),),
+            ),
+            id="added and removed",
+        ),
+    ],
+)
+def test_diff_config(new: str, expected: chrony.ConfigDiff):
+    """
+    arrange: none.
+    act: compare a chrony configuration with a new configuration.
+    assert: only semantic changes are reported.
+    """
+    old = "makestep 1 3\nmaxupdateskew 100.0\npool a.example iburst\n"
+
+    diff = chrony.Chrony.diff_config(old, new)
+
+    assert diff == expected
+    assert bool(diff) == bool(expected.added or expected.removed or expected.changed)
+
+
+@pytest.mark.parametrize(
+    "old, new, changed",
+    [
+        pytest.param(
+            "refclock SOCK /run/chrony.sock refid 0001 offset 0.5\n",
+            "refclock SOCK /run/chrony.sock refid 1 offset 0.5\n",
+            True,
+            id="refid",
+        ),
+        pytest.param(
+            "refclock SHM 0 poll 3 delay 0.2\n",
+            "refclock SHM 0 poll 3.0 delay 0.20\n",
+            False,
+            id="refclock options",
+        ),
+        pytest.param("server 10.0.0.1 key 01\n", "server 10.0.0.1 key 1\n", True, id="key"),
+        pytest.param(
+            "server 10.0.0.1 key 1 minpoll 4\n",
+            "server 10.0.0.1 key 1 minpoll 4.0\n",
+            False,
+            id="source options",
+        ),
+        pytest.param("allow 10.0.0.1\n", "allow 10.0.0.01\n", True, id="host"),
+        pytest.param("local stratum 10.0\n", "local stratum 10\n", False, id="local"),
+    ],
+)
+def test_diff_config_numeric_arguments(old: str, new: str, changed: bool):
+    """
+    arrange: none.
+    act: compare configurations differing in the spelling of a numeric looking argument.
+    assert: only the arguments of numeric options are compared as numbers.
+    """
+    diff = chrony.Chrony.diff_config(old, new)
+
+    assert bool(diff) == changed
+    if changed:
+        assert diff.changed == ((old.strip(), new.strip()),)
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip", "bz2", "xz"])
+def test_parse_sources_file(compression: str, tmp_path: pathlib.Path):
+    """
+    arrange: write a file of time source URLs, with comments and blank lines, compressed.
+    act: parse the sources file.
+    assert: every time source is parsed in the order of the file.
+    """
+    content = b"# estate\nntp://a.example?iburst=true\n\n  nts://b.example:4461  \n"
+    compress = {
+        "none": lambda data: data,
+        "gzip": gzip.compress,
+        "bz2": bz2.compress,
+        "xz": lzma.compress,
+    }[compression]
+    path = tmp_path / "sources.txt"
+    path.write_bytes(compress(content))
+
+    sources = chrony.Chrony.parse_sources_file(path)
+
+    assert [s.render() for s in sources] == [
+        "pool a.example iburst",
+        "pool b.example nts ntsport 4461",
+    ]
+
+
+def test_parse_sources_file_errors(tmp_path: pathlib.Path):
+    """
+    arrange: write a file of time source URLs with several invalid lines.
+    act: parse the sources file.
+    assert: every invalid line is reported with its line number.
+    """
+    path = tmp_path / "sources.txt"
+    path.write_text(
+        "ntp://a.example\nhttp://b.example\nntp://c.example?foo=1\nntp://d.example\n"
+        "nts://e.example?ntsport=5\n",
+        encoding="utf-8",
+    )
+
+    with pytest.raises(chrony.SourcesFileError) as exc_info:
+        chrony.Chrony.parse_sources_file(path)
+
+    assert [number for number, _ in exc_info.value.errors] == [2, 3, 5]
+    assert "http://b.example" in exc_info.value.errors[0][1]
+    assert "foo" in exc_info.value.errors[1][1]
+    assert "ntsport" in exc_info.value.errors[2][1]
+
+
+def test_normalize_sources():
+    """
+    arrange: parse time sources with different spellings of the same hosts.
+    act: normalize the time sources.
+    assert: duplicates are merged in a deterministic order and the merges are reported.
+    """
+    urls = [
+        "nts://b.example:4460",
+        "ntp://a.example?iburst=true&maxpoll=10",
+        "ntp://A.example.:123?iburst=1&maxpoll=8&prefer=1",
+        "ntp://a.example:1123",
+        "nts://B.example",
+        "ntp://a.example?type=server",
+    ]
+
+    normalized = chrony.Chrony.normalize_sources(
+        chrony.Chrony.parse_source_url(url) for url in urls
+    )
+
+    assert [s.render() for s in normalized.sources] == [
+        "pool a.example iburst maxpoll 8 prefer",
+        "server a.example",
+        "pool a.example port 1123",
+        "pool b.example nts",
+    ]
+    assert normalized.merged == ("ntp://a.example (maxpoll 10 -> 8)", "nts://b.example")
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        pytest.param(
+            "ntp://a.example:1123?iburst=true&maxdelay=0.3",
+            "pool a.example port 1123 iburst maxdelay 0.3",
+            id="fast path",
+        ),
+        pytest.param(
+            "ntp://A.example:0123?iburst=YES&minpoll=+6",
+            "pool a.example iburst minpoll 6",
+            id="bool and int spellings",
+        ),
+        pytest.param(
+            "ntp://a.example?maxdelay=1e-3&minpoll=6.0",
+            "pool a.example maxdelay 0.001 minpoll 6",
+            id="float and int spellings",
+        ),
+        pytest.param("nts://a.example?key=a%2Bb", "pool a.example nts key a+b", id="encoded"),
+        pytest.param(
+            "ntp://192.0.2.1?type=server&iburst=true", "server 192.0.2.1 iburst", id="server"
+        ),
+        pytest.param("ntp://192.0.2.1:1123?type=peer", "peer 192.0.2.1 port 1123", id="peer"),
+        pytest.param(
+            "nts://a.example?type=server&maxdelay=1e-3",
+            "server a.example nts maxdelay 0.001",
+            id="nts server",
+        ),
+        pytest.param(
+            "refclock://sock/run/chrony.ttyS0.sock?refid=GPS&poll=2&precision=1e-7&offset=0.5"
+            "&delay=0.2&prefer=true",
+            "refclock SOCK /run/chrony.ttyS0.sock delay 0.2 offset 0.5 poll 2 precision 1e-07 "
+            "prefer refid GPS",
+            id="sock refclock",
+        ),
+        pytest.param(
+            "refclock://SHM/0?refid=NMEA&offset=-0.1",
+            "refclock SHM 0 offset -0.1 refid NMEA",
+            id="shm",
+        ),
+    ],
+)
+def test_parse_source_url(url: str, expected: str):
+    """
+    arrange: none.
+    act: parse a time source URL, validated by the fast path or the pydantic model.
+    assert: the time source renders the same as the pydantic model.
+    """
+    source = chrony.Chrony.parse_source_url(url)
+
+    assert source.render() == expected
+    model = chrony._source_model(type(source))
+    assert model(**source.model_dump()).model_dump() == source.model_dump()
+
+
+def test_parse_source_url_invalid():
+    """
+    arrange: none.
+    act: parse a time source URL with an invalid option.
+    assert: the pydantic model describes the invalid option.
+    """
+    with pytest.raises(ValueError) as exc_info:
+        chrony.Chrony.parse_source_url("ntp://a.example?minpoll=often&foo=1")
+
+    assert chrony._describe_source_error(exc_info.value) == (
+        "minpoll: Input should be a valid integer, unable to parse string as an integer; "
+        "foo: Extra inputs are not permitted"
+    )
+
+
+@pytest.mark.parametrize(
+    "url, error",
+    [
+        pytest.param(
+            "ntp://192.0.2.1?type=server&maxsources=2",
+            "maxsources: Extra inputs are not permitted",
+            id="server maxsources",
+        ),
+        pytest.param(
+            "ntp://192.0.2.1?type=peer&maxsources=2",
+            "maxsources: Extra inputs are not permitted",
+            id="peer maxsources",
+        ),
+        pytest.param("nts://a.example?type=peer", "Invalid NTS source type: peer", id="nts peer"),
+        pytest.param(
+            "ntp://a.example?type=refclock", "Invalid NTP source type: refclock", id="type"
+        ),
+    ],
+)
+def test_parse_source_url_invalid_type(url: str, error: str):
+    """
+    arrange: none.
+    act: parse a time source URL with an invalid source type or a pool-only option.
+    assert: the URL is rejected with the reason.
+    """
+    with pytest.raises(ValueError) as exc_info:
+        chrony.Chrony.parse_source_url(url)
+
+    assert chrony._describe_source_error(exc_info.value) == error
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        pytest.param("ntp://a.example?host=b.example", id="ntp host"),
+        pytest.param("ntp://a.example?port=123", id="ntp port"),
+        pytest.param("nts://a.example?ntsport=5", id="nts ntsport"),
+        pytest.param("nts://a.example?type=server&host=b.example", id="nts server host"),
+        pytest.param("refclock://sock/run/gps.sock?driver=SHM", id="refclock driver"),
+        pytest.param("refclock://shm/0?host=1", id="refclock host"),
+        pytest.param("refclock://shm/0?path=/run/gps.sock", id="refclock path"),
+    ],
+)
+def test_parse_source_url_reserved_option(url: str):
+    """
+    arrange: none.
+    act: parse a time source URL with an option repeating a part of the URL.
+    assert: the URL is rejected with a ValueError naming the option.
+    """
+    with pytest.raises(ValueError, match="Invalid option"):
+        chrony.Chrony.parse_source_url(url)
+
+
+@pytest.mark.parametrize(
+    "url, error",
+    [
+        pytest.param("refclock://pps/dev/pps0", "Invalid refclock driver: PPS", id="driver"),
+        pytest.param("refclock://sock", "Invalid refclock source URL: refclock://sock", id="path"),
+        pytest.param("refclock://shm/gps", "Invalid SHM refclock segment: gps", id="segment"),
+        pytest.param("refclock://shm/0?refid=GNSS1", "Invalid refclock refid: GNSS1", id="refid"),
+        pytest.param("refclock://shm/0?delay=0", "Invalid refclock delay: 0.0", id="delay"),
+        pytest.param(
+            "refclock://shm/0?maxsources=1",
+            "maxsources: Extra inputs are not permitted",
+            id="network option",
+        ),
+    ],
+)
+def test_parse_refclock_url_invalid(url: str, error: str):
+    """
+    arrange: none.
+    act: parse an invalid reference clock URL.
+    assert: the URL is rejected with the reason.
+    """
+    with pytest.raises(ValueError) as exc_info:
+        chrony.Chrony.parse_source_url(url)
+
+    assert chrony._describe_source_error(exc_info.value) == error
+
+
+def test_refclocks_config():
+    """
+    arrange: parse network time sources and reference clocks, with a duplicate SHM segment.
+    act: normalize and split the time sources, and render the configuration files.
+    assert: the reference clocks are rendered in the configuration file, which can't be loaded
+        from a sources file, and the network time sources in the sources file.
+    """
+    urls = [
+        "refclock://shm/00?refid=NMEA",
+        "ntp://a.example",
+        "refclock://sock/run/chrony.ttyS0.sock?refid=GPS&prefer=true",
+        "refclock://shm/0?offset=0.5",
+    ]
+    normalized = chrony.Chrony.normalize_sources(
+        chrony.Chrony.parse_source_url(url) for url in urls
+    )
+
+    sources, refclocks = chrony.Chrony.split_refclocks(list(normalized.sources))
+
+    assert normalized.merged == ("refclock://shm/0",)
+    assert chrony.Chrony.new_sources_config(sources) == "pool a.example\n"
+    assert chrony.Chrony.new_config(refclocks=refclocks).endswith(
+        "leapsectz right/UTC\n\n"
+        "refclock SOCK /run/chrony.ttyS0.sock prefer refid GPS\n"
+        "refclock SHM 0 offset 0.5 refid NMEA\n"
+    )
+    assert chrony.Chrony.new_sources_config([], header="# header") == "# header"
+
+
+def test_sock_refclock_socket(tmp_path: pathlib.Path):
+    """
+    arrange: bind a unix socket in a temporary directory, and a path too long to be bound.
+    act: parse SOCK reference clocks with the socket paths.
+    assert: the bindable socket is rendered in a refclock directive, the other is rejected.
+    """
+    path = tmp_path / "gps.sock"
+    too_long = tmp_path / ("x" * (chrony._UNIX_PATH_MAX - len(str(tmp_path))))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(str(path))
+        with pytest.raises(OSError):
+            sock.bind(str(too_long))
+
+    refclock = chrony.Chrony.parse_source_url(f"refclock://sock{path}?refid=GPS&poll=2")
+
+    assert path.is_socket()
+    assert refclock.render() == f"refclock SOCK {path} poll 2 refid GPS"
+    assert not isinstance(refclock, chrony._PoolOptions)
+    assert chrony.Chrony.parse_config(refclock.render()) == {"refclock": [refclock.render()]}
+    with pytest.raises(ValueError, match="Too long SOCK refclock socket path"):
+        chrony.Chrony.parse_source_url(f"refclock://sock{too_long}")
+
+
+def test_import_without_pydantic():
+    """
+    arrange: none.
+    act: import the chrony module in a new interpreter.
+    assert: pydantic is not imported.
+    """
+    code = "import sys, chrony; sys.exit('pydantic' in sys.modules)"
+    src = pathlib.Path(chrony.__file__).parent
+
+    subprocess.run([sys.executable, "-c", code], cwd=src, check=True)  # nosec B603
+
+
+def test_render_options_in_use():
+    """
+    arrange: parse a time source with set, unset and default options.
+    act: copy the time source, unsetting an option.
+    assert: only the options in use are tracked and rendered, in name order.
+    """
+    source = chrony.Chrony.parse_source_url("ntp://a.example?maxpoll=8&prefer=false&iburst=1")
+
+    copy = source.model_copy(update={"maxpoll": None, "minpoll": 0})
+
+    assert source._options == ("iburst", "maxpoll")
+    assert source.render_options() == "iburst maxpoll 8"
+    assert copy._options == ("iburst", "minpoll")
+    assert copy.render() == "pool a.example iburst minpoll 0"
+    assert copy.maxpoll is None and not copy.prefer
+
+
+def test_tracking(mock_chrony: chrony.Chrony):
+    """
+    arrange: given a running chrony service.
+    act: get the tracking state, then get it while chronyc fails.
+    assert: the selected source, the offset and the leap status are parsed, and a chronyc
+        failure is reported as no tracking state.
+    """
+    tracking = mock_chrony.tracking()
+
+    assert tracking == chrony.Tracking(
+        reference_id="C0000201", offset=0.000012, leap_status="Normal"
+    )
+    assert tracking.synchronized
+    assert not chrony.Tracking("00000000", 0.0, "Normal").synchronized
+    assert not chrony.Tracking("C0000201", 0.0, "Not synchronised").synchronized
+
+    with patch.object(
+        chrony.Chrony, "_chronyc", side_effect=subprocess.CalledProcessError(1, "chronyc")
+    ):
+        assert mock_chrony.tracking() is None
+
+
+def test_bootstrap_sources():
+    """
+    arrange: parse time sources with and without polling options.
+    act: add the bootstrap mode options.
+    assert: the sources are polled with iburst and burst, with a minpoll not above maxpoll.
+    """
+    sources = [
+        chrony.Chrony.parse_source_url(url)
+        for url in (
+            "ntp://a.example",
+            "ntp://b.example?iburst=true&maxpoll=3",
+            "nts://c.example?minpoll=2",
+        )
+    ]
+
+    bootstrapped = chrony.Chrony.bootstrap_sources(sources)
+
+    assert chrony.Chrony.new_sources_config(bootstrapped) == (
+        "pool a.example burst iburst minpoll 4\n"
+        "pool b.example burst iburst maxpoll 3 minpoll 3\n"
+        "pool c.example nts burst iburst minpoll 2\n"
+    )
+    assert chrony.Chrony.new_sources_config(sources) == (
+        "pool a.example\npool b.example iburst maxpoll 3\npool c.example nts minpoll 2\n"
+    )
+
+
+def test_resolved_sources():
+    """
+    arrange: parse NTP and NTS time sources, and resolved addresses of their hosts.
+    act: apply the resolved addresses with a preferred family, as pools and as servers.
+    assert: pools get the option of the preferred family, or are replaced by server directives
+        of up to maxsources addresses, which parse back without the pool-only options; NTS and
+        unresolved sources are kept.
+    """
+    sources = [
+        chrony.Chrony.parse_source_url(url)
+        for url in (
+            "ntp://a.example?iburst=true&maxsources=2",
+            "ntp://b.example",
+            "nts://c.example",
+            "ntp://d.example",
+        )
+    ]
+    addresses = {
+        "a.example": [["ipv4", "192.0.2.1"], ["ipv4", "192.0.2.2"], ["ipv4", "192.0.2.3"]],
+        "b.example": [["ipv4", "192.0.2.4"], ["ipv6", "2001:db8::4"]],
+        "c.example": [["ipv4", "192.0.2.5"]],
+    }
+    assert chrony.Chrony.pool_hosts(sources) == ["a.example", "b.example", "d.example"]
+
+    pools = chrony.Chrony.resolved_sources(sources, addresses, family="ipv6")
+    servers = chrony.Chrony.resolved_sources(sources, addresses, family="ipv6", servers=True)
+
+    assert chrony.Chrony.new_sources_config(pools) == (
+        "pool a.example iburst maxsources 2\n"
+        "pool b.example ipv6\n"
+        "pool c.example nts\n"
+        "pool d.example\n"
+    )
+    servers_config = chrony.Chrony.new_sources_config(servers)
+    assert servers_config == (
+        "server 192.0.2.1 iburst\n"
+        "server 192.0.2.2 iburst\n"
+        "server 2001:db8::4\n"
+        "pool c.example nts\n"
+        "pool d.example\n"
+    )
+    assert chrony.Chrony.parse_sources_config(servers_config) == servers
+    assert chrony.Chrony.parse_sources_config("server a.example maxsources 2\n") is None
+
+
+def test_configure_exporter(mock_chrony: chrony.Chrony, system_calls):
+    """
+    arrange: start with the packaged chrony_exporter service file.
+    act: configure the exporter collectors and DNS lookups, then the defaults again.
+    assert: the drop-in overrides the command line with every collector flag, and the
+        exporter is restarted once per change only.
+    """
+    assert not mock_chrony.configure_exporter(chrony.EXPORTER_COLLECTORS, dns_lookups=True)
+
+    assert mock_chrony.configure_exporter(["sources", "tracking"], dns_lookups=False)
+    assert mock_chrony.configure_exporter(["tracking", "sources"], dns_lookups=False) is False
+
+    dropin = mock_chrony.EXPORTER_DROPIN_FILE.read_text(encoding="utf-8")
+    assert dropin.splitlines()[-3:] == [
+        "[Service]",
+        "ExecStart=",
+        "ExecStart=/usr/bin/chrony_exporter --chrony.address=unix:///run/chrony/chronyd.sock "
+        "--web.listen-address=127.0.0.1:9123 --collector.tracking --collector.sources "
+        "--no-collector.serverstats --no-collector.dns-lookups",
+    ]
+    assert system_calls.counts["chrony:restart_exporter"] == 1
+
+    assert mock_chrony.configure_exporter(chrony.EXPORTER_COLLECTORS, dns_lookups=True)
+    assert not mock_chrony.EXPORTER_DROPIN_FILE.exists()
+    assert system_calls.counts["chrony:restart_exporter"] == 2
+
+
+@pytest.mark.parametrize(
+    "collectors",
+    [
+        pytest.param(chrony.EXPORTER_COLLECTORS, id="unchanged"),
+        pytest.param(["tracking"], id="changed"),
+    ],
+)
+def test_configure_exporter_after_upgrade(
+    collectors: list[str], mock_chrony: chrony.Chrony, system_calls
+):
+    """
+    arrange: leave the exporter restart pending, as an upgrade of chrony_exporter does.
+    act: configure the exporter collectors, then restart the pending exporter.
+    assert: the exporter is restarted once, whether the drop-in changed or not.
+    """
+    mock_chrony._exporter_restart_pending = True
+
+    mock_chrony.configure_exporter(collectors, dns_lookups=True)
+    mock_chrony.restart_pending_exporter()
+
+    assert system_calls.counts["chrony:restart_exporter"] == 1
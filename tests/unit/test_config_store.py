@@ -0,0 +1,101 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# pylint: disable=missing-function-docstring,protected-access
+
+"""Unit tests for the configuration file store."""
+
+import pathlib
+from unittest.mock import patch
+
+import pytest
+
+import config_store
+
+
+@pytest.fixture(name="store")
+def store_fixture(tmp_path: pathlib.Path) -> config_store.ConfigStore:
+    """Create a configuration file store in a temporary directory."""
+    path = tmp_path / "chrony.conf"
+    path.write_text("original", encoding="utf-8")
+    return config_store.ConfigStore(path, backup_dir=tmp_path / "backups", backup_count=2)
+
+
+def test_read_once(store: config_store.ConfigStore, system_calls):
+    """
+    arrange: create a configuration file store.
+    act: access the content and the digest multiple times, then write a new content.
+    assert: the file is read only once.
+    """
+    system_calls.clear()
+
+    assert store.content == "original"
+    assert store.sha256 == config_store.sha256("original")
+    store.write("new")
+
+    assert store.content == "new"
+    assert store.path.read_text(encoding="utf-8") == "new"
+    assert system_calls.counts["read:chrony.conf"] == 1
+
+
+def test_atomic_write_failure(store: config_store.ConfigStore):
+    """
+    arrange: create a configuration file store.
+    act: write a new content, failing before the temporary file is renamed.
+    assert: the file keeps its original content and the temporary file is removed.
+    """
+    with (
+        patch("config_store.os.replace", side_effect=OSError("interrupted")),
+        pytest.raises(OSError),
+    ):
+        store.write("new")
+
+    assert store.path.read_text(encoding="utf-8") == "original"
+    assert [f.name for f in store.path.parent.iterdir() if f.is_file()] == ["chrony.conf"]
+
+
+def test_backup_ring(store: config_store.ConfigStore):
+    """
+    arrange: create a configuration file store with a backup ring of two.
+    act: back up three different contents and the first content again.
+    assert: the oldest backup is dropped and the newest intact backup is restored.
+    """
+    store.backup()
+    for content in ["first", "second", "original"]:
+        store.write(content)
+        store.backup()
+    store.write("managed")
+    backup_dir = store.path.parent / "backups"
+
+    backups = sorted(f.name for f in backup_dir.iterdir())
+    assert backups == ["chrony.conf.0", "chrony.conf.1", "index.json"]
+    # corrupt the newest backup, restore falls back to the older one
+    (backup_dir / "chrony.conf.1").write_text("corrupted", encoding="utf-8")
+
+    assert store.restore()
+    assert store.path.read_text(encoding="utf-8") == "second"
+    assert not backup_dir.exists()
+    assert not store.restore()
+
+
+def test_backup_write_failure(store: config_store.ConfigStore):
+    """
+    arrange: fill the backup ring of two.
+    act: back up a new content, failing before the reused backup file is renamed.
+    assert: the backup ring keeps its intact backups, and the newest one is restored.
+    """
+    store.backup()
+    store.write("first")
+    store.backup()
+    store.write("second")
+
+    with (
+        patch("config_store.os.replace", side_effect=OSError("interrupted")),
+        pytest.raises(OSError),
+    ):
+        store.backup()
+
+    backup_dir = store.path.parent / "backups"
+    assert (backup_dir / "chrony.conf.0").read_text(encoding="utf-8") == "original"
+    assert store.restore()
+    assert store.path.read_text(encoding="utf-8") == "first"
@@ -0,0 +1,110 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# pylint: disable=missing-function-docstring
+
+"""Unit tests for the charm metrics."""
+
+import json
+import pathlib
+from unittest.mock import patch
+
+import pytest
+from ops import testing
+
+import charm
+import chrony
+import metrics
+
+
+def test_observe_time_to_sync(metrics_files: pathlib.Path):
+    """
+    arrange: none.
+    act: record time to sync measurements of two triggers.
+    assert: the cumulative histograms are persisted and rendered in the Prometheus format.
+    """
+    metrics.observe_time_to_sync(1.5, "config-changed")
+    metrics.observe_time_to_sync(45.0, "config-changed")
+    metrics.observe_time_to_sync(0.5, "install")
+
+    histograms = json.loads((metrics_files / "time-to-sync.json").read_text(encoding="utf-8"))
+    assert histograms["config-changed"] == {
+        "buckets": [0, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2],
+        "sum": 46.5,
+        "count": 2,
+    }
+    rendered = (metrics_files / "metrics.prom").read_text(encoding="utf-8")
+    assert "# TYPE chrony_charm_time_to_sync_seconds histogram\n" in rendered
+    assert (
+        'chrony_charm_time_to_sync_seconds_bucket{trigger="config-changed",le="2.0"} 1\n'
+        in rendered
+    )
+    assert (
+        'chrony_charm_time_to_sync_seconds_bucket{trigger="config-changed",le="+Inf"} 2\n'
+        in rendered
+    )
+    assert 'chrony_charm_time_to_sync_seconds_sum{trigger="config-changed"} 46.5\n' in rendered
+    assert 'chrony_charm_time_to_sync_seconds_count{trigger="install"} 1\n' in rendered
+
+
+def test_time_to_sync_recorded(
+    metrics_files: pathlib.Path, mock_chrony: chrony.Chrony, tmp_path: pathlib.Path
+):
+    """
+    arrange: trigger the 'config-changed' event, restarting chrony.
+    act: trigger the 'update-status' event before and after chronyd logs a source selection.
+    assert: the measurement is pending until the selection, then the time from the restart to
+        the selection is recorded, labelled with the hook that restarted chrony.
+    """
+    boot_id = tmp_path / "boot_id"
+    boot_id.write_text("1f1e7e1e-0000-4000-8000-000000000001\n", encoding="utf-8")
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    with patch.object(metrics, "BOOT_ID_FILE", boot_id):
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+        stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+        measurement = json.loads(stored.content["time_to_sync"])
+        assert measurement["trigger"] == "config-changed"
+        state_out = ctx.run(ctx.on.update_status(), state_out)
+        assert not (metrics_files / "time-to-sync.json").exists()
+
+        # a selection logged before the restart, then the first one after it
+        mock_chrony._journalctl.side_effect = lambda *_: "".join(
+            json.dumps({"__MONOTONIC_TIMESTAMP": str(int(seconds * 1e6)), "MESSAGE": message})
+            + "\n"
+            for seconds, message in [
+                (measurement["monotonic"] - 5, "Selected source 192.0.2.9"),
+                (measurement["monotonic"] + 2.5, "Selected source 192.0.2.1 (example.com)"),
+                (measurement["monotonic"] + 9, "Selected source 192.0.2.2 (example.com)"),
+            ]
+        )
+        state_out = ctx.run(ctx.on.update_status(), state_out)
+
+    stored = state_out.get_stored_state("_stored", owner_path="ChronyClientCharm")
+    assert stored.content["time_to_sync"] == ""
+    histograms = json.loads((metrics_files / "time-to-sync.json").read_text(encoding="utf-8"))
+    assert list(histograms) == ["config-changed"]
+    assert histograms["config-changed"]["count"] == 1
+    assert histograms["config-changed"]["sum"] == 2.5
+
+
+def test_time_to_sync_after_reboot(metrics_files: pathlib.Path, tmp_path: pathlib.Path):
+    """
+    arrange: start a measurement, then reboot the machine.
+    act: finish the pending measurement.
+    assert: the measurement spanning the reboot is discarded without reading the journal.
+    """
+    boot_id = tmp_path / "boot_id"
+    boot_id.write_text("before\n", encoding="utf-8")
+    with patch.object(metrics, "BOOT_ID_FILE", boot_id):
+        measurement = metrics.start_time_to_sync("config-changed")
+        boot_id.write_text("after\n", encoding="utf-8")
+
+        assert metrics.finish_time_to_sync(measurement, lambda *_: pytest.fail("journal read"))
+
+    assert not (metrics_files / "time-to-sync.json").exists()
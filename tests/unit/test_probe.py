@@ -0,0 +1,242 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# pylint: disable=missing-function-docstring
+
+"""Unit tests for the time source latency probe."""
+
+import asyncio
+import pathlib
+import shutil
+import socket
+import ssl
+import struct
+import subprocess  # nosec B404
+import threading
+import time
+import typing
+from unittest.mock import patch
+
+import pytest
+
+import chrony
+import probe
+
+
+class _NtpStandIn(asyncio.DatagramProtocol):
+    """NTP server answering client mode queries after a delay, except the dropped ones."""
+
+    def __init__(self, delay: float, drop: int = 0) -> None:
+        self.delay = delay
+        self.drop = drop
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = typing.cast(asyncio.DatagramTransport, transport)
+
+    def datagram_received(self, data: bytes, addr: tuple[str | int, ...]) -> None:
+        if self.drop:
+            self.drop -= 1
+            return
+        response = (
+            bytes([0x24, 2]) + bytes(22) + data[40:48] + struct.pack("!QQ", 1 << 32, 1 << 32)
+        )
+        asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, response, addr)  # type: ignore[union-attr]
+
+
+async def _nts_ke_stand_in(
+    delay: float, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """Answer an NTS-KE request after a delay."""
+    while True:
+        kind, length = struct.unpack("!HH", await reader.readexactly(4))
+        await reader.readexactly(length)
+        if kind & 0x7FFF == 0:
+            break
+    await asyncio.sleep(delay)
+    writer.write(probe.NTS_KE_REQUEST)
+    await writer.drain()
+    writer.close()
+
+
+class StandIns:
+    """Local NTP and NTS-KE servers with a configurable delay, on their own event loop."""
+
+    def __init__(self, tls_context: ssl.SSLContext) -> None:
+        self.tls_context = tls_context
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def _run(self, coroutine: typing.Coroutine[typing.Any, typing.Any, typing.Any]) -> typing.Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def ntp(self, delay: float, drop: int = 0) -> int:
+        async def start() -> int:
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: _NtpStandIn(delay, drop), local_addr=("127.0.0.1", 0)
+            )
+            return transport.get_extra_info("sockname")[1]
+
+        return self._run(start())
+
+    def nts(self, delay: float) -> int:
+        async def start() -> int:
+            server = await asyncio.start_server(
+                lambda r, w: _nts_ke_stand_in(delay, r, w),
+                "127.0.0.1",
+                0,
+                ssl=self.tls_context,
+            )
+            return server.sockets[0].getsockname()[1]
+
+        return self._run(start())
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture(name="certificate")
+def certificate_fixture(tmp_path: pathlib.Path) -> tuple[pathlib.Path, pathlib.Path]:
+    """Self-signed certificate of localhost."""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        pytest.skip("openssl not available")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(  # nosec B603
+        [
+            openssl,
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+@pytest.fixture(name="stand_ins")
+def stand_ins_fixture(certificate: tuple[pathlib.Path, pathlib.Path]) -> typing.Iterator[StandIns]:
+    """Local NTP and NTS-KE stand-in servers."""
+    tls_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    tls_context.load_cert_chain(*certificate)
+    tls_context.set_alpn_protocols([probe.NTS_KE_ALPN])
+    stand_ins = StandIns(tls_context)
+    yield stand_ins
+    stand_ins.close()
+
+
+@pytest.fixture(name="client_context")
+def client_context_fixture(certificate: tuple[pathlib.Path, pathlib.Path]) -> ssl.SSLContext:
+    """TLS client context trusting the stand-in certificate."""
+    context = ssl.create_default_context(cafile=str(certificate[0]))
+    context.set_alpn_protocols([probe.NTS_KE_ALPN])
+    return context
+
+
+def _sources(*urls: str) -> list[chrony.TimeSource]:
+    return [chrony.Chrony.parse_source_url(url) for url in urls]
+
+
+def test_probe_sources(stand_ins: StandIns, client_context: ssl.SSLContext):
+    """
+    arrange: start NTP and NTS-KE stand-in servers with different delays.
+    act: probe the servers and a server that doesn't answer, under a global budget.
+    assert: the delays are measured, the silent server is unreachable within the budget.
+    """
+    silent = stand_ins.ntp(delay=10.0)
+    sources = _sources(
+        f"ntp://127.0.0.1:{stand_ins.ntp(delay=0.05)}",
+        f"ntp://127.0.0.1:{stand_ins.ntp(delay=0.0)}",
+        f"nts://localhost:{stand_ins.nts(delay=0.1)}",
+        f"ntp://127.0.0.1:{silent}",
+    )
+
+    results = probe.probe_sources(sources, timeout=1.5, ssl_context=client_context)
+
+    slow_ntp, fast_ntp, nts, unreachable = results
+    assert slow_ntp is not None and fast_ntp is not None and nts is not None
+    assert fast_ntp.delay < 0.04 <= slow_ntp.delay
+    assert nts.delay >= 0.1
+    assert nts.jitter == 0.0
+    assert unreachable is None
+
+
+def test_probe_lost_sample(stand_ins: StandIns):
+    """
+    arrange: start an NTP stand-in server which drops the first query.
+    act: probe the server.
+    assert: the lost sample is skipped and the server is measured with the other samples.
+    """
+    sources = _sources(f"ntp://127.0.0.1:{stand_ins.ntp(delay=0.0, drop=1)}")
+
+    with patch.object(probe, "NTP_SAMPLE_TIMEOUT", 0.2):
+        (result,) = probe.probe_sources(sources, timeout=2.0)
+
+    assert result is not None
+
+
+def test_probe_stalled_dns(stand_ins: StandIns):
+    """
+    arrange: start an NTP stand-in server and stall the resolution of another source host.
+    act: probe both sources under a short budget.
+    assert: the probe returns within the budget, the stalled source is unreachable.
+    """
+    release = threading.Event()
+    real_getaddrinfo = socket.getaddrinfo
+
+    def getaddrinfo(host: str, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        if host == "stalled.example":
+            release.wait()
+            raise socket.gaierror("timed out")
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    sources = _sources(f"ntp://127.0.0.1:{stand_ins.ntp(delay=0.0)}", "ntp://stalled.example")
+    try:
+        with patch.object(socket, "getaddrinfo", getaddrinfo):
+            start = time.monotonic()
+            results = probe.probe_sources(sources, timeout=0.5)
+            assert time.monotonic() - start < 2
+    finally:
+        release.set()
+
+    assert results[0] is not None
+    assert results[1] is None
+
+
+def test_select_sources():
+    """
+    arrange: probe results of four time sources, one unreachable.
+    act: select the two best time sources.
+    assert: the two sources with the lowest delay plus jitter are kept in order, the best one
+        is marked prefer.
+    """
+    sources = _sources("ntp://a.example.com", "ntp://b.example.com", "ntp://c.example.com")
+    sources.append(chrony.Chrony.parse_source_url("nts://d.example.com"))
+    results = [
+        probe.ProbeResult(delay=0.010, jitter=0.020),
+        None,
+        probe.ProbeResult(delay=0.020, jitter=0.001),
+        probe.ProbeResult(delay=0.005, jitter=0.001),
+    ]
+
+    selected = probe.select_sources(sources, results, 2)
+
+    assert [source.host for source in selected] == ["c.example.com", "d.example.com"]
+    assert [source.model_dump()["prefer"] for source in selected] == [False, True]
+    assert probe.select_sources(sources, [None] * 4, 2) == sources
+    sources[2] = chrony.Chrony.parse_source_url("ntp://c.example.com?prefer=true")
+    selected = probe.select_sources(sources, results, 2)
+    assert [source.model_dump()["prefer"] for source in selected] == [True, False]
@@ -0,0 +1,165 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# pylint: disable=missing-function-docstring
+
+"""Unit tests for the pre-resolution of the time source hosts."""
+
+import dataclasses
+import json
+import os
+import pathlib
+import socket
+import subprocess  # nosec B404
+import sys
+import textwrap
+import threading
+import time
+import typing
+from unittest.mock import patch
+
+from ops import testing
+
+import charm
+import chrony
+import resolve
+
+_ADDRESSES = {
+    "a.example": ["192.0.2.1", "2001:db8::1", "192.0.2.2"],
+    "b.example": ["192.0.2.3"],
+}
+
+
+def _fake_getaddrinfo(
+    calls: list[str], release: threading.Event
+) -> typing.Callable[..., list[tuple[typing.Any, ...]]]:
+    """Fake the system resolver, which never answers for slow.example."""
+
+    def getaddrinfo(host: str, *_: typing.Any, **__: typing.Any) -> list[tuple[typing.Any, ...]]:
+        calls.append(host)
+        if host == "slow.example":
+            release.wait()
+            raise socket.gaierror("timed out")
+        if host not in _ADDRESSES:
+            raise socket.gaierror("not found")
+        return [
+            (socket.AF_INET6 if ":" in address else socket.AF_INET, 2, 17, "", (address, 0))
+            for address in _ADDRESSES[host]
+        ]
+
+    return getaddrinfo
+
+
+def test_resolve_hosts(resolve_cache: pathlib.Path):
+    """
+    arrange: fake a resolver with a host which never answers and a host which doesn't exist.
+    act: resolve the hosts twice, then once the cached addresses expired.
+    assert: the hosts are resolved concurrently within the timeout, the addresses are cached
+        and only the missing or expired hosts are resolved again.
+    """
+    calls: list[str] = []
+    release = threading.Event()
+    hosts = ["a.example", "b.example", "slow.example", "missing.example"]
+    try:
+        with patch.object(socket, "getaddrinfo", _fake_getaddrinfo(calls, release)):
+            start = time.monotonic()
+            resolved, expires = resolve.resolve_hosts(hosts, timeout=0.3, ttl=60)
+            assert time.monotonic() - start < 2
+
+            assert resolved == {
+                "a.example": [
+                    ["ipv4", "192.0.2.1"],
+                    ["ipv4", "192.0.2.2"],
+                    ["ipv6", "2001:db8::1"],
+                ],
+                "b.example": [["ipv4", "192.0.2.3"]],
+            }
+            assert expires > time.time() + 50
+            assert set(json.loads(resolve_cache.read_text(encoding="utf-8"))) == {
+                "a.example",
+                "b.example",
+            }
+
+            calls.clear()
+            assert resolve.resolve_hosts(hosts, timeout=0.3, ttl=60) == (resolved, expires)
+            assert sorted(calls) == ["missing.example", "slow.example"]
+
+            calls.clear()
+            resolve.resolve_hosts(["a.example"], timeout=0.3, ttl=0)
+            with patch.object(time, "time", return_value=expires + 1):
+                resolve.resolve_hosts(["a.example"], timeout=0.3, ttl=60)
+            assert calls == ["a.example"]
+    finally:
+        release.set()
+
+
+def test_resolve_timeout_bounds_exit(tmp_path: pathlib.Path):
+    """
+    arrange: stall the system resolver of a separate Python process, like a hook process.
+    act: resolve a host with a short timeout, then let the process exit.
+    assert: the process exits without waiting for the stalled resolver thread.
+    """
+    script = textwrap.dedent(
+        f"""\
+        import socket, time
+        import resolve
+        resolve.CACHE_FILE = resolve.pathlib.Path({str(tmp_path / "cache.json")!r})
+        socket.getaddrinfo = lambda *args, **kwargs: time.sleep(30)
+        print(resolve.resolve_hosts(["stalled.example"], timeout=0.1, ttl=60)[0])
+        """
+    )
+
+    start = time.monotonic()
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-c", script],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        check=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.stdout == "{}\n"
+    assert time.monotonic() - start < 10
+
+
+def test_resolve_servers(mock_chrony: chrony.Chrony):
+    """
+    arrange: enable the pre-resolution of the pool hosts as servers, preferring IPv6.
+    act: trigger the 'config-changed' event, then the 'update-status' event once the
+        addresses expired.
+    assert: the resolved addresses are configured as servers, and resolved again once expired.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={
+            "sources": "ntp://a.example,ntp://192.0.2.9,nts://b.example",
+            "resolve-family": "ipv6",
+            "resolve-servers": True,
+        },
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+    calls: list[str] = []
+
+    with patch.object(socket, "getaddrinfo", _fake_getaddrinfo(calls, threading.Event())):
+        state_out = ctx.run(ctx.on.config_changed(), state_in)
+        assert mock_chrony.read_sources_config().splitlines()[-3:] == [
+            "pool 192.0.2.9",
+            "server 2001:db8::1",
+            "pool b.example nts",
+        ]
+        assert state_out.unit_status == testing.ActiveStatus()
+
+        state_out = ctx.run(ctx.on.update_status(), state_out)
+        assert calls == ["a.example"]
+
+        with patch.object(time, "time", return_value=time.time() + 3601):
+            state_out = ctx.run(ctx.on.update_status(), state_out)
+    assert calls == ["a.example", "a.example"]
+
+    state_out = ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(state_out, config={**state_in.config, "resolve-family": "ipv5"}),
+    )
+    assert state_out.unit_status == testing.BlockedStatus("invalid resolve-family configuration")
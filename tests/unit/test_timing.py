@@ -0,0 +1,79 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+# pylint: disable=missing-function-docstring
+
+"""Unit tests for the hook phase timing."""
+
+import json
+import pathlib
+from unittest.mock import patch
+
+import pytest
+from ops import testing
+
+import charm
+import chrony
+import timing
+
+
+def test_hook_spans_written(trace_file: pathlib.Path, mock_chrony: chrony.Chrony):
+    """
+    arrange: none.
+    act: trigger the 'config-changed' event.
+    assert: the duration of each phase of the hook is appended to the trace file.
+    """
+    mock_chrony.write_config("default")
+    ctx = testing.Context(charm.ChronyClientCharm)
+    state_in = testing.State(
+        config={"sources": "ntp://example.com"},
+        relations=[testing.SubordinateRelation(endpoint="juju-info", id=1)],
+    )
+
+    ctx.run(ctx.on.config_changed(), state_in)
+
+    records = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    assert {r["hook"] for r in records} == {"config-changed"}
+    assert {r["app"] for r in records} == {"chrony-client"}
+    assert {"lock", "reconcile-check", "install-check", "parse", "render"} <= {
+        r["phase"] for r in records
+    }
+
+
+def test_trace_file_rotation(trace_file: pathlib.Path):
+    """
+    arrange: fill the trace file beyond its maximum size.
+    act: flush more spans.
+    assert: the trace file is rotated, keeping a bounded number of backups.
+    """
+    with patch("timing.TRACE_FILE_MAX_BYTES", 100):
+        for _ in range(5):
+            with timing.span("render"):
+                pass
+            timing.flush(hook="config-changed", app="chrony-client")
+
+    backups = sorted(p.name for p in trace_file.parent.glob("trace.jsonl.*"))
+    assert backups == ["trace.jsonl.1", "trace.jsonl.2"]
+    assert not trace_file.exists() or trace_file.stat().st_size < 100
+
+
+def test_summarize():
+    """
+    arrange: create trace file lines for two hooks.
+    act: summarize the trace file lines.
+    assert: the p50/p95 duration of each phase is calculated.
+    """
+    lines = [
+        json.dumps({"hook": "config-changed", "phase": "render", "duration": d / 100})
+        for d in range(1, 101)
+    ]
+    lines.append(json.dumps({"hook": "install", "phase": "install", "duration": 30.0}))
+    lines.append("not json")
+
+    summary = timing.summarize(lines)
+
+    assert summary["render"]["count"] == 100
+    assert summary["render"]["p50"] == pytest.approx(0.5, abs=0.01)
+    assert summary["render"]["p95"] == pytest.approx(0.95, abs=0.01)
+    assert summary["install"] == {"count": 1, "p50": 30.0, "p95": 30.0}
+    assert list(timing.summarize(lines, hook="install")) == ["install"]